@@ -37,3 +37,16 @@ pytest_plugins = [
     'tests.fixtures.fixture_user',
     'tests.fixtures.fixture_data',
 ]
+
+
+def pytest_configure(config):
+    # pytest-django загружает настройки раньше conftest, поэтому файл
+    # общего кэша подменяется здесь, а не через CACHE_SHM_PATH.
+    from core.test_runner import TempSharedCache
+
+    config._shared_cache = TempSharedCache()
+    config._shared_cache.enable()
+
+
+def pytest_unconfigure(config):
+    config._shared_cache.disable()
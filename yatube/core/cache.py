@@ -0,0 +1,259 @@
+"""Двухуровневый кэш: небольшой LRU в памяти процесса перед общим
+бэкендом (файловым, БД, memcached).
+
+Ключи разложены по корзинам, у каждой корзины в общем кэше лежит
+версия — метка времени. Запись или удаление ключа меняет версию его
+корзины; процессы перечитывают версии всех корзин одним get_many не
+чаще раза в CHECK_INTERVAL секунд и перестают доверять локальным копиям
+из корзин, версия которых сменилась. Так чужие записи становятся видны
+не позже чем через CHECK_INTERVAL, а локальные — сразу.
+
+Счетчики (incr) версию корзины не меняют: иначе каждый инкремент
+сбрасывал бы локальные копии всех ключей корзины. Ключи счетчиков
+перечисляются в SHARED_PREFIXES и читаются и пишутся прямо в общем
+кэше, минуя память процесса.
+"""
+
+import pickle
+import threading
+import time
+import zlib
+from collections import Counter, OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.utils.functional import cached_property
+
+MISSING = object()
+STAMP_PREFIX = 'two-tier:bucket:'
+
+
+class TwoTierCache(BaseCache):
+    """
+    OPTIONS:
+        SHARED — имя общего кэша в CACHES (по умолчанию 'shared');
+        LOCAL_MAX_ENTRIES — сколько ключей держать в памяти процесса;
+        LOCAL_TIMEOUT — сколько секунд живет локальная копия;
+        CHECK_INTERVAL — как часто перечитывать версии корзин;
+        BUCKETS — число корзин;
+        SHARED_PREFIXES — префиксы ключей, которые не копируются в
+            память процесса (счетчики).
+    """
+
+    def __init__(self, location, params):
+        options = dict(params.get('OPTIONS', {}))
+        self.shared_alias = options.pop('SHARED', location or 'shared')
+        self.max_entries = options.pop('LOCAL_MAX_ENTRIES', 1000)
+        self.local_timeout = options.pop('LOCAL_TIMEOUT', 60)
+        self.check_interval = options.pop('CHECK_INTERVAL', 1)
+        self.buckets = options.pop('BUCKETS', 64)
+        self.shared_prefixes = tuple(options.pop('SHARED_PREFIXES', ()))
+        super().__init__(dict(params, OPTIONS=options))
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+        self._stamps = [None] * self.buckets
+        self._checked = 0
+        self._stats = Counter()
+
+    @cached_property
+    def shared(self):
+        return caches[self.shared_alias]
+
+    def _direct(self, key):
+        return key.startswith(self.shared_prefixes)
+
+    def _bucket(self, key):
+        return zlib.crc32(key.encode()) % self.buckets
+
+    def _stamp_key(self, bucket):
+        return f'{STAMP_PREFIX}{bucket}'
+
+    def _refresh_stamps(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._checked < self.check_interval:
+            return
+        keys = [self._stamp_key(bucket) for bucket in range(self.buckets)]
+        found = self.shared.get_many(keys)
+        for key in keys:
+            if key not in found:
+                # Общий кэш очищен или метка вытеснена: новая метка
+                # отличается от всех, что запомнили процессы.
+                stamp = time.time_ns()
+                if not self.shared.add(key, stamp, None):
+                    stamp = self.shared.get(key, stamp)
+                found[key] = stamp
+        with self._lock:
+            self._stamps = [found[key] for key in keys]
+            self._checked = now
+
+    def _bump(self, buckets):
+        if not buckets:
+            return
+        stamp = time.time_ns()
+        self.shared.set_many(
+            {self._stamp_key(bucket): stamp for bucket in buckets}, None)
+        with self._lock:
+            for bucket in buckets:
+                self._stamps[bucket] = stamp
+
+    def _local_get(self, key):
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is not None:
+                value, expires, bucket, stamp = entry
+                if expires > time.monotonic() and stamp == self._stamps[
+                        bucket]:
+                    self._local.move_to_end(key)
+                    self._stats['local_hits'] += 1
+                    return pickle.loads(value)
+                del self._local[key]
+            self._stats['local_misses'] += 1
+            return MISSING
+
+    def _local_set(self, key, value, timeout=DEFAULT_TIMEOUT, stamp=MISSING):
+        """Кладет копию в память. stamp — версия корзины до чтения из
+        общего кэша: если корзину сменили во время чтения, копия сразу
+        окажется устаревшей."""
+        lifetime = self.local_timeout
+        if timeout is not DEFAULT_TIMEOUT and timeout is not None:
+            lifetime = min(lifetime, timeout)
+        if lifetime <= 0:
+            self._local_delete(key)
+            return
+        bucket = self._bucket(key)
+        value = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            if stamp is MISSING:
+                stamp = self._stamps[bucket]
+            self._local[key] = (value, time.monotonic() + lifetime, bucket,
+                                stamp)
+            self._local.move_to_end(key)
+            while len(self._local) > self.max_entries:
+                self._local.popitem(last=False)
+
+    def _local_delete(self, key):
+        with self._lock:
+            self._local.pop(key, None)
+
+    def _count_shared(self, hit):
+        with self._lock:
+            self._stats['shared_hits' if hit else 'shared_misses'] += 1
+
+    def _stamp(self, key):
+        with self._lock:
+            return self._stamps[self._bucket(key)]
+
+    def get(self, key, default=None, version=None):
+        if self._direct(key):
+            return self.shared.get(key, default, version=version)
+        local_key = self.make_key(key, version)
+        self.validate_key(local_key)
+        self._refresh_stamps()
+        value = self._local_get(local_key)
+        if value is not MISSING:
+            return value
+        stamp = self._stamp(local_key)
+        value = self.shared.get(key, MISSING, version=version)
+        self._count_shared(value is not MISSING)
+        if value is MISSING:
+            return default
+        self._local_set(local_key, value, stamp=stamp)
+        return value
+
+    def get_many(self, keys, version=None):
+        self._refresh_stamps()
+        found = {}
+        missing = {}
+        for key in keys:
+            local_key = self.make_key(key, version)
+            if self._direct(key):
+                missing[key] = (local_key, None)
+                continue
+            value = self._local_get(local_key)
+            if value is MISSING:
+                missing[key] = (local_key, self._stamp(local_key))
+            else:
+                found[key] = value
+        if missing:
+            shared = self.shared.get_many(missing, version=version)
+            for key, (local_key, stamp) in missing.items():
+                if self._direct(key):
+                    continue
+                self._count_shared(key in shared)
+                if key in shared:
+                    self._local_set(local_key, shared[key], stamp=stamp)
+            found.update(shared)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout, version=version)
+        if not self._direct(key):
+            local_key = self.make_key(key, version)
+            self._bump([self._bucket(local_key)])
+            self._local_set(local_key, value, timeout)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.shared.set_many(data, timeout, version=version)
+        local_keys = {key: self.make_key(key, version) for key in data
+                      if not self._direct(key)}
+        self._bump({self._bucket(key) for key in local_keys.values()})
+        for key, local_key in local_keys.items():
+            if key not in failed:
+                self._local_set(local_key, data[key], timeout)
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        # Как и set, добавление меняет версию корзины: у других процессов
+        # могла остаться копия ключа, истекшего в общем кэше.
+        added = self.shared.add(key, value, timeout, version=version)
+        if added and not self._direct(key):
+            local_key = self.make_key(key, version)
+            self._bump([self._bucket(local_key)])
+            self._local_set(local_key, value, timeout)
+        return added
+
+    def delete(self, key, version=None):
+        self.shared.delete(key, version=version)
+        if not self._direct(key):
+            local_key = self.make_key(key, version)
+            self._bump([self._bucket(local_key)])
+            self._local_delete(local_key)
+
+    def delete_many(self, keys, version=None):
+        self.shared.delete_many(keys, version=version)
+        local_keys = [self.make_key(key, version) for key in keys
+                      if not self._direct(key)]
+        self._bump({self._bucket(key) for key in local_keys})
+        for key in local_keys:
+            self._local_delete(key)
+
+    def incr(self, key, delta=1, version=None):
+        """Прибавляет delta в общем кэше, не меняя версию корзины.
+
+        Своя копия ключа удаляется, а копии других процессов живут до
+        LOCAL_TIMEOUT, поэтому ключи счетчиков нужно указывать в
+        SHARED_PREFIXES.
+        """
+        value = self.shared.incr(key, delta, version=version)
+        self._local_delete(self.make_key(key, version))
+        return value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.shared.touch(key, timeout, version=version)
+
+    def has_key(self, key, version=None):
+        return self.get(key, MISSING, version=version) is not MISSING
+
+    def clear(self):
+        self.shared.clear()
+        with self._lock:
+            self._local.clear()
+        self._refresh_stamps(force=True)
+
+    def stats(self):
+        """Попадания и промахи по уровням с момента запуска процесса и
+        счетчики общего кэша, если он их ведет."""
+        shared = getattr(self.shared, 'stats', dict)()
+        with self._lock:
+            return dict(shared, **self._stats,
+                        local_entries=len(self._local))
@@ -0,0 +1,61 @@
+"""SQLite с настраиваемыми PRAGMA и режимом начала транзакций.
+
+OPTIONS:
+    pragmas — словарь PRAGMA, которые выполняются на каждом новом
+        соединении, например {'journal_mode': 'wal', 'busy_timeout': 5000};
+    transaction_mode — 'DEFERRED', 'IMMEDIATE' или 'EXCLUSIVE' для BEGIN
+        в transaction.atomic.
+
+В режиме WAL читатели не ждут писателей. Но транзакция, начатая обычным
+BEGIN, берет блокировку записи только на первой записи, и если база
+уже изменилась, SQLite сразу отвечает «database is locked», не дожидаясь
+busy_timeout. BEGIN IMMEDIATE берет блокировку в начале транзакции,
+поэтому писатели встают в очередь по busy_timeout.
+"""
+
+import re
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+PRAGMAS = ('journal_mode', 'synchronous', 'mmap_size', 'cache_size',
+           'busy_timeout', 'temp_store', 'wal_autocheckpoint')
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+VALUE = re.compile(r'-?\d+|[A-Za-z]+')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def __init__(self, settings_dict, *args, **kwargs):
+        super().__init__(settings_dict, *args, **kwargs)
+        options = self.settings_dict['OPTIONS']
+        self.pragmas = dict(options.get('pragmas', {}))
+        self.transaction_mode = options.get('transaction_mode')
+        for name, value in self.pragmas.items():
+            if name not in PRAGMAS or not VALUE.fullmatch(str(value)):
+                raise ImproperlyConfigured(
+                    f'Недопустимая PRAGMA {name} = {value!r}.')
+        if (self.transaction_mode is not None
+                and self.transaction_mode not in TRANSACTION_MODES):
+            raise ImproperlyConfigured(
+                f'transaction_mode: одно из {", ".join(TRANSACTION_MODES)}.')
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        params.pop('pragmas', None)
+        params.pop('transaction_mode', None)
+        return params
+
+    def get_new_connection(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            connection.execute(f'PRAGMA {name} = {value}')
+        return connection
+
+    def begin_statement(self):
+        if self.transaction_mode is None:
+            return 'BEGIN'
+        return f'BEGIN {self.transaction_mode}'
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute(self.begin_statement())
@@ -0,0 +1,29 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from core import sqlite_benchmark
+
+
+class Command(BaseCommand):
+    help = ('Нагружает SQLite читателями и писателями в нескольких потоках '
+            'со стандартным и настроенным бэкендом и выводит JSON')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--profile', action='append', dest='profiles',
+            choices=sorted(sqlite_benchmark.profiles()),
+            help='Профиль для замера; по умолчанию все')
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument('--seconds', type=float, default=5.0)
+        parser.add_argument(
+            '--directory',
+            help='Каталог для файлов баз; по умолчанию временный')
+
+    def handle(self, *args, **options):
+        report = sqlite_benchmark.run(
+            names=options['profiles'], readers=options['readers'],
+            writers=options['writers'], seconds=options['seconds'],
+            directory=options['directory'])
+        self.stdout.write(json.dumps(report, ensure_ascii=False, indent=2))
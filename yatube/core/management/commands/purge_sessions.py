@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core import sessions
+
+
+class Command(BaseCommand):
+    help = ('Удаляет истекшие сессии из базы пачками, не блокируя '
+            'таблицу надолго')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int,
+                            default=sessions.BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        deleted = sessions.purge_expired(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Удалено истекших сессий: {deleted}'))
+        if settings.SESSION_MODE == 'signed_cookies':
+            self.stdout.write('Сессии хранятся в cookie: новых записей в '
+                              'базе не появляется')
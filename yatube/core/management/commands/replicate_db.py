@@ -0,0 +1,41 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from core import replicas
+
+
+class Command(BaseCommand):
+    help = ('Копирует основную базу SQLite в реплики из DB_REPLICAS; с '
+            '--interval повторяет копирование в цикле')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--alias', action='append', dest='aliases',
+            help='Реплика для копирования; по умолчанию все')
+        parser.add_argument(
+            '--interval', type=float,
+            help='Секунд между копированиями; по умолчанию один раз. '
+                 'Должно быть заметно меньше REPLICA_MAX_LAG')
+
+    def handle(self, *args, **options):
+        aliases = options['aliases'] or settings.DATABASE_REPLICAS
+        if not aliases:
+            raise CommandError('Реплики не настроены: задайте DB_REPLICAS.')
+        for alias in aliases + ['default']:
+            if alias != 'default' and alias not in settings.DATABASE_REPLICAS:
+                raise CommandError(f'{alias} — не реплика.')
+            if connections[alias].vendor != 'sqlite':
+                raise CommandError('replicate_db копирует только SQLite; '
+                                   'другие базы реплицируются сами.')
+        while True:
+            for alias in aliases:
+                started = time.perf_counter()
+                replicas.replicate(alias)
+                elapsed = (time.perf_counter() - started) * 1000
+                self.stdout.write(f'{alias}: {elapsed:.0f} мс')
+            if options['interval'] is None:
+                return
+            time.sleep(options['interval'])
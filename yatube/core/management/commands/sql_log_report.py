@@ -0,0 +1,73 @@
+import glob
+import json
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import sqllog
+
+
+class Command(BaseCommand):
+    help = ('Сводка журнала SQL-запросов: какие запросы, сгруппированные '
+            'по отпечатку, занимают больше всего времени базы')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'files', nargs='*',
+            help='Файлы журнала; по умолчанию SQL_LOG_FILE и его архивы')
+        parser.add_argument('--view', help='Только страницы этого URL')
+        parser.add_argument('--limit', type=int, default=15)
+        parser.add_argument('--json', action='store_true',
+                            help='Вывести сводку в JSON')
+
+    def handle(self, *args, **options):
+        files = options['files'] or sorted(
+            glob.glob(glob.escape(settings.SQL_LOG_FILE) + '*'))
+        if not files:
+            raise CommandError('Журнал SQL-запросов пуст.')
+        groups = defaultdict(lambda: {
+            'count': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+            'requests': set(), 'views': Counter(), 'call_sites': Counter(),
+        })
+        total_ms = 0.0
+        for entry in sqllog.read(files):
+            if options['view'] and entry['view'] != options['view']:
+                continue
+            group = groups[sqllog.fingerprint(entry['sql'])]
+            group['count'] += 1
+            group['total_ms'] += entry['ms']
+            group['max_ms'] = max(group['max_ms'], entry['ms'])
+            group['requests'].add(entry['request'])
+            group['views'][entry['view']] += 1
+            if entry['stack']:
+                group['call_sites'][entry['stack'][0]] += 1
+            total_ms += entry['ms']
+        report = [
+            {
+                'fingerprint': fingerprint,
+                'count': group['count'],
+                'requests': len(group['requests']),
+                'total_ms': round(group['total_ms'], 3),
+                'share': round(group['total_ms'] / total_ms, 4)
+                if total_ms else 0,
+                'mean_ms': round(group['total_ms'] / group['count'], 3),
+                'max_ms': group['max_ms'],
+                'views': dict(group['views'].most_common()),
+                'call_site': next(iter(group['call_sites'].most_common(1)),
+                                  (None,))[0],
+            }
+            for fingerprint, group in sorted(
+                groups.items(), key=lambda item: -item[1]['total_ms'])
+        ][:options['limit']]
+        if options['json']:
+            self.stdout.write(json.dumps(report, ensure_ascii=False,
+                                         indent=2))
+            return
+        for row in report:
+            self.stdout.write(
+                f'{row["total_ms"]:10.1f} мс {row["share"]:6.1%} '
+                f'{row["count"]:6} раз  {row["call_site"] or "?"}')
+            self.stdout.write(f'    {row["fingerprint"][:200]}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Всего времени базы: {total_ms:.1f} мс'))
@@ -0,0 +1,179 @@
+"""Метрики запросов по именам URL в формате Prometheus.
+
+Значения копятся в памяти процесса: у каждого воркера сервера своя
+таблица, Prometheus собирает их по отдельности. Обновление — несколько
+сложений под одной блокировкой на запрос.
+"""
+
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+from contextvars import ContextVar
+
+from django.core.cache import cache
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576)
+
+current = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    """Счетчики одного запроса; их пополняют БД, шаблоны и кэш."""
+    __slots__ = ('queries', 'db_seconds', 'template_seconds',
+                 'cache_hits', 'cache_misses', 'page_cache_hits',
+                 'page_cache_misses')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.template_seconds = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.page_cache_hits = 0
+        self.page_cache_misses = 0
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self, name, labels):
+        cumulative = 0
+        bounds = [*map(str, self.buckets), '+Inf']
+        for bound, count in zip(bounds, self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels},le="{bound}"}}', cumulative
+        yield f'{name}_sum{{{labels}}}', self.sum
+        yield f'{name}_count{{{labels}}}', self.count
+
+
+class ViewStats:
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.response_bytes = Histogram(SIZE_BUCKETS)
+        self.statuses = defaultdict(int)
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.template_seconds = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.page_cache_hits = 0
+        self.page_cache_misses = 0
+
+
+COUNTERS = (
+    ('queries', 'yatube_db_queries_total', 'SQL-запросы'),
+    ('db_seconds', 'yatube_db_seconds_total', 'Время в базе, с'),
+    ('template_seconds', 'yatube_template_seconds_total',
+     'Время рендеринга шаблонов, с'),
+    ('cache_hits', 'yatube_cache_hits_total', 'Попадания в кэш фрагментов'),
+    ('cache_misses', 'yatube_cache_misses_total',
+     'Промахи кэша фрагментов'),
+    ('page_cache_hits', 'yatube_page_cache_hits_total',
+     'Ответы гостям из кэша страниц'),
+    ('page_cache_misses', 'yatube_page_cache_misses_total',
+     'Промахи кэша страниц'),
+)
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = defaultdict(ViewStats)
+
+    def observe(self, view, status, seconds, size, request_metrics):
+        with self.lock:
+            stats = self.views[view]
+            stats.latency.observe(seconds)
+            if size is not None:
+                stats.response_bytes.observe(size)
+            stats.statuses[status] += 1
+            for attribute, *_ in COUNTERS:
+                setattr(stats, attribute, getattr(stats, attribute)
+                        + getattr(request_metrics, attribute))
+
+    def clear(self):
+        with self.lock:
+            self.views.clear()
+
+    def render(self):
+        with self.lock:
+            views = sorted(self.views.items())
+            lines = [
+                '# HELP yatube_requests_total Ответы по коду статуса',
+                '# TYPE yatube_requests_total counter',
+            ]
+            for view, stats in views:
+                for status, count in sorted(stats.statuses.items()):
+                    lines.append(f'yatube_requests_total{{view="{view}",'
+                                 f'status="{status}"}} {count}')
+            for name, attribute, help_text in (
+                ('yatube_request_seconds', 'latency',
+                 'Время ответа, с'),
+                ('yatube_response_bytes', 'response_bytes',
+                 'Размер тела ответа, байт'),
+            ):
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} histogram')
+                for view, stats in views:
+                    lines.extend(
+                        f'{sample} {value}' for sample, value in getattr(
+                            stats, attribute).samples(name, f'view="{view}"'))
+            for attribute, name, help_text in COUNTERS:
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} counter')
+                for view, stats in views:
+                    lines.append(
+                        f'{name}{{view="{view}"}} '
+                        f'{getattr(stats, attribute)}')
+        lines.extend(cache_tier_lines())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+def cache_tier_lines():
+    """Попадания по уровням кэша, если бэкенд их считает (TwoTierCache)."""
+    if not hasattr(cache, 'stats'):
+        return []
+    stats = cache.stats()
+    lines = [
+        '# HELP yatube_cache_tier_requests_total Чтения кэша по уровням',
+        '# TYPE yatube_cache_tier_requests_total counter',
+    ]
+    for tier in ('local', 'shared'):
+        for outcome in ('hits', 'misses'):
+            lines.append(
+                f'yatube_cache_tier_requests_total{{tier="{tier}",'
+                f'outcome="{outcome}"}} {stats.get(f"{tier}_{outcome}", 0)}')
+    lines += [
+        '# HELP yatube_cache_local_entries Ключей в памяти процесса',
+        '# TYPE yatube_cache_local_entries gauge',
+        f'yatube_cache_local_entries {stats["local_entries"]}',
+    ]
+    if 'oversize' in stats:
+        lines += [
+            '# HELP yatube_cache_oversize_total Значения больше ячейки '
+            'общего кэша, которые не сохранились',
+            '# TYPE yatube_cache_oversize_total counter',
+            f'yatube_cache_oversize_total {stats["oversize"]}',
+        ]
+    return lines
+
+
+def add(attribute, value=1):
+    """Добавляет значение к счетчику текущего запроса, если он идет."""
+    request_metrics = current.get()
+    if request_metrics is not None:
+        setattr(request_metrics, attribute,
+                getattr(request_metrics, attribute) + value)
@@ -0,0 +1,112 @@
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+
+from . import metrics, replicas, sqllog
+
+
+def count_query(execute, sql, params, many, context):
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.add('queries')
+        metrics.add('db_seconds', time.perf_counter() - started)
+
+
+class MetricsMiddleware:
+    """Собирает метрики запроса по имени URL; ставится первым в списке."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request_metrics = metrics.RequestMetrics()
+        token = metrics.current.set(request_metrics)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(count_query))
+                response = self.get_response(request)
+        finally:
+            metrics.current.reset(token)
+        match = getattr(request, 'resolver_match', None)
+        metrics.registry.observe(
+            match.view_name if match else 'unmatched',
+            response.status_code,
+            time.perf_counter() - started,
+            None if response.streaming else len(response.content),
+            request_metrics,
+        )
+        return response
+
+
+class SqlLogMiddleware:
+    """Пишет SQL-запросы выбранных страниц в журнал core.sqllog."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not sqllog.enabled():
+            return self.get_response(request)
+        sampled = sqllog.sample()
+        capture = sqllog.Capture(sampled)
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(capture))
+            response = self.get_response(request)
+        request_ms = (time.perf_counter() - started) * 1000
+        why = sqllog.reason(request_ms, sampled)
+        if why is not None:
+            match = getattr(request, 'resolver_match', None)
+            sqllog.write(request, match.view_name if match else 'unmatched',
+                         response.status_code, request_ms, why,
+                         capture.queries)
+        return response
+
+
+class ReplicaMiddleware:
+    """Чтения view, помеченных replicas.reads, — с реплик (core.replicas)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state = replicas.State()
+        token = replicas.current.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            replicas.current.reset(token)
+        if state.wrote and settings.DATABASE_REPLICAS:
+            response.set_cookie(replicas.PIN_COOKIE, '1',
+                                max_age=settings.REPLICA_PIN_SECONDS,
+                                httponly=True)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        changed_at = getattr(view_func, 'replica_changed_at', None)
+        if (changed_at is None or not settings.DATABASE_REPLICAS
+                or request.method not in ('GET', 'HEAD')
+                or replicas.PIN_COOKIE in request.COOKIES):
+            return None
+        state = replicas.current.get()
+        state.alias = replicas.choose(changed_at(request, **view_kwargs))
+        request.replica_view = (view_func, view_args, view_kwargs)
+        return None
+
+    def process_exception(self, request, exception):
+        state = replicas.current.get()
+        if (state is None or state.alias is None
+                or not isinstance(exception, DatabaseError)):
+            return None
+        replicas.mark_down(state.alias)
+        state.alias = None
+        view_func, view_args, view_kwargs = request.replica_view
+        return view_func(request, *view_args, **view_kwargs)
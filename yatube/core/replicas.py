@@ -0,0 +1,135 @@
+"""Чтение страниц с реплик базы.
+
+Реплики — копии основной базы, которые обновляет команда replicate_db
+и отмечает в кэше время снимка. ReplicaMiddleware направляет на
+реплику чтения только view, помеченных reads(changed_at), и только
+GET-запросов. Реплика берется, если ее снимок:
+
+- не старше REPLICA_MAX_LAG секунд — остановленная репликация не
+  отдает старые данные;
+- снят после изменения данных страницы (changed_at, время в нс) —
+  иначе устаревшая страница попала бы в кэш под новой версией.
+
+Клиент, который что-то записал, получает cookie на
+REPLICA_PIN_SECONDS и все это время читает с основной базы: так он
+видит свои записи. Ошибка базы на реплике выводит ее из ротации на
+REPLICA_RETRY_SECONDS, а view повторяется на основной базе. Сессии
+всегда читаются с основной базы.
+"""
+
+import os
+import random
+import sqlite3
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+PIN_COOKIE = 'db_pin'
+SYNCED_KEY = 'replicas:synced:'
+PRIMARY_APPS = ('sessions',)
+
+current = ContextVar('replica_state', default=None)
+_down = {}
+
+
+class State:
+    """Куда читает текущий запрос и писал ли он в базу."""
+    __slots__ = ('alias', 'wrote')
+
+    def __init__(self):
+        self.alias = None
+        self.wrote = False
+
+
+def reads(changed_at):
+    """Разрешает view читать с реплик.
+
+    changed_at(request, **kwargs) возвращает время последнего изменения
+    данных страницы в наносекундах (0, если неизвестно).
+    """
+    def decorator(view):
+        view.replica_changed_at = changed_at
+        return view
+    return decorator
+
+
+def mark_synced(alias, synced_at):
+    cache.set(SYNCED_KEY + alias, synced_at, None)
+
+
+def replicate(alias):
+    """Копирует основную базу SQLite в реплику alias через backup API.
+
+    Читатели реплики на время копирования ждут, но видят либо старый,
+    либо новый снимок целиком. В снимке есть все, что было записано до
+    начала копирования; это время и отмечается в кэше.
+    """
+    synced_at = time.time_ns()
+    source = connections['default']
+    source.ensure_connection()
+    # Свое соединение с репликой закрываем, чтобы не читать из него
+    # старые страницы.
+    connections[alias].close()
+    target = sqlite3.connect(connections[alias].settings_dict['NAME'])
+    try:
+        source.connection.backup(target)
+    finally:
+        target.close()
+    mark_synced(alias, synced_at)
+    return synced_at
+
+
+def mark_down(alias):
+    _down[alias] = time.monotonic() + settings.REPLICA_RETRY_SECONDS
+
+
+def available(alias):
+    if _down.get(alias, 0) > time.monotonic():
+        return False
+    connection = connections[alias]
+    # SQLite создаст пустой файл вместо отсутствующей реплики.
+    return not (connection.vendor == 'sqlite'
+                and not os.path.exists(connection.settings_dict['NAME']))
+
+
+def choose(changed_at):
+    """Случайная реплика, на которой есть изменения до changed_at,
+    или None — тогда читаем с основной базы."""
+    aliases = [alias for alias in settings.DATABASE_REPLICAS
+               if available(alias)]
+    if not aliases:
+        return None
+    synced = cache.get_many([SYNCED_KEY + alias for alias in aliases])
+    oldest = max(changed_at,
+                 time.time_ns() - settings.REPLICA_MAX_LAG * 10 ** 9)
+    fresh = [alias for alias in aliases
+             if synced.get(SYNCED_KEY + alias, 0) >= oldest]
+    return random.choice(fresh) if fresh else None
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = current.get()
+        if state is None or model._meta.app_label in PRIMARY_APPS:
+            return None
+        return state.alias
+
+    def db_for_write(self, model, **hints):
+        state = current.get()
+        if state is not None:
+            # Дальше в этом запросе читаем свои записи.
+            state.alias = None
+            state.wrote = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        # Реплики получают схему вместе с данными от replicate_db.
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
@@ -0,0 +1,28 @@
+"""Удаление истекших сессий из базы пачками.
+
+clearsessions удаляет все истекшие записи одним DELETE, который на
+большой таблице надолго блокирует запись в базу. Здесь каждая пачка
+удаляется в своей транзакции по индексу expire_date.
+"""
+
+from django.contrib.sessions.models import Session
+from django.db import transaction
+from django.utils import timezone
+
+BATCH_SIZE = 1000
+
+
+def purge_expired(batch_size=BATCH_SIZE, now=None):
+    """Удаляет сессии, истекшие к now; возвращает их число."""
+    if now is None:
+        now = timezone.now()
+    deleted = 0
+    while True:
+        with transaction.atomic():
+            keys = list(Session.objects.filter(
+                expire_date__lt=now
+            ).order_by().values_list('session_key', flat=True)[:batch_size])
+            if not keys:
+                return deleted
+            deleted += Session.objects.filter(
+                session_key__in=keys).delete()[0]
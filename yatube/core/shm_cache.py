@@ -0,0 +1,327 @@
+"""Кэш в общей памяти для воркеров на одной машине.
+
+Данные лежат в файле, отображенном в память (mmap): лучше всего на
+tmpfs, например /dev/shm. Файл — хэш-таблица из SLOTS ячеек по
+SLOT_SIZE байт, разбитых на наборы по WAYS ячеек. Ключ попадает в
+набор по хэшу. Если набор заполнен, ячейку для нового ключа выбирает
+алгоритм «часы»: чтение ставит ячейке бит обращения, а стрелка набора
+пропускает ячейки с битом, снимая его, и вытесняет первую без бита.
+
+Изменения набора идут под блокировкой диапазона его байтов
+(fcntl.lockf), так что процессы ждут друг друга только на одном
+наборе, а incr и add атомарны для всех воркеров.
+
+Ключ и значение (pickle) должны уместиться в ячейку: SLOT_SIZE минус
+32 байта заголовка, при SLOT_SIZE=32768 — около 32 КБ. Более длинные
+значения не кэшируются, старое значение ключа при этом удаляется, а
+счетчик oversize в stats() растет (метрика
+yatube_cache_oversize_total). Если счетчик растет, SLOT_SIZE мал для
+страниц сайта.
+"""
+
+import fcntl
+import hashlib
+import mmap
+import os
+import pickle
+import struct
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+MAGIC = b'YTSHM001'
+HEADER = struct.Struct('<8sIII')
+HEADER_SIZE = 64
+# Состояние, бит обращения, хэш ключа, срок, длины ключа и значения.
+SLOT = struct.Struct('<BB6xQdII')
+EMPTY, USED = 0, 1
+
+_tables = {}
+_tables_lock = threading.Lock()
+
+
+class Table:
+    """Файл кэша, открытый в текущем процессе."""
+
+    def __init__(self, path, slots, slot_size, ways):
+        self.path = path
+        self.pid = os.getpid()
+        self.ways = ways
+        self.sets = max(slots // ways, 1)
+        self.slot_size = slot_size
+        self.payload = slot_size - SLOT.size
+        # Сколько значений не поместилось в ячейку (под self.lock).
+        self.oversize = 0
+        hands = -(-self.sets // 8) * 8
+        self.data_start = HEADER_SIZE + hands
+        self.size = self.data_start + self.sets * ways * slot_size
+        # Блокировки fcntl принадлежат процессу, потоки разделяет эта.
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.fd = self.open(HEADER.pack(MAGIC, self.sets, slot_size, ways))
+        self.map = mmap.mmap(self.fd, self.size)
+
+    def open(self, header):
+        """Открывает файл, создавая его, если разметка другая.
+
+        Файл с другой разметкой не обрезается, а подменяется новым:
+        старые процессы дорабатывают со своим отображением и не получат
+        SIGBUS.
+        """
+        while True:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            fcntl.lockf(fd, fcntl.LOCK_EX)
+            if os.fstat(fd).st_ino != os.stat(self.path).st_ino:
+                # Пока ждали блокировку, файл подменил другой процесс;
+                # закрытие снимает блокировку.
+                os.close(fd)
+                continue
+            size = os.fstat(fd).st_size
+            if not size:
+                self.init(fd, header)
+            elif size != self.size or os.pread(
+                    fd, HEADER.size, 0) != header:
+                temporary = f'{self.path}.{os.getpid()}'
+                new_fd = os.open(temporary,
+                                 os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o600)
+                self.init(new_fd, header)
+                os.replace(temporary, self.path)
+                os.close(fd)
+                return new_fd
+            fcntl.lockf(fd, fcntl.LOCK_UN)
+            return fd
+
+    def init(self, fd, header):
+        os.ftruncate(fd, self.size)
+        os.pwrite(fd, header, 0)
+
+    @contextmanager
+    def locked(self, index=None):
+        """Блокирует набор index или, без него, весь файл."""
+        if index is None:
+            start, length = 0, 0
+        else:
+            start, length = self.set_offset(index), self.ways * self.slot_size
+        with self.lock:
+            fcntl.lockf(self.fd, fcntl.LOCK_EX, length, start)
+            try:
+                yield
+            finally:
+                fcntl.lockf(self.fd, fcntl.LOCK_UN, length, start)
+
+    def set_offset(self, index):
+        return self.data_start + index * self.ways * self.slot_size
+
+    def slot_offsets(self, index):
+        start = self.set_offset(index)
+        return range(start, start + self.ways * self.slot_size,
+                     self.slot_size)
+
+    def find(self, index, digest, key):
+        """Смещение живой ячейки с ключом key или None."""
+        now = time.time()
+        for offset in self.slot_offsets(index):
+            state, _, slot_digest, expires, key_length, _ = (
+                SLOT.unpack_from(self.map, offset))
+            if state != USED or slot_digest != digest:
+                continue
+            start = offset + SLOT.size
+            if self.map[start:start + key_length] != key:
+                continue
+            if expires and expires <= now:
+                self.map[offset] = EMPTY
+                return None
+            return offset
+        return None
+
+    def read(self, offset):
+        _, _, _, _, key_length, value_length = SLOT.unpack_from(
+            self.map, offset)
+        self.map[offset + 1] = 1
+        start = offset + SLOT.size + key_length
+        return self.map[start:start + value_length]
+
+    def free_slot(self, index):
+        """Пустая или просроченная ячейка набора, иначе жертва «часов»."""
+        now = time.time()
+        offsets = self.slot_offsets(index)
+        for offset in offsets:
+            state, _, _, expires, _, _ = SLOT.unpack_from(self.map, offset)
+            if state != USED or (expires and expires <= now):
+                return offset
+        hand_offset = HEADER_SIZE + index
+        hand = self.map[hand_offset] % self.ways
+        while True:
+            offset = offsets[hand]
+            hand = (hand + 1) % self.ways
+            if self.map[offset + 1]:
+                self.map[offset + 1] = 0
+            else:
+                self.map[hand_offset] = hand
+                return offset
+
+    def write(self, offset, digest, key, value, expires):
+        SLOT.pack_into(self.map, offset, USED, 0, digest, expires or 0.0,
+                       len(key), len(value))
+        start = offset + SLOT.size
+        self.map[start:start + len(key) + len(value)] = key + value
+
+    def store(self, index, digest, key, value, expires):
+        offset = self.find(index, digest, key)
+        if offset is None:
+            offset = self.free_slot(index)
+        self.write(offset, digest, key, value, expires)
+
+    def clear(self):
+        with self.locked():
+            for index in range(self.sets):
+                for offset in self.slot_offsets(index):
+                    self.map[offset] = EMPTY
+
+
+def get_table(path, slots, slot_size, ways):
+    """Таблица файла path; после fork процесс открывает файл заново."""
+    key = (path, slots, slot_size, ways)
+    with _tables_lock:
+        table = _tables.get(key)
+        if table is None or table.pid != os.getpid():
+            table = _tables[key] = Table(*key)
+        return table
+
+
+class SharedMemoryCache(BaseCache):
+    """
+    LOCATION — путь к файлу кэша.
+
+    OPTIONS:
+        SLOTS — число ячеек;
+        SLOT_SIZE — размер ячейки в байтах вместе с ключом;
+        WAYS — ячеек в наборе.
+    """
+
+    def __init__(self, location, params):
+        options = dict(params.get('OPTIONS', {}))
+        self.slots = options.pop('SLOTS', 2048)
+        self.slot_size = options.pop('SLOT_SIZE', 32768)
+        self.ways = options.pop('WAYS', 8)
+        super().__init__(dict(params, OPTIONS=options))
+        self.path = location
+        self._table = None
+
+    @property
+    def table(self):
+        table = self._table
+        if table is None or table.pid != os.getpid():
+            table = self._table = get_table(
+                self.path, self.slots, self.slot_size, self.ways)
+        return table
+
+    def _locate(self, key, version):
+        key = self.make_key(key, version)
+        self.validate_key(key)
+        raw = key.encode()
+        digest = int.from_bytes(
+            hashlib.blake2b(raw, digest_size=8).digest(), 'little')
+        return digest % self.table.sets, digest, raw
+
+    def _expires(self, timeout):
+        return self.get_backend_timeout(timeout) or 0.0
+
+    def _fits(self, key, value):
+        return len(key) + len(value) <= self.table.payload
+
+    def get(self, key, default=None, version=None):
+        index, digest, raw = self._locate(key, version)
+        table = self.table
+        with table.locked(index):
+            offset = table.find(index, digest, raw)
+            if offset is None:
+                return default
+            value = table.read(offset)
+        return pickle.loads(value)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._set(key, value, timeout, version)
+
+    def _set(self, key, value, timeout, version):
+        index, digest, raw = self._locate(key, version)
+        value = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        table = self.table
+        with table.locked(index):
+            if not self._fits(raw, value):
+                table.oversize += 1
+                # Старое значение не должно пережить неудачную запись.
+                offset = table.find(index, digest, raw)
+                if offset is not None:
+                    table.map[offset] = EMPTY
+                return False
+            table.store(index, digest, raw, value, self._expires(timeout))
+        return True
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        return [key for key, value in data.items()
+                if not self._set(key, value, timeout, version)]
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        index, digest, raw = self._locate(key, version)
+        value = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        table = self.table
+        with table.locked(index):
+            if table.find(index, digest, raw) is not None:
+                return False
+            if not self._fits(raw, value):
+                table.oversize += 1
+                return False
+            table.store(index, digest, raw, value, self._expires(timeout))
+        return True
+
+    def incr(self, key, delta=1, version=None):
+        index, digest, raw = self._locate(key, version)
+        table = self.table
+        with table.locked(index):
+            offset = table.find(index, digest, raw)
+            if offset is None:
+                raise ValueError(f"Key '{key}' not found")
+            expires = SLOT.unpack_from(table.map, offset)[3]
+            value = pickle.loads(table.read(offset)) + delta
+            table.write(offset, digest, raw,
+                        pickle.dumps(value, pickle.HIGHEST_PROTOCOL),
+                        expires)
+        return value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        index, digest, raw = self._locate(key, version)
+        table = self.table
+        with table.locked(index):
+            offset = table.find(index, digest, raw)
+            if offset is None:
+                return False
+            fields = list(SLOT.unpack_from(table.map, offset))
+            fields[3] = self._expires(timeout)
+            SLOT.pack_into(table.map, offset, *fields)
+        return True
+
+    def delete(self, key, version=None):
+        index, digest, raw = self._locate(key, version)
+        table = self.table
+        with table.locked(index):
+            offset = table.find(index, digest, raw)
+            if offset is not None:
+                table.map[offset] = EMPTY
+
+    def has_key(self, key, version=None):
+        index, digest, raw = self._locate(key, version)
+        table = self.table
+        with table.locked(index):
+            return table.find(index, digest, raw) is not None
+
+    def clear(self):
+        self.table.clear()
+
+    def stats(self):
+        """Сколько значений процесс не смог сохранить из-за размера."""
+        table = self.table
+        with table.lock:
+            return {'oversize': table.oversize}
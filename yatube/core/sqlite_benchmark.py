@@ -0,0 +1,181 @@
+"""Нагрузка на SQLite из нескольких потоков: стандартный бэкенд Django
+против настроенного в DATABASES['default'].
+
+Для каждого профиля создается свой файл базы с таблицами постов,
+комментариев и счетчиков. Читатели открывают «страницу ленты» (три
+SELECT), писатели повторяют add_comment: в одной транзакции читают пост,
+добавляют комментарий и обновляют счетчик. Без CONN_MAX_AGE каждая
+операция открывает новое соединение, как запрос с CONN_MAX_AGE=0, иначе
+поток держит одно соединение. Считаются операции в секунду, задержки и
+ошибки «database is locked».
+"""
+
+import math
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.db import OperationalError
+from django.db.utils import load_backend
+
+POSTS = 1000
+SCHEMA = (
+    'CREATE TABLE post (id INTEGER PRIMARY KEY, text TEXT, '
+    'author_id INTEGER, pub_date REAL)',
+    'CREATE INDEX post_pub_date ON post (pub_date, id)',
+    'CREATE TABLE comment (id INTEGER PRIMARY KEY, post_id INTEGER, '
+    'author_id INTEGER, text TEXT, created REAL)',
+    'CREATE INDEX comment_post ON comment (post_id, created)',
+    'CREATE TABLE counter (scope TEXT PRIMARY KEY, value INTEGER)',
+)
+
+
+def profiles():
+    """{имя: настройки базы}: до (stock) и после (configured)."""
+    default = settings.DATABASES['default']
+    return {
+        'stock': {'ENGINE': 'django.db.backends.sqlite3',
+                  'OPTIONS': {}, 'CONN_MAX_AGE': 0},
+        'configured': {'ENGINE': default['ENGINE'],
+                       'OPTIONS': default.get('OPTIONS', {}),
+                       'CONN_MAX_AGE': default.get('CONN_MAX_AGE', 0)},
+    }
+
+
+def create_database(path):
+    with sqlite3.connect(path) as connection:
+        for statement in SCHEMA:
+            connection.execute(statement)
+        now = time.time()
+        connection.executemany(
+            'INSERT INTO post (text, author_id, pub_date) VALUES (?, ?, ?)',
+            ((f'Post {i}', i % 50, now - i) for i in range(POSTS)))
+        connection.execute("INSERT INTO counter VALUES ('total', 0)")
+    connection.close()
+
+
+def wrapper(profile, path):
+    """Соединение Django (DatabaseWrapper) с базой path."""
+    backend = load_backend(profile['ENGINE'])
+    return backend.DatabaseWrapper({
+        'NAME': path, 'OPTIONS': profile['OPTIONS'],
+        'CONN_MAX_AGE': profile['CONN_MAX_AGE'], 'AUTOCOMMIT': True,
+        'ATOMIC_REQUESTS': False, 'TIME_ZONE': None, 'USER': '',
+        'PASSWORD': '', 'HOST': '', 'PORT': '', 'TEST': {},
+    }, 'sqlite-benchmark')
+
+
+def read_page(cursor, number):
+    cursor.execute('SELECT id, text, author_id FROM post '
+                   'ORDER BY pub_date DESC, id DESC LIMIT 10')
+    post_id = cursor.fetchall()[number % 10][0]
+    cursor.execute('SELECT count(*) FROM comment WHERE post_id = ?',
+                   [post_id])
+    cursor.fetchone()
+    cursor.execute("SELECT value FROM counter WHERE scope = 'total'")
+    cursor.fetchone()
+
+
+def add_comment(cursor, number, begin):
+    post_id = number % POSTS + 1
+    cursor.execute(begin)
+    try:
+        cursor.execute('SELECT id FROM post WHERE id = ?', [post_id])
+        cursor.fetchone()
+        cursor.execute(
+            'INSERT INTO comment (post_id, author_id, text, created) '
+            'VALUES (?, ?, ?, ?)', [post_id, number % 50, 'Comment',
+                                    time.time()])
+        cursor.execute("UPDATE counter SET value = value + 1 "
+                       "WHERE scope = 'total'")
+        cursor.execute('COMMIT')
+    except Exception:
+        cursor.execute('ROLLBACK')
+        raise
+
+
+def worker(profile, path, operation, deadline, result):
+    """Гоняет operation до deadline; пишет задержки и ошибки в result."""
+    connection = wrapper(profile, path)
+    begin = getattr(connection, 'begin_statement', lambda: 'BEGIN')()
+    persistent = profile['CONN_MAX_AGE'] != 0
+    number = 0
+    try:
+        while time.perf_counter() < deadline:
+            number += 1
+            started = time.perf_counter()
+            try:
+                connection.ensure_connection()
+                cursor = connection.connection.cursor()
+                if operation == 'read':
+                    read_page(cursor, number)
+                else:
+                    add_comment(cursor, number, begin)
+                result['timings'].append(
+                    (time.perf_counter() - started) * 1000)
+            except (OperationalError, sqlite3.OperationalError) as error:
+                if 'locked' not in str(error) and 'busy' not in str(error):
+                    raise
+                result['lock_errors'] += 1
+            if not persistent:
+                connection.close()
+    finally:
+        connection.close()
+
+
+def percentile(values, percent):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[max(math.ceil(percent / 100 * len(ordered)), 1)
+                         - 1], 3)
+
+
+def measure(profile, path, readers, writers, seconds):
+    deadline = time.perf_counter() + seconds
+    results = {'read': [], 'write': []}
+    threads = []
+    for operation, count in (('read', readers), ('write', writers)):
+        for _ in range(count):
+            result = {'timings': [], 'lock_errors': 0}
+            results[operation].append(result)
+            threads.append(threading.Thread(
+                target=worker,
+                args=(profile, path, operation, deadline, result)))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    report = {}
+    for operation, operation_results in results.items():
+        timings = [value for result in operation_results
+                   for value in result['timings']]
+        report[operation] = {
+            'per_second': round(len(timings) / seconds, 1),
+            'p50_ms': percentile(timings, 50),
+            'p99_ms': percentile(timings, 99),
+            'lock_errors': sum(result['lock_errors']
+                               for result in operation_results),
+        }
+    return report
+
+
+def run(names=None, readers=4, writers=2, seconds=5.0, directory=None):
+    """Возвращает результаты по профилям в виде словаря для JSON."""
+    configs = profiles()
+    results = {}
+    with tempfile.TemporaryDirectory(dir=directory) as workdir:
+        for name in names or configs:
+            path = os.path.join(workdir, f'{name}.sqlite3')
+            create_database(path)
+            results[name] = measure(configs[name], path, readers, writers,
+                                    seconds)
+    return {
+        'readers': readers,
+        'writers': writers,
+        'seconds': seconds,
+        'profiles': results,
+    }
@@ -0,0 +1,162 @@
+"""Выборочная запись SQL-запросов страниц в JSONL-журнал.
+
+Запрос страницы попадает в журнал, если он выпал в доле
+SQL_LOG_SAMPLE_RATE или выполнялся дольше SQL_LOG_SLOW_MS. Каждая строка
+журнала — один SQL-запрос: текст с плейсхолдерами, время, типы
+параметров и места вызова в коде проекта. Обход стека дорог, поэтому
+места вызова пишутся для всех запросов выбранных страниц, а на
+остальных — только для запросов дольше SQL_LOG_STACK_MS. По умолчанию
+запись выключена.
+"""
+
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from logging.handlers import RotatingFileHandler
+
+from django.conf import settings
+from django.utils import timezone
+
+logger = logging.getLogger('yatube.sql')
+logger.propagate = False
+_handler_lock = threading.Lock()
+
+STACK_DEPTH = 5
+# Кадры самого журнала и middleware в месте вызова не нужны.
+SKIPPED_FILES = (
+    os.path.abspath(__file__),
+    os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                 'middleware.py'),
+)
+IN_LIST = re.compile(r'\bIN \((?:%s, )*%s\)', re.IGNORECASE)
+STRING = re.compile(r"'(?:[^']|'')*'")
+NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+SPACES = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    """Текст запроса без значений: одинаковые ORM-вызовы совпадают."""
+    sql = IN_LIST.sub('IN (...)', sql)
+    sql = STRING.sub('?', sql)
+    sql = NUMBER.sub('?', sql).replace('%s', '?')
+    return SPACES.sub(' ', sql).strip()
+
+
+def params_shape(params, many):
+    if many:
+        params = list(params)
+        return {'rows': len(params),
+                'row': params_shape(params[0], False) if params else []}
+    if params is None:
+        return []
+    if isinstance(params, dict):
+        return {key: type(value).__name__ for key, value in params.items()}
+    return [type(value).__name__ for value in params]
+
+
+def call_site():
+    """Кадры стека из кода проекта, начиная с ближайшего к запросу."""
+    frames = []
+    frame = sys._getframe(2)
+    root = str(settings.BASE_DIR) + os.sep
+    while frame is not None and len(frames) < STACK_DEPTH:
+        filename = frame.f_code.co_filename
+        if (filename.startswith(root) and 'site-packages' not in filename
+                and filename not in SKIPPED_FILES):
+            frames.append(f'{os.path.relpath(filename, root)}:'
+                          f'{frame.f_lineno} {frame.f_code.co_name}')
+        frame = frame.f_back
+    return frames
+
+
+class Capture:
+    """execute_wrapper, который копит запросы одной страницы.
+
+    sampled — страница выбрана заранее, места вызова нужны у всех ее
+    запросов; иначе — только у медленных.
+    """
+
+    def __init__(self, sampled=True):
+        self.queries = []
+        self.sampled = sampled
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            ms = (time.perf_counter() - started) * 1000
+            stack_ms = settings.SQL_LOG_STACK_MS
+            slow = stack_ms is not None and ms >= stack_ms
+            self.queries.append({
+                'sql': sql,
+                'ms': round(ms, 3),
+                'params': params_shape(params, many),
+                'stack': call_site() if self.sampled or slow else [],
+            })
+
+
+def enabled():
+    return bool(settings.SQL_LOG_SAMPLE_RATE or settings.SQL_LOG_SLOW_MS)
+
+
+def sample():
+    return random.random() < settings.SQL_LOG_SAMPLE_RATE
+
+
+def reason(request_ms, sampled):
+    """Почему страница попадает в журнал, или None."""
+    if sampled:
+        return 'sample'
+    slow_ms = settings.SQL_LOG_SLOW_MS
+    if slow_ms and request_ms >= slow_ms:
+        return 'slow'
+    return None
+
+
+def get_logger():
+    """Журнал с файлом SQL_LOG_FILE; обработчик создается один раз на
+    процесс, а не на каждый поток, который первым что-то пишет."""
+    path = os.path.abspath(settings.SQL_LOG_FILE)
+    with _handler_lock:
+        handler = next(iter(logger.handlers), None)
+        if handler is None or handler.baseFilename != path:
+            for old in logger.handlers[:]:
+                logger.removeHandler(old)
+                old.close()
+            logger.addHandler(RotatingFileHandler(
+                path, maxBytes=settings.SQL_LOG_MAX_BYTES,
+                backupCount=settings.SQL_LOG_BACKUP_COUNT,
+                encoding='utf-8'))
+            logger.setLevel(logging.INFO)
+    return logger
+
+
+def write(request, view, status, request_ms, why, queries):
+    log = get_logger()
+    common = {
+        'time': timezone.now().isoformat(),
+        'request': uuid.uuid4().hex,
+        'reason': why,
+        'view': view,
+        'method': request.method,
+        'path': request.path,
+        'status': status,
+        'request_ms': round(request_ms, 3),
+    }
+    for query in queries:
+        log.info(json.dumps(dict(common, **query), ensure_ascii=False))
+
+
+def read(paths):
+    for path in paths:
+        with open(path, encoding='utf-8') as file:
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
@@ -0,0 +1,38 @@
+import time
+from contextvars import ContextVar
+
+from django.template import TemplateDoesNotExist
+from django.template.backends.django import DjangoTemplates, Template, reraise
+
+from . import metrics
+
+# Шаблон, отрендеренный внутри другого (render_to_string из тега),
+# уже входит во время внешнего: считается только внешний.
+rendering = ContextVar('rendering_template', default=False)
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        if rendering.get():
+            return super().render(context, request)
+        token = rendering.set(True)
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            metrics.add('template_seconds', time.perf_counter() - started)
+            rendering.reset(token)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """Шаблоны Django, которые сообщают время рендеринга в метрики."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return TimedTemplate(
+                self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
@@ -0,0 +1,43 @@
+"""Запуск тестов со своим файлом общего кэша.
+
+Иначе тесты очищали бы кэш запущенного dev-сервера. Файл создается во
+временном каталоге и удаляется после прогона. manage.py test подключает
+его через TEST_RUNNER, pytest — через tests/conftest.py.
+"""
+
+import copy
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TempSharedCache:
+    """Подменяет LOCATION кэша 'shared' на файл во временном каталоге."""
+
+    def enable(self):
+        self.directory = tempfile.mkdtemp(prefix='yatube-cache-')
+        caches = copy.deepcopy(settings.CACHES)
+        caches['shared']['LOCATION'] = os.path.join(
+            self.directory, 'shared.mmap')
+        self.override = override_settings(CACHES=caches)
+        self.override.enable()
+
+    def disable(self):
+        self.override.disable()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+class TestRunner(DiscoverRunner):
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.shared_cache = TempSharedCache()
+        self.shared_cache.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.shared_cache.disable()
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,117 @@
+import time
+
+from django.core.cache import caches
+from django.template import Context, Template
+from django.test import TestCase
+
+from ..cache import TwoTierCache
+from ..metrics import cache_tier_lines
+
+
+def two_tier(**options):
+    """Отдельный экземпляр — как кэш в другом воркере."""
+    return TwoTierCache(None, {'OPTIONS': dict(
+        {'SHARED': 'shared', 'CHECK_INTERVAL': 0}, **options)})
+
+
+class TwoTierCacheTests(TestCase):
+
+    def setUp(self):
+        caches['shared'].clear()
+        self.worker = two_tier()
+        self.other = two_tier()
+
+    def test_local_tier_serves_repeated_reads(self):
+        """Повторное чтение обслуживается из памяти процесса"""
+        self.worker.set('key', 'value')
+        self.assertEqual(self.worker.get('key'), 'value')
+        self.assertEqual(self.other.get('key'), 'value')
+        self.assertEqual(self.other.get('key'), 'value')
+        self.assertEqual(self.worker.stats()['local_hits'], 1)
+        stats = self.other.stats()
+        self.assertEqual(stats['shared_hits'], 1)
+        self.assertEqual(stats['local_hits'], 1)
+
+    def test_writes_invalidate_other_processes(self):
+        """Запись и удаление в одном воркере видны в другом"""
+        self.worker.set('key', 1)
+        self.assertEqual(self.other.get('key'), 1)
+        self.worker.set('key', 2)
+        self.assertEqual(self.other.get('key'), 2)
+        self.worker.set_many({'key': 3})
+        self.assertEqual(self.other.get_many(['key']), {'key': 3})
+        self.worker.delete('key')
+        self.assertIsNone(self.other.get('key'))
+        self.worker.add('key', 4)
+        self.assertEqual(self.other.get('key'), 4)
+        self.worker.delete('key')
+        self.other.get('key')
+        self.worker.add('key', 5)
+        self.assertEqual(self.other.get('key'), 5)
+
+    def test_counters_bypass_local_tier(self):
+        """Счетчики живут только в общем кэше, incr не сбрасывает корзину"""
+        worker = two_tier(SHARED_PREFIXES=['counter:'], BUCKETS=1)
+        other = two_tier(SHARED_PREFIXES=['counter:'], BUCKETS=1)
+        worker.set('key', 'value')
+        other.get('key')
+        worker.add('counter:hits', 1)
+        self.assertEqual(other.get('counter:hits'), 1)
+        worker.incr('counter:hits')
+        self.assertEqual(other.get_many(['counter:hits', 'key']),
+                         {'counter:hits': 2, 'key': 'value'})
+        self.assertEqual(other.get('counter:hits'), 2)
+        self.assertEqual(other.stats()['local_hits'], 1)
+
+    def test_staleness_bounded_by_check_interval(self):
+        """Чужая запись видна не позже чем через CHECK_INTERVAL"""
+        other = two_tier(CHECK_INTERVAL=0.2)
+        self.worker.set('key', 1)
+        self.assertEqual(other.get('key'), 1)
+        self.worker.set('key', 2)
+        self.assertEqual(other.get('key'), 1)
+        time.sleep(0.25)
+        self.assertEqual(other.get('key'), 2)
+
+    def test_clear_invalidates_other_processes(self):
+        """Очистка общего кэша сбрасывает локальные копии всех воркеров"""
+        self.worker.set('key', 1)
+        self.assertEqual(self.other.get('key'), 1)
+        self.worker.clear()
+        self.assertIsNone(self.other.get('key'))
+
+    def test_local_tier_bounded(self):
+        """Локальный уровень ограничен по числу ключей и времени жизни"""
+        worker = two_tier(LOCAL_MAX_ENTRIES=2, LOCAL_TIMEOUT=0.1)
+        for key in ('a', 'b', 'c'):
+            worker.set(key, key)
+        self.assertEqual(worker.stats()['local_entries'], 2)
+        self.assertEqual(worker.get('a'), 'a')
+        self.assertEqual(worker.stats()['shared_hits'], 1)
+        time.sleep(0.15)
+        self.assertEqual(worker.get('c'), 'c')
+        self.assertEqual(worker.stats()['shared_hits'], 2)
+
+    def test_values_are_copies(self):
+        """Изменение полученного объекта не меняет кэш"""
+        self.worker.set('key', [1])
+        self.worker.get('key').append(2)
+        self.assertEqual(self.worker.get('key'), [1])
+
+    def test_template_cache_tag(self):
+        """Тег {% cache %} работает поверх двухуровневого кэша"""
+        template = Template(
+            '{% load cache %}{% cache 60 fragment %}{{ value }}'
+            '{% endcache %}')
+        self.assertEqual(template.render(Context({'value': 'first'})),
+                         'first')
+        self.assertEqual(template.render(Context({'value': 'second'})),
+                         'first')
+
+    def test_tier_metrics(self):
+        """Попадания по уровням попадают в метрики"""
+        self.assertIn(
+            'yatube_cache_tier_requests_total{tier="local",outcome="hits"}',
+            '\n'.join(cache_tier_lines()))
+        self.assertIn('yatube_cache_oversize_total',
+                      '\n'.join(cache_tier_lines()))
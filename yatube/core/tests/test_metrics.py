@@ -0,0 +1,108 @@
+import re
+from itertools import count
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.template import engines
+from django.template.loader import render_to_string
+from django.test import Client, TestCase, override_settings
+
+from posts.models import Post
+
+from ..metrics import Histogram, RequestMetrics, current, registry
+
+User = get_user_model()
+
+
+@override_settings(METRICS_TOKEN='secret')
+class MetricsTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        author = User.objects.create_user(username='PostAuthor')
+        Post.objects.create(text='Test text', author=author)
+
+    def setUp(self):
+        cache.clear()
+        registry.clear()
+        self.guest_client = Client()
+
+    def scrape(self):
+        response = self.guest_client.get(
+            '/metrics/', HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+    def value(self, text, sample):
+        match = re.search(rf'^{re.escape(sample)} (\S+)$', text, re.M)
+        self.assertIsNotNone(match, sample)
+        return float(match.group(1))
+
+    def test_endpoint_protected(self):
+        """Метрики отдаются только с токеном из настроек"""
+        self.assertEqual(self.guest_client.get('/metrics/').status_code, 403)
+        with override_settings(METRICS_TOKEN=None):
+            self.assertEqual(
+                self.guest_client.get(
+                    '/metrics/', HTTP_AUTHORIZATION='Bearer secret'
+                ).status_code, 404)
+
+    def test_view_metrics(self):
+        """Для URL считаются запросы, время, SQL, шаблоны, кэш и размер"""
+        self.guest_client.get('/')
+        # Второй адрес — мимо кэша страниц, но с тем же фрагментом.
+        self.guest_client.get('/', {'page': 1})
+        self.guest_client.get('/', {'page': 1})
+        self.guest_client.get('/no-such-page/')
+        text = self.scrape()
+        view = 'view="posts:index"'
+        self.assertEqual(self.value(
+            text, f'yatube_requests_total{{{view},status="200"}}'), 3)
+        self.assertEqual(self.value(
+            text, f'yatube_request_seconds_count{{{view}}}'), 3)
+        self.assertEqual(self.value(
+            text, f'yatube_request_seconds_bucket{{{view},le="+Inf"}}'), 3)
+        self.assertGreater(self.value(
+            text, f'yatube_response_bytes_sum{{{view}}}'), 0)
+        self.assertGreater(self.value(
+            text, f'yatube_db_queries_total{{{view}}}'), 0)
+        self.assertGreater(self.value(
+            text, f'yatube_db_seconds_total{{{view}}}'), 0)
+        self.assertGreater(self.value(
+            text, f'yatube_template_seconds_total{{{view}}}'), 0)
+        self.assertEqual(self.value(
+            text, f'yatube_cache_misses_total{{{view}}}'), 1)
+        self.assertEqual(self.value(
+            text, f'yatube_cache_hits_total{{{view}}}'), 1)
+        self.assertEqual(self.value(
+            text, f'yatube_page_cache_misses_total{{{view}}}'), 2)
+        self.assertEqual(self.value(
+            text, f'yatube_page_cache_hits_total{{{view}}}'), 1)
+        self.assertEqual(self.value(
+            text, 'yatube_requests_total{view="unmatched",status="404"}'), 1)
+
+    def test_histogram_buckets(self):
+        """Бакеты гистограммы накопительные, граница входит в бакет"""
+        histogram = Histogram((1, 5))
+        for value in (0.5, 1, 3, 10):
+            histogram.observe(value)
+        samples = dict(histogram.samples('x', 'view="v"'))
+        self.assertEqual(samples['x_bucket{view="v",le="1"}'], 2)
+        self.assertEqual(samples['x_bucket{view="v",le="5"}'], 3)
+        self.assertEqual(samples['x_bucket{view="v",le="+Inf"}'], 4)
+        self.assertEqual(samples['x_sum{view="v"}'], 14.5)
+
+    def test_nested_render_counted_once(self):
+        """Шаблон из render_to_string внутри другого не считается дважды"""
+        outer = engines.all()[0].from_string('{{ inner }}')
+        request_metrics = RequestMetrics()
+        token = current.set(request_metrics)
+        # Каждый вызов часов прибавляет секунду.
+        with mock.patch('core.template_backends.time.perf_counter',
+                        side_effect=count()):
+            outer.render({'inner': lambda: render_to_string(
+                'includes/follow_button.html', {'username': 'author'})})
+        current.reset(token)
+        self.assertEqual(request_metrics.template_seconds, 1)
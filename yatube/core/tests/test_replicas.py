@@ -0,0 +1,118 @@
+import os
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connections
+from django.test import Client, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from posts import versions
+from posts.models import Post
+from posts.views import post_page_scopes
+
+from .. import replicas
+
+User = get_user_model()
+
+TEMP_DIR = tempfile.mkdtemp()
+REPLICA = os.path.join(TEMP_DIR, 'replica.sqlite3')
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaTests(TransactionTestCase):
+    databases = {'default', 'replica'}
+
+    @classmethod
+    def setUpClass(cls):
+        connections.databases['replica'] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': REPLICA,
+        }
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections['replica'].close()
+        del connections.databases['replica']
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        replicas._down.clear()
+        self.author = User.objects.create_user(username='PostAuthor')
+        self.post = Post.objects.create(text='Test text', author=self.author)
+        self.url = reverse('posts:post_detail',
+                           kwargs={'post_id': self.post.pk})
+        # Версии, созданные позже снимка, отправили бы чтения на
+        # основную базу.
+        versions.get_versions(post_page_scopes(self.post.pk))
+        replicas.replicate('replica')
+        # Отличие реплики от основной базы видно по тексту поста.
+        Post.objects.using('replica').filter(pk=self.post.pk).update(
+            text='Replica text')
+
+    def tearDown(self):
+        replicas._down.clear()
+
+    def test_reads_from_fresh_replica(self):
+        """Страница читается с реплики, снятой после изменений"""
+        self.assertContains(self.client.get(self.url), 'Replica text')
+
+    def test_changed_page_reads_primary(self):
+        """После изменения данных страницы старая реплика не читается"""
+        self.post.text = 'Primary text'
+        self.post.save()
+        self.assertContains(self.client.get(self.url), 'Primary text')
+
+    def test_lagging_replica_skipped(self):
+        """Реплика старше REPLICA_MAX_LAG не используется"""
+        replicas.mark_synced('replica', 1)
+        self.assertContains(self.client.get(self.url), 'Test text')
+
+    def test_writer_pinned_to_primary(self):
+        """Записавший клиент читает с основной базы, пока есть cookie"""
+        client = Client()
+        client.force_login(self.author)
+        response = client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.pk}),
+            {'text': 'New comment'})
+        self.assertIn(replicas.PIN_COOKIE, response.cookies)
+        response = client.get(self.url)
+        self.assertContains(response, 'New comment')
+        self.assertContains(response, 'Test text')
+
+    def test_failover_to_primary(self):
+        """Ошибка на реплике: ответ с основной базы, реплика выведена
+        из ротации"""
+        with connections['replica'].cursor() as cursor:
+            cursor.execute('DROP TABLE posts_post')
+        self.assertContains(self.client.get(self.url), 'Test text')
+        self.assertFalse(replicas.available('replica'))
+
+    def test_guest_leaves_no_feed_version(self):
+        """Гость на ленте подписок не создает версию feed:None"""
+        response = self.client.get(reverse('posts:follow'))
+        self.assertEqual(response.status_code, 302)
+        self.assertIsNone(
+            cache.get(versions.PREFIX + versions.feed_scope(None)))
+
+    def test_missing_replica_file(self):
+        """Отсутствующий файл реплики не используется и не создается"""
+        with override_settings(DATABASE_REPLICAS=['replica', 'default']):
+            connections['replica'].close()
+            os.rename(REPLICA, REPLICA + '.moved')
+            try:
+                self.assertFalse(replicas.available('replica'))
+                self.assertFalse(os.path.exists(REPLICA))
+            finally:
+                os.rename(REPLICA + '.moved', REPLICA)
+
+    def test_command_requires_replicas(self):
+        """replicate_db без настроенных реплик — ошибка"""
+        with override_settings(DATABASE_REPLICAS=[]):
+            with self.assertRaises(CommandError):
+                call_command('replicate_db')
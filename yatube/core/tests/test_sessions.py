@@ -0,0 +1,40 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.sessions.models import Session
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from .. import sessions
+
+
+class PurgeSessionsTests(TestCase):
+
+    def setUp(self):
+        now = timezone.now()
+        Session.objects.bulk_create(
+            Session(session_key=f'expired{i}', session_data='',
+                    expire_date=now - timedelta(days=1))
+            for i in range(5))
+        Session.objects.create(session_key='alive', session_data='',
+                               expire_date=now + timedelta(days=1))
+
+    def test_purge_in_batches(self):
+        """Истекшие сессии удаляются пачками, живые остаются"""
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(sessions.purge_expired(batch_size=2), 5)
+        self.assertEqual(sum(query['sql'].startswith('DELETE')
+                             for query in context.captured_queries), 3)
+        self.assertEqual(
+            list(Session.objects.values_list('session_key', flat=True)),
+            ['alive'])
+
+    def test_command(self):
+        """purge_sessions сообщает число удаленных сессий"""
+        out = StringIO()
+        call_command('purge_sessions', '--batch-size', '10', stdout=out)
+        self.assertIn('Удалено истекших сессий: 5', out.getvalue())
+        self.assertEqual(Session.objects.count(), 1)
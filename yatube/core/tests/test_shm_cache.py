@@ -0,0 +1,111 @@
+import os
+import tempfile
+import time
+
+from django.conf import settings
+from django.test import TestCase
+
+from ..shm_cache import SharedMemoryCache
+
+
+def in_child(function):
+    """Выполняет function в дочернем процессе и ждет его завершения."""
+    pid = os.fork()
+    if pid == 0:
+        try:
+            function()
+        finally:
+            os._exit(0)
+    os.waitpid(pid, 0)
+
+
+class SharedMemoryCacheTests(TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'cache.mmap')
+        self.cache = self.make_cache()
+
+    def make_cache(self, **options):
+        return SharedMemoryCache(self.path, {'OPTIONS': dict(
+            {'SLOTS': 64, 'SLOT_SIZE': 1024, 'WAYS': 4}, **options)})
+
+    def test_basic_operations(self):
+        """Запись, чтение, add, incr, touch и удаление"""
+        self.cache.set('key', {'value': [1, 2]})
+        self.assertEqual(self.cache.get('key'), {'value': [1, 2]})
+        self.assertFalse(self.cache.add('key', 'other'))
+        self.assertTrue(self.cache.add('new', 'value'))
+        self.cache.set('counter', 1)
+        self.assertEqual(self.cache.incr('counter', 5), 6)
+        self.assertEqual(self.cache.get('counter'), 6)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+        self.assertEqual(self.cache.get_many(['key', 'new', 'missing']),
+                         {'key': {'value': [1, 2]}, 'new': 'value'})
+        self.cache.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+        self.assertTrue(self.cache.has_key('new'))
+        self.cache.clear()
+        self.assertFalse(self.cache.has_key('new'))
+
+    def test_expiration(self):
+        """Просроченные значения не находятся, touch продлевает срок"""
+        self.cache.set('short', 1, 0.1)
+        self.cache.set('touched', 1, 0.1)
+        self.assertTrue(self.cache.touch('touched', None))
+        self.cache.set('zero', 1, 0)
+        time.sleep(0.15)
+        self.assertIsNone(self.cache.get('short'))
+        self.assertEqual(self.cache.get('touched'), 1)
+        self.assertIsNone(self.cache.get('zero'))
+
+    def test_shared_between_processes(self):
+        """Записи и incr из других процессов видны сразу и не теряются"""
+        self.cache.set('counter', 0)
+
+        def work():
+            cache = self.make_cache()
+            cache.set('child', os.getpid())
+            for _ in range(100):
+                cache.incr('counter')
+
+        for _ in range(3):
+            in_child(work)
+        self.assertIsNotNone(self.cache.get('child'))
+        self.assertEqual(self.cache.get('counter'), 300)
+
+    def test_clock_eviction(self):
+        """В полном наборе вытесняется ключ, который давно не читали"""
+        cache = self.make_cache(SLOTS=4, WAYS=4)
+        for number in range(4):
+            cache.set(number, number)
+        self.assertEqual(cache.get(0), 0)
+        cache.set('new', 'value')
+        self.assertEqual(cache.get('new'), 'value')
+        self.assertEqual(cache.get(0), 0)
+        self.assertEqual(
+            sum(cache.has_key(number) for number in range(4)), 3)
+
+    def test_value_larger_than_slot(self):
+        """Слишком большое значение не кэшируется и стирает старое"""
+        self.cache.set('key', 'small')
+        self.cache.set('key', 'x' * 2048)
+        self.assertIsNone(self.cache.get('key'))
+        self.assertEqual(self.cache.set_many({'key': 'x' * 2048}), ['key'])
+        self.assertFalse(self.cache.add('key', 'x' * 2048))
+        self.assertEqual(self.cache.stats(), {'oversize': 3})
+
+    def test_tests_use_own_file(self):
+        """Тесты не пишут в файл кэша dev-сервера"""
+        location = settings.CACHES['shared']['LOCATION']
+        self.assertFalse(location.startswith(settings.BASE_DIR))
+
+    def test_geometry_change_resets_file(self):
+        """Файл с другой разметкой создается заново"""
+        self.cache.set('key', 'value')
+        resized = self.make_cache(SLOTS=128)
+        self.assertIsNone(resized.get('key'))
+        resized.set('key', 'new')
+        self.assertEqual(self.make_cache(SLOTS=128).get('key'), 'new')
@@ -0,0 +1,69 @@
+import os
+import shutil
+import tempfile
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+
+from .. import sqlite_benchmark
+
+TEMP_DIR = tempfile.mkdtemp()
+
+
+class SqliteBackendTests(SimpleTestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+    def profile(self, **options):
+        return {'ENGINE': 'core.db_backends.sqlite3', 'OPTIONS': options,
+                'CONN_MAX_AGE': 60}
+
+    def test_pragmas_on_new_connection(self):
+        """PRAGMA из OPTIONS выполняются на каждом новом соединении"""
+        wrapper = sqlite_benchmark.wrapper(self.profile(pragmas={
+            'journal_mode': 'wal', 'busy_timeout': 1234,
+            'synchronous': 'normal'}), os.path.join(TEMP_DIR, 'a.sqlite3'))
+        wrapper.ensure_connection()
+        try:
+            cursor = wrapper.connection.cursor()
+            for pragma, value in (('journal_mode', 'wal'),
+                                  ('busy_timeout', 1234),
+                                  ('synchronous', 1)):
+                with self.subTest(pragma=pragma):
+                    cursor.execute(f'PRAGMA {pragma}')
+                    self.assertEqual(cursor.fetchone()[0], value)
+        finally:
+            wrapper.close()
+
+    def test_invalid_options(self):
+        """Неизвестные PRAGMA и значения с SQL отвергаются"""
+        path = os.path.join(TEMP_DIR, 'b.sqlite3')
+        for options in ({'pragmas': {'writable_schema': 1}},
+                        {'pragmas': {'cache_size': '1; DROP TABLE x'}},
+                        {'transaction_mode': 'LATER'}):
+            with self.subTest(options=options):
+                with self.assertRaises(ImproperlyConfigured):
+                    sqlite_benchmark.wrapper(self.profile(**options), path)
+
+    def test_benchmark(self):
+        """benchmark_sqlite меряет чтения и записи обоих профилей"""
+        report = sqlite_benchmark.run(readers=1, writers=1, seconds=0.2,
+                                      directory=TEMP_DIR)
+        self.assertEqual(set(report['profiles']), {'stock', 'configured'})
+        for result in report['profiles'].values():
+            self.assertGreater(result['read']['per_second'], 0)
+            self.assertGreater(result['write']['per_second'], 0)
+
+
+class ConfiguredDatabaseTests(TestCase):
+
+    def test_default_database_uses_backend(self):
+        """Основная база открывает транзакции через BEGIN IMMEDIATE"""
+        self.assertEqual(connection.begin_statement(), 'BEGIN IMMEDIATE')
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
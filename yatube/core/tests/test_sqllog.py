@@ -0,0 +1,107 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from posts.models import Post
+
+from .. import sqllog
+
+User = get_user_model()
+
+TEMP_DIR = tempfile.mkdtemp()
+LOG_FILE = os.path.join(TEMP_DIR, 'sql.jsonl')
+
+
+@override_settings(SQL_LOG_FILE=LOG_FILE, SQL_LOG_SAMPLE_RATE=1)
+class SqlLogTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        author = User.objects.create_user(username='PostAuthor')
+        Post.objects.create(text='Test text', author=author)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        for handler in sqllog.logger.handlers[:]:
+            sqllog.logger.removeHandler(handler)
+            handler.close()
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+    def setUp(self):
+        # Ответ гостю из кэша страниц не выполняет запросов.
+        cache.clear()
+        open(LOG_FILE, 'w').close()
+
+    def entries(self):
+        for handler in sqllog.logger.handlers:
+            handler.flush()
+        return list(sqllog.read([LOG_FILE]))
+
+    def test_sampled_request_logged(self):
+        """Выбранная страница пишет все свои SQL-запросы с местом вызова"""
+        self.client.get('/profile/PostAuthor/')
+        entries = self.entries()
+        self.assertTrue(entries)
+        self.assertEqual({entry['view'] for entry in entries},
+                         {'posts:profile'})
+        self.assertEqual(len({entry['request'] for entry in entries}), 1)
+        user_query = next(entry for entry in entries
+                          if 'FROM "auth_user"' in entry['sql'])
+        self.assertEqual(user_query['params'], ['str'])
+        self.assertEqual(user_query['reason'], 'sample')
+        self.assertTrue(user_query['stack'][0].startswith('posts/'))
+
+    @override_settings(SQL_LOG_SAMPLE_RATE=0, SQL_LOG_SLOW_MS=10 ** 6)
+    def test_fast_request_skipped(self):
+        """Быстрая страница вне выборки в журнал не попадает"""
+        self.client.get('/')
+        self.assertEqual(self.entries(), [])
+
+    @override_settings(SQL_LOG_SAMPLE_RATE=0, SQL_LOG_SLOW_MS=0.001)
+    def test_slow_request_logged(self):
+        """Страница дольше порога попадает в журнал"""
+        self.client.get('/')
+        entries = self.entries()
+        self.assertTrue(entries)
+        self.assertEqual({entry['reason'] for entry in entries}, {'slow'})
+
+    @override_settings(SQL_LOG_SAMPLE_RATE=0, SQL_LOG_SLOW_MS=0.001,
+                       SQL_LOG_STACK_MS=10 ** 6)
+    def test_stack_only_for_slow_queries(self):
+        """Вне выборки место вызова пишется только медленным запросам"""
+        self.client.get('/profile/PostAuthor/')
+        entries = self.entries()
+        self.assertTrue(entries)
+        self.assertEqual([entry['stack'] for entry in entries],
+                         [[]] * len(entries))
+
+    def test_report_groups_by_fingerprint(self):
+        """Отчет складывает одинаковые запросы разных страниц"""
+        self.client.get('/profile/PostAuthor/')
+        self.client.get('/profile/PostAuthor/?page=2')
+        out = StringIO()
+        call_command('sql_log_report', LOG_FILE, '--json', stdout=out)
+        report = json.loads(out.getvalue())
+        user_row = next(row for row in report
+                        if 'FROM "auth_user"' in row['fingerprint']
+                        and 'posts/views.py' in (row['call_site'] or ''))
+        self.assertEqual(user_row['count'], 2)
+        self.assertEqual(user_row['requests'], 2)
+        self.assertEqual(user_row['views'], {'posts:profile': 2})
+
+    def test_fingerprint(self):
+        """Отпечаток не зависит от значений и длины списка IN"""
+        self.assertEqual(
+            sqllog.fingerprint('SELECT * FROM t WHERE id IN (%s, %s) '
+                               "AND name = 'x'  LIMIT 21"),
+            sqllog.fingerprint('SELECT * FROM t WHERE id IN (%s) '
+                               "AND name = 'yy' LIMIT 10"))
@@ -0,0 +1,143 @@
+"""Замер задержек страниц posts через тестовый клиент Django.
+
+Для каждого URL из posts/urls.py выполняется несколько запросов от имени
+самых «тяжелых» пользователей базы: самого активного автора и его
+подписчика. Изменяющие запросы откатываются, так что замер можно
+повторять на одной и той же базе.
+"""
+
+import math
+import statistics
+import time
+
+from django.core.cache import cache
+from django.core.management import CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from . import counters
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+
+def percentile(values, percent):
+    """Процентиль методом ближайшего ранга."""
+    ordered = sorted(values)
+    rank = math.ceil(percent / 100 * len(ordered))
+    return ordered[max(rank, 1) - 1]
+
+
+EMPTY_DATABASE = ('В базе нет постов, групп или второго пользователя '
+                  'для замера: сначала выполните manage.py seed_load.')
+
+
+def busiest_author():
+    top = UserStats.objects.filter(posts__gt=0).select_related(
+        'user').order_by('-posts').first()
+    if top is not None:
+        return top.user
+    post = Post.objects.select_related('author').first()
+    return post.author if post is not None else None
+
+
+def targets():
+    """Объекты, на которых меряются страницы; CommandError, если база
+    пуста."""
+    author = busiest_author()
+    if author is None or not author.posts.exists():
+        raise CommandError(EMPTY_DATABASE)
+    follow = Follow.objects.filter(author=author).first()
+    if follow is not None:
+        reader = follow.user
+    else:
+        reader = User.objects.exclude(pk=author.pk).first()
+    last_comment = Comment.objects.order_by('-pk').first()
+    post = (last_comment.post if last_comment
+            else Post.objects.order_by('-pk').first())
+    group = (Group.objects.filter(pk=post.group_id).first()
+             or Group.objects.first())
+    if reader is None or group is None:
+        raise CommandError(EMPTY_DATABASE)
+    return {
+        'author': author,
+        'reader': reader,
+        'group': group,
+        'post': post,
+        'own_post': author.posts.first(),
+    }
+
+
+def url_requests(targets):
+    """(имя URL, клиент, kwargs, метод, данные) для каждого URL posts."""
+    author_client = Client()
+    author_client.force_login(targets['author'])
+    reader_client = Client()
+    reader_client.force_login(targets['reader'])
+    group = targets['group']
+    post_kwargs = {'post_id': targets['post'].pk}
+    author_kwargs = {'username': targets['author'].username}
+    return (
+        ('index', Client(), {}, 'get', None),
+        ('group_list', Client(), {'slug': group.slug}, 'get', None),
+        ('profile', reader_client, author_kwargs, 'get', None),
+        ('post_detail', reader_client, post_kwargs, 'get', None),
+        ('post_comments', reader_client, post_kwargs, 'get', None),
+        ('follow', reader_client, {}, 'get', None),
+        ('search', Client(), {}, 'get', {'q': 'post'}),
+        ('create_post', author_client, {}, 'post',
+         {'text': 'Benchmark text', 'group': group.pk}),
+        ('edit_post', author_client, {'post_id': targets['own_post'].pk},
+         'post', {'text': 'Benchmark edit', 'group': group.pk}),
+        ('add_comment', reader_client, post_kwargs, 'post',
+         {'text': 'Benchmark comment'}),
+        ('profile_follow', author_client,
+         {'username': targets['reader'].username}, 'get', None),
+        ('profile_unfollow', reader_client, author_kwargs, 'get', None),
+        ('feed', Client(), {}, 'get', None),
+        ('group_feed', Client(), {'slug': group.slug}, 'get', None),
+        ('profile_feed', Client(), author_kwargs, 'get', None),
+        ('profile_export', author_client, author_kwargs, 'get', None),
+        ('follow_bulk', author_client, {}, 'post',
+         {'usernames': targets['reader'].username}),
+    )
+
+
+def measure(client, url, method, data, cold):
+    if cold:
+        cache.clear()
+    with transaction.atomic():
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = getattr(client, method)(url, data or {})
+            elapsed = time.perf_counter() - started
+        # Изменения от POST-запросов и подписок не сохраняются.
+        transaction.set_rollback(True)
+    return response.status_code, elapsed * 1000, len(queries)
+
+
+def run(repeat=20, warmup=2, cold=False):
+    """Возвращает результаты замера в виде словаря для JSON."""
+    results = {}
+    for name, client, kwargs, method, data in url_requests(targets()):
+        url = reverse(f'posts:{name}', kwargs=kwargs)
+        for _ in range(warmup):
+            measure(client, url, method, data, cold)
+        runs = [measure(client, url, method, data, cold)
+                for _ in range(repeat)]
+        timings = [elapsed for _, elapsed, _ in runs]
+        results[name] = {
+            'url': url,
+            'status': runs[-1][0],
+            'p50_ms': round(percentile(timings, 50), 3),
+            'p95_ms': round(percentile(timings, 95), 3),
+            'p99_ms': round(percentile(timings, 99), 3),
+            'mean_ms': round(statistics.mean(timings), 3),
+            'queries': max(count for _, _, count in runs),
+        }
+    return {
+        'posts': counters.get_count(counters.TOTAL, Post.objects.all()),
+        'repeat': repeat,
+        'cold_cache': cold,
+        'urls': results,
+    }
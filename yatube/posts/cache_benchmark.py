@@ -0,0 +1,208 @@
+"""Сравнение бэкендов кэша на фрагментах лент.
+
+Несколько процессов-воркеров, как у WSGI-сервера, запрашивают главную
+страницу и страницы групп; популярность адресов распределена по Ципфу.
+Для каждого бэкенда два замера:
+
+- pages — задержки страниц целиком и доля попаданий в кэш по всем
+  воркерам (страница гостю целиком или фрагмент): у LocMemCache каждый
+  воркер заново рендерит то, что другие уже положили в свой кэш;
+- cache_ops — только обращения к кэшу, которые делает тег
+  versioned_cache (версии областей, фрагмент, счетчик попаданий), с
+  настоящими фрагментами страниц, без базы и шаблонов.
+"""
+
+import multiprocessing
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import connections
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from core.metrics import registry
+
+from . import versions
+from .benchmark import percentile
+from .models import Group
+from .seeding import Zipf
+
+SHM_DIR = '/dev/shm'
+FRAGMENT_PREFIX = 'posts:fragment:'
+
+
+class RecordingCache(LocMemCache):
+    """LocMemCache, который запоминает записанные фрагменты."""
+    fragments = []
+
+    def set(self, key, value, *args, **kwargs):
+        if key.startswith(FRAGMENT_PREFIX):
+            self.fragments.append(value)
+        super().set(key, value, *args, **kwargs)
+
+
+def backends(directory):
+    """Настройки CACHES для каждого сравниваемого бэкенда."""
+    shared_memory = {
+        'BACKEND': 'core.shm_cache.SharedMemoryCache',
+        'LOCATION': os.path.join(directory, 'fragments.mmap'),
+    }
+    return {
+        'locmem': {'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'cache-benchmark',
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }},
+        'filebased': {'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.path.join(directory, 'files'),
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }},
+        'shared_memory': {'default': shared_memory},
+        'two_tier_shared_memory': {
+            'default': {
+                'BACKEND': 'core.cache.TwoTierCache',
+                'OPTIONS': {'SHARED': 'shared'},
+            },
+            'shared': shared_memory,
+        },
+    }
+
+
+def fragment_urls(pages=3, groups=20):
+    """(адрес, области фрагмента) от популярных к менее популярным."""
+    urls = [(reverse('posts:index') + f'?page={page}',
+             [versions.INDEX, versions.GROUPS])
+            for page in range(1, pages + 1)]
+    for slug in Group.objects.order_by('pk').values_list(
+            'slug', flat=True)[:groups]:
+        urls.append((reverse('posts:group_list', kwargs={'slug': slug}),
+                     [versions.GROUPS, versions.group_scope(slug)]))
+    return urls
+
+
+def capture(urls):
+    """Фрагменты, которые рендерят страницы urls."""
+    fragments = []
+    client = Client()
+    with override_settings(CACHES={'default': {
+            'BACKEND': 'posts.cache_benchmark.RecordingCache',
+            'LOCATION': 'cache-benchmark-capture'}},
+            SESSION_CACHE_ALIAS='default'):
+        cache.clear()
+        for url, _ in urls:
+            RecordingCache.fragments.clear()
+            client.get(url)
+            fragments.append(next(iter(RecordingCache.fragments), ''))
+    return fragments
+
+
+def replay_pages(urls, fragments, requests, skew, seed):
+    """Страницы одного воркера: (задержки в мс, попадания, промахи)."""
+    choose = Zipf(len(urls), skew, random.Random(seed))
+    client = Client()
+    registry.clear()
+    timings = []
+    for _ in range(requests):
+        url, _ = urls[choose()]
+        started = time.perf_counter()
+        client.get(url)
+        timings.append((time.perf_counter() - started) * 1000)
+    views = registry.views.values()
+    # Ответ из кэша страниц до фрагментов не доходит.
+    return (timings,
+            sum(stats.page_cache_hits + stats.cache_hits for stats in views),
+            sum(stats.cache_misses for stats in views))
+
+
+def replay_cache(urls, fragments, requests, skew, seed):
+    """Обращения тега versioned_cache одного воркера, задержки в мкс."""
+    choose = Zipf(len(urls), skew, random.Random(seed))
+    timings = []
+    hits = misses = 0
+    for _ in range(requests):
+        number = choose()
+        started = time.perf_counter()
+        key = versions.fragment_key('benchmark', urls[number][1],
+                                    [number])
+        if cache.get(key) is None:
+            misses += 1
+            versions.record('misses')
+            cache.set(key, fragments[number],
+                      settings.FRAGMENT_CACHE_TIMEOUT)
+        else:
+            hits += 1
+            versions.record('hits')
+        timings.append((time.perf_counter() - started) * 10 ** 6)
+    return timings, hits, misses
+
+
+REPLAYS = {'pages': replay_pages, 'cache_ops': replay_cache}
+
+
+def _worker(arguments):
+    replay, *arguments = arguments
+    return REPLAYS[replay](*arguments)
+
+
+def measure(replay, urls, fragments, workers, requests, skew, seed):
+    jobs = [(replay, urls, fragments, requests, skew, seed + worker)
+            for worker in range(workers)]
+    cache.clear()
+    started = time.perf_counter()
+    if workers == 1:
+        results = [_worker(jobs[0])]
+    else:
+        # Воркеры наследуют настройки и открывают свои соединения с БД.
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        with context.Pool(workers) as pool:
+            results = pool.map(_worker, jobs)
+    elapsed = time.perf_counter() - started
+    timings = [value for result in results for value in result[0]]
+    hits = sum(result[1] for result in results)
+    misses = sum(result[2] for result in results)
+    unit = 'ms' if replay == 'pages' else 'us'
+    return {
+        f'p50_{unit}': round(percentile(timings, 50), 3),
+        f'p95_{unit}': round(percentile(timings, 95), 3),
+        f'p99_{unit}': round(percentile(timings, 99), 3),
+        f'mean_{unit}': round(statistics.mean(timings), 3),
+        'per_second': round(len(timings) / elapsed, 1),
+        'hit_rate': round(hits / ((hits + misses) or 1), 3),
+    }
+
+
+def run(names=None, workers=4, requests=200, operations=5000, skew=1.1,
+        seed=0, directory=None):
+    """Возвращает результаты по бэкендам в виде словаря для JSON."""
+    if directory is None and os.path.isdir(SHM_DIR):
+        directory = SHM_DIR
+    urls = fragment_urls()
+    fragments = capture(urls)
+    results = {}
+    with tempfile.TemporaryDirectory(dir=directory) as workdir:
+        configs = backends(workdir)
+        for name in names or configs:
+            # В замеряемых CACHES может не быть кэша сессий.
+            with override_settings(CACHES=configs[name],
+                                   SESSION_CACHE_ALIAS='default'):
+                results[name] = {
+                    replay: measure(replay, urls, fragments, workers,
+                                    count, skew, seed)
+                    for replay, count in (('pages', requests),
+                                          ('cache_ops', operations))}
+    return {
+        'workers': workers,
+        'requests_per_worker': requests,
+        'operations_per_worker': operations,
+        'urls': len(urls),
+        'fragment_bytes': max(map(len, fragments)),
+        'backends': results,
+    }
@@ -0,0 +1,176 @@
+from collections import Counter
+
+from django.db import router, transaction
+from django.db.models import Count, F
+
+from . import versions
+from .models import Comment, Follow, Post, PostCounter, User, UserStats
+
+TOTAL = 'total'
+BATCH_SIZE = 500
+# Поле UserStats: (модель, поле пользователя в ней).
+USER_STATS = {
+    'followers': (Follow, 'author'),
+    'following': (Follow, 'user'),
+    'posts': (Post, 'author'),
+    'comments': (Comment, 'author'),
+}
+
+
+def group_scope(group_id):
+    return f'group:{group_id}'
+
+
+def post_scopes(post, group_id=None):
+    scopes = [TOTAL]
+    if group_id is not None:
+        scopes.append(group_scope(group_id))
+    return scopes
+
+
+def get_count(scope, queryset):
+    """Значение счетчика; при первом обращении считается по queryset.
+
+    Подсчет и создание строки идут в одной транзакции основной базы:
+    она начинается с BEGIN IMMEDIATE (core.db_backends.sqlite3), так что
+    пост, добавленный между COUNT и INSERT, не потеряется. Если строку
+    успел создать другой запрос, возвращается его значение.
+    """
+    value = PostCounter.objects.filter(
+        scope=scope
+    ).values_list('value', flat=True).first()
+    if value is not None:
+        return value
+    db = router.db_for_write(PostCounter)
+    with transaction.atomic(using=db):
+        counter, _ = PostCounter.objects.using(db).get_or_create(
+            scope=scope, defaults={'value': queryset.using(db).count()})
+    return counter.value
+
+
+def change(scopes, delta):
+    # Еще не созданные счетчики не трогаем: они посчитаются при чтении.
+    PostCounter.objects.filter(
+        scope__in=scopes
+    ).update(value=F('value') + delta)
+
+
+def posts_added(posts):
+    """Учитывает посты, созданные через bulk_create без сигналов."""
+    deltas = Counter()
+    for post in posts:
+        deltas.update(post_scopes(post, post.group_id))
+    by_delta = {}
+    for scope, delta in deltas.items():
+        by_delta.setdefault(delta, []).append(scope)
+    with transaction.atomic():
+        for delta, scopes in by_delta.items():
+            change(scopes, delta)
+        users_posts_added(posts)
+
+
+def recount():
+    """Пересчитывает все счетчики по таблице постов."""
+    values = {TOTAL: Post.objects.count()}
+    for group_id, count in Post.objects.filter(
+        group__isnull=False
+    ).values_list('group').annotate(Count('pk')).order_by():
+        values[group_scope(group_id)] = count
+    with transaction.atomic():
+        PostCounter.objects.all().delete()
+        PostCounter.objects.bulk_create(
+            (PostCounter(scope=scope, value=value)
+             for scope, value in values.items()),
+            500,
+        )
+    return len(values)
+
+
+def count_user_stats(user_ids):
+    """{id пользователя: {поле: значение}} по таблицам, по запросу на поле."""
+    values = {user_id: dict.fromkeys(USER_STATS, 0) for user_id in user_ids}
+    for field, (model, user_field) in USER_STATS.items():
+        for user_id, count in model.objects.filter(**{
+            f'{user_field}__in': user_ids
+        }).values_list(user_field).annotate(Count('pk')).order_by():
+            values[user_id][field] = count
+    return values
+
+
+def user_stats(user):
+    """Числа профиля; при первом обращении считаются по таблицам.
+
+    Строку лучше загрузить вместе с пользователем через
+    select_related('stats'): тогда отдельного запроса нет.
+    """
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        pass
+    stats, _ = UserStats.objects.get_or_create(
+        user_id=user.pk, defaults=count_user_stats([user.pk])[user.pk])
+    return stats
+
+
+def change_user_stats(field, user_ids, delta):
+    # Как и у счетчиков постов, еще не созданные строки не трогаем.
+    UserStats.objects.filter(
+        pk__in=user_ids
+    ).update(**{field: F(field) + delta})
+    if user_ids:
+        versions.forget(*map(versions.user_scope, user_ids))
+
+
+def users_posts_added(posts):
+    """Учитывает посты авторов, созданные через bulk_create."""
+    by_delta = {}
+    for author_id, delta in Counter(
+            post.author_id for post in posts).items():
+        by_delta.setdefault(delta, []).append(author_id)
+    for delta, author_ids in by_delta.items():
+        change_user_stats('posts', author_ids, delta)
+
+
+def reconcile_user_stats(batch_size=BATCH_SIZE, fix=True):
+    """Сверяет UserStats с таблицами пачками по batch_size пользователей.
+
+    Возвращает число проверенных пользователей и расхождения по полям
+    (missing — нет строки, например у созданных через bulk_create); с
+    fix строки создаются и исправляются.
+    """
+    checked = 0
+    drift = Counter()
+    last_pk = 0
+    while True:
+        with transaction.atomic():
+            user_ids = list(User.objects.filter(pk__gt=last_pk).order_by(
+                'pk').values_list('pk', flat=True)[:batch_size])
+            if not user_ids:
+                return checked, drift
+            rows = UserStats.objects.in_bulk(user_ids)
+            actual = count_user_stats(user_ids)
+            missing = []
+            drifted = []
+            for user_id in user_ids:
+                row = rows.get(user_id)
+                if row is None:
+                    missing.append(UserStats(user_id=user_id,
+                                             **actual[user_id]))
+                    continue
+                fields = [field for field, value in actual[user_id].items()
+                          if getattr(row, field) != value]
+                for field in fields:
+                    setattr(row, field, actual[user_id][field])
+                drift.update(fields)
+                if fields:
+                    drifted.append(row)
+            if missing:
+                drift['missing'] += len(missing)
+            if fix:
+                UserStats.objects.bulk_create(missing, ignore_conflicts=True)
+                UserStats.objects.bulk_update(drifted, list(USER_STATS))
+                if drifted:
+                    versions.forget(*(versions.user_scope(row.pk)
+                                      for row in drifted))
+        checked += len(user_ids)
+        last_pk = user_ids[-1]
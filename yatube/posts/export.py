@@ -0,0 +1,63 @@
+"""Выгрузка постов и комментариев пользователя в JSONL или CSV.
+
+Строки читаются через .iterator() пачками по CHUNK_SIZE и сразу
+отдаются потребителю, поэтому память не зависит от числа постов.
+Сначала идут посты автора, затем его комментарии, по возрастанию id.
+"""
+
+import csv
+import json
+
+from django.core.files.storage import default_storage
+
+from .models import Comment, Post
+
+CHUNK_SIZE = 2000
+FORMATS = {
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8',
+}
+COLUMNS = ('type', 'id', 'post', 'group', 'pub_date', 'text', 'image')
+
+
+def records(user, chunk_size=CHUNK_SIZE):
+    posts = Post.objects.filter(author=user).order_by('pk').values_list(
+        'pk', 'group__slug', 'pub_date', 'text', 'image')
+    for pk, group, pub_date, text, image in posts.iterator(chunk_size):
+        yield {
+            'type': 'post',
+            'id': pk,
+            'group': group,
+            'pub_date': pub_date.isoformat(),
+            'text': text,
+            'image': default_storage.url(image) if image else None,
+        }
+    comments = Comment.objects.filter(author=user).order_by(
+        'pk').values_list('pk', 'post_id', 'created', 'text')
+    for pk, post_id, created, text in comments.iterator(chunk_size):
+        yield {
+            'type': 'comment',
+            'id': pk,
+            'post': post_id,
+            'pub_date': created.isoformat(),
+            'text': text,
+        }
+
+
+class Echo:
+    """Псевдофайл для csv.writer: write возвращает строку."""
+
+    def write(self, value):
+        return value
+
+
+def lines(user, export_format='jsonl', chunk_size=CHUNK_SIZE):
+    """Строки выгрузки вместе с переводами строк."""
+    if export_format == 'csv':
+        writer = csv.DictWriter(Echo(), COLUMNS)
+        yield writer.writeheader()
+        for record in records(user, chunk_size):
+            yield writer.writerow(record)
+        return
+    for record in records(user, chunk_size):
+        yield json.dumps(record, ensure_ascii=False) + '\n'
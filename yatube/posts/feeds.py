@@ -0,0 +1,133 @@
+"""RSS и Atom для общей ленты, групп и профилей.
+
+Готовый XML лежит в кэше под версиями тех же областей, что и фрагменты
+HTML-лент, а versions.conditional отвечает 304 по ETag. Опрос
+агрегатора стоит одного чтения кэша, а если лента не менялась — только
+сверки версий.
+"""
+
+from django.conf import settings
+from django.contrib.syndication.views import Feed
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404, reverse
+from django.utils.feedgenerator import Atom1Feed
+from django.utils.text import Truncator
+
+from . import versions
+from .models import Group, Post, User
+
+FEED_ITEMS = 20
+
+
+def latest(posts):
+    return posts.select_related('author', 'group').order_by(
+        '-pub_date', '-id')[:FEED_ITEMS]
+
+
+class PostsFeed(Feed):
+    """Общие поля записей; items() определяет каждая лента через
+    latest()."""
+
+    def item_title(self, item):
+        return Truncator(item.text).words(8)
+
+    def item_description(self, item):
+        return item.text
+
+    def item_link(self, item):
+        return reverse('posts:post_detail', kwargs={'post_id': item.pk})
+
+    def item_pubdate(self, item):
+        return item.pub_date
+
+    def item_author_name(self, item):
+        return item.author.get_full_name() or item.author.username
+
+    def item_categories(self, item):
+        return [item.group.title] if item.group else []
+
+
+class SiteFeed(PostsFeed):
+    title = 'Yatube: последние записи'
+    description = 'Последние обновления на сайте.'
+
+    def link(self):
+        return reverse('posts:index')
+
+    def items(self):
+        return latest(Post.objects.all())
+
+
+class GroupFeed(PostsFeed):
+
+    def get_object(self, request, slug):
+        return get_object_or_404(Group, slug=slug)
+
+    def title(self, obj):
+        return f'Yatube: {obj.title}'
+
+    def description(self, obj):
+        return obj.description
+
+    def link(self, obj):
+        return reverse('posts:group_list', kwargs={'slug': obj.slug})
+
+    def items(self, obj):
+        return latest(obj.posts.all())
+
+
+class ProfileFeed(PostsFeed):
+
+    def get_object(self, request, username):
+        return get_object_or_404(User, username=username)
+
+    def title(self, obj):
+        return f'Yatube: {obj.get_full_name() or obj.username}'
+
+    def description(self, obj):
+        return f'Записи пользователя {obj.username}.'
+
+    def link(self, obj):
+        return reverse('posts:profile', kwargs={'username': obj.username})
+
+    def items(self, obj):
+        return latest(obj.posts.all())
+
+
+def cached_feed(feed_class, fragment_scopes):
+    """View ленты feed_class: RSS, а с ?format=atom — Atom.
+
+    fragment_scopes(**kwargs) возвращает области ленты; от читателя
+    лента не зависит.
+    """
+    feeds = {
+        'rss': feed_class(),
+        'atom': type(f'Atom{feed_class.__name__}', (feed_class,),
+                     {'feed_type': Atom1Feed})(),
+    }
+
+    def scopes(request, **kwargs):
+        return fragment_scopes(**kwargs)
+
+    @versions.replica_reads(scopes)
+    @versions.conditional(scopes)
+    def view(request, **kwargs):
+        feed_format = 'atom' if request.GET.get('format') == 'atom' else 'rss'
+        key = versions.fragment_key(f'feed:{feed_format}',
+                                    scopes(request, **kwargs),
+                                    [request.scheme, request.get_host(),
+                                     *sorted(kwargs.items())])
+        cached = cache.get(key)
+        if cached is not None:
+            versions.record('hits')
+            content_type, content = cached
+            return HttpResponse(content, content_type=content_type)
+        versions.record('misses')
+        response = feeds[feed_format](request, **kwargs)
+        # Ответ проверяется только по ETag от conditional.
+        del response['Last-Modified']
+        cache.set(key, (response['Content-Type'], response.content),
+                  settings.FRAGMENT_CACHE_TIMEOUT)
+        return response
+    return view
@@ -0,0 +1,198 @@
+"""Подписки читателя и id авторов по имени без запросов к базе.
+
+Подписки пользователя хранятся в кэше одним отсортированным массивом id
+авторов под версией его ленты (versions.feed_scope), которую меняют
+сигналы Follow. В пределах запроса массив запоминается на объекте
+пользователя, так что «подписан ли я на X» для профиля и всех карточек
+страницы — поиск делением пополам в памяти.
+
+Карточки постов лежат в общем для всех читателей кэше фрагментов,
+поэтому тег follow_button внутри фрагмента оставляет метку, а кнопки
+подставляются после чтения фрагмента из кэша (fill_buttons).
+"""
+
+import re
+from array import array
+from bisect import bisect_left
+
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.http import Http404
+from django.template.loader import render_to_string
+from django.utils.html import escape
+
+from . import counters, inbox, versions
+from .models import Follow, User
+
+FOLLOWING_KEY = 'posts:following:'
+USER_ID_KEY = 'posts:user-id:'
+TIMEOUT = 60 * 60 * 24
+BATCH_SIZE = 500
+BUTTON = re.compile(r'<!--follow:(\d+):([\w.@+-]+)-->')
+
+
+class FollowingSet:
+    """Отсортированный массив id авторов."""
+
+    def __init__(self, ids):
+        self.ids = ids
+
+    def __contains__(self, author_id):
+        index = bisect_left(self.ids, author_id)
+        return index < len(self.ids) and self.ids[index] == author_id
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    def __len__(self):
+        return len(self.ids)
+
+
+def author_ids(user):
+    """Авторы, на которых подписан user; пустое множество для гостя."""
+    if not user.is_authenticated:
+        return FollowingSet(array('I'))
+    following = getattr(user, '_following', None)
+    if following is not None:
+        return following
+    scope = versions.feed_scope(user.pk)
+    key = f'{FOLLOWING_KEY}{user.pk}:{versions.get_versions([scope])[scope]}'
+    ids = array('I')
+    packed = cache.get(key)
+    if packed is None:
+        ids.extend(Follow.objects.filter(user=user).order_by(
+            'author_id').values_list('author_id', flat=True))
+        cache.set(key, ids.tobytes(), TIMEOUT)
+    else:
+        ids.frombytes(packed)
+    user._following = FollowingSet(ids)
+    return user._following
+
+
+def author_id(username):
+    """id пользователя по имени или 404."""
+    key = USER_ID_KEY + username
+    pk = cache.get(key)
+    if pk is None:
+        pk = User.objects.filter(username=username).values_list(
+            'pk', flat=True).first()
+        if pk is None:
+            raise Http404('Пользователь не найден.')
+        cache.set(key, pk, TIMEOUT)
+    return pk
+
+
+def forget_username(username):
+    cache.delete(USER_ID_KEY + username)
+
+
+def follow(user, author_id):
+    """Подписывает user на автора; повторная подписка ничего не делает.
+
+    Одна вставка без предварительной проверки: дубликат от
+    одновременных запросов отсекает ограничение unique_follow.
+    """
+    if user.pk == author_id:
+        return False
+    try:
+        with transaction.atomic():
+            Follow.objects.create(user=user, author_id=author_id)
+    except IntegrityError:
+        return False
+    return True
+
+
+def unfollow(user, author_id):
+    deleted, _ = Follow.objects.filter(user=user,
+                                       author_id=author_id).delete()
+    return bool(deleted)
+
+
+def resolve(usernames):
+    """{имя: id} существующих пользователей, по запросу на пачку имен."""
+    usernames = sorted(set(usernames))
+    ids = {}
+    for start in range(0, len(usernames), BATCH_SIZE):
+        ids.update(User.objects.filter(
+            username__in=usernames[start:start + BATCH_SIZE]
+        ).values_list('username', 'pk'))
+    return ids
+
+
+def followed_among(user, author_ids):
+    """Те из author_ids, на кого user подписан, по запросу на пачку."""
+    followed = set()
+    for start in range(0, len(author_ids), BATCH_SIZE):
+        followed.update(Follow.objects.filter(
+            user=user, author_id__in=author_ids[start:start + BATCH_SIZE]
+        ).values_list('author_id', flat=True))
+    return followed
+
+
+def follow_many(user, usernames):
+    """Подписывает user на всех из usernames в одной транзакции.
+
+    Подписки вставляются пачками без сигналов, поэтому ленту и версию
+    ленты обновляем здесь сами. Возвращает число новых подписок и
+    неизвестные имена.
+    """
+    ids = resolve(usernames)
+    author_ids = set(ids.values()) - {user.pk}
+    ordered = sorted(author_ids)
+    with transaction.atomic():
+        existing = followed_among(user, ordered)
+        Follow.objects.bulk_create(
+            [Follow(user=user, author_id=author_id)
+             for author_id in ordered if author_id not in existing],
+            BATCH_SIZE, ignore_conflicts=True)
+        # ignore_conflicts не говорит, что вставилось, поэтому новые
+        # подписки перечитываются в той же транзакции. Она начата с
+        # BEGIN IMMEDIATE, так что чужих вставок между запросами нет.
+        new = sorted(followed_among(user, ordered) - existing)
+        inbox.backfill_many(user.pk, new)
+        counters.change_user_stats('following', [user.pk], len(new))
+        counters.change_user_stats('followers', new, 1)
+    if new:
+        versions.bump(versions.feed_scope(user.pk))
+    return len(new), sorted(set(usernames) - set(ids))
+
+
+def unfollow_many(user, usernames):
+    """Отписывает user от всех из usernames в одной транзакции."""
+    ids = resolve(usernames)
+    author_ids = sorted(ids.values())
+    deleted = 0
+    with transaction.atomic():
+        for start in range(0, len(author_ids), BATCH_SIZE):
+            deleted += Follow.objects.filter(
+                user=user,
+                author_id__in=author_ids[start:start + BATCH_SIZE]
+            ).delete()[0]
+    return deleted, sorted(set(usernames) - set(ids))
+
+
+def button_marker(author):
+    return f'<!--follow:{author.pk}:{escape(author.username)}-->'
+
+
+def render_button(user, author_id, username, following=None):
+    if not user.is_authenticated or user.pk == author_id:
+        return ''
+    if following is None:
+        following = author_ids(user)
+    return render_to_string('includes/follow_button.html', {
+        'username': username,
+        'following': author_id in following,
+    })
+
+
+def fill_buttons(html, user):
+    """Заменяет метки follow_button кнопками для читателя user."""
+    if '<!--follow:' not in html:
+        return html
+    if not user.is_authenticated:
+        return BUTTON.sub('', html)
+    following = author_ids(user)
+    return BUTTON.sub(
+        lambda match: render_button(user, int(match[1]), match[2],
+                                    following), html)
@@ -0,0 +1,99 @@
+from django.db import transaction
+from django.db.models import F
+
+from .models import FeedEntry, Follow, Post
+
+BATCH_SIZE = 500
+# Ключ курсора ленты подписок: поля FeedEntry из индекса
+# feed_user_pub_date_idx, а не поля поста — иначе SQLite сортирует всю
+# ленту читателя.
+CURSOR_FIELDS = ('feed_pub_date', 'feed_post_id')
+
+
+def _insert(entries):
+    FeedEntry.objects.bulk_create(entries, BATCH_SIZE, ignore_conflicts=True)
+
+
+def fan_out(post):
+    """Кладет новый пост в ленты всех подписчиков автора после коммита.
+
+    Раскладка не держит транзакцию, создавшую пост: каждая пачка из
+    BATCH_SIZE записей вставляется своей транзакцией. Вызывать до смены
+    версий поста: колбэки on_commit идут по порядку, и версии сменятся
+    уже после раскладки.
+    """
+    post_id, author_id, pub_date = post.pk, post.author_id, post.pub_date
+    transaction.on_commit(
+        lambda: fan_out_now(post_id, author_id, pub_date))
+
+
+def fan_out_now(post_id, author_id, pub_date):
+    followers = Follow.objects.filter(
+        author_id=author_id
+    ).values_list('user_id', flat=True)
+    entries = []
+    for user_id in followers.iterator():
+        entries.append(FeedEntry(user_id=user_id, post_id=post_id,
+                                 author_id=author_id, pub_date=pub_date))
+        if len(entries) >= BATCH_SIZE:
+            _insert(entries)
+            entries = []
+    _insert(entries)
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту подписчика все посты автора."""
+    posts = Post.objects.filter(
+        author_id=author_id
+    ).values_list('pk', 'pub_date')
+    entries = []
+    for post_id, pub_date in posts.iterator():
+        entries.append(FeedEntry(user_id=user_id, post_id=post_id,
+                                 author_id=author_id, pub_date=pub_date))
+        if len(entries) >= BATCH_SIZE:
+            _insert(entries)
+            entries = []
+    _insert(entries)
+
+
+def backfill_many(user_id, author_ids):
+    """backfill для многих авторов: по запросу на BATCH_SIZE авторов."""
+    author_ids = list(author_ids)
+    for start in range(0, len(author_ids), BATCH_SIZE):
+        posts = Post.objects.filter(
+            author_id__in=author_ids[start:start + BATCH_SIZE]
+        ).order_by().values_list('pk', 'author_id', 'pub_date')
+        entries = []
+        for post_id, author_id, pub_date in posts.iterator():
+            entries.append(FeedEntry(user_id=user_id, post_id=post_id,
+                                     author_id=author_id,
+                                     pub_date=pub_date))
+            if len(entries) >= BATCH_SIZE:
+                _insert(entries)
+                entries = []
+        _insert(entries)
+
+
+def prune(user_id, author_id):
+    """Убирает из ленты подписчика посты автора."""
+    FeedEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def rebuild():
+    """Пересобирает все ленты по текущим подпискам и постам."""
+    with transaction.atomic():
+        FeedEntry.objects.all().delete()
+        follows = Follow.objects.values_list('user_id', 'author_id')
+        for user_id, author_id in follows.iterator():
+            backfill(user_id, author_id)
+    return FeedEntry.objects.count()
+
+
+def feed_posts(user):
+    """Посты из ленты подписок пользователя, новые сверху."""
+    return Post.objects.filter(
+        feed_entries__user=user
+    ).annotate(
+        feed_pub_date=F('feed_entries__pub_date'),
+        feed_post_id=F('feed_entries__post'),
+    ).order_by('-feed_pub_date', '-feed_post_id')
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Ставит в очередь копии картинок для уже загруженных постов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--process', action='store_true',
+            help='Сразу обработать очередь, не дожидаясь воркера')
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').annotate(
+            variants=Count('image_variants')
+        ).filter(variants=0)
+        queued = 0
+        for post in posts.iterator():
+            thumbnails.enqueue(post)
+            queued += 1
+        self.stdout.write(f'Постов в очереди на нарезку: {queued}')
+        if options['process']:
+            while thumbnails.run_batch(100):
+                pass
+        self.stdout.write(self.style.SUCCESS(
+            f'Задач в очереди: {thumbnails.queue_depth()}'))
@@ -0,0 +1,36 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from posts import cache_benchmark
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает бэкенды кэша на фрагментах главной страницы и '
+            'страниц групп при нескольких воркерах и выводит JSON')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--backend', action='append', dest='backends',
+            choices=sorted(cache_benchmark.backends('')),
+            help='Бэкенд для замера; по умолчанию все')
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument(
+            '--requests', type=int, default=200,
+            help='Запросов на одного воркера')
+        parser.add_argument(
+            '--operations', type=int, default=5000,
+            help='Обращений к кэшу на одного воркера в замере cache_ops')
+        parser.add_argument('--skew', type=float, default=1.1)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--directory',
+            help='Каталог для файлов кэша; по умолчанию /dev/shm')
+
+    def handle(self, *args, **options):
+        report = cache_benchmark.run(
+            names=options['backends'], workers=options['workers'],
+            requests=options['requests'],
+            operations=options['operations'], skew=options['skew'],
+            seed=options['seed'], directory=options['directory'])
+        self.stdout.write(json.dumps(report, ensure_ascii=False, indent=2))
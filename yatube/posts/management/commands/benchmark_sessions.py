@@ -0,0 +1,25 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import session_benchmark
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает режимы сессий по числу SQL-запросов на ленте '
+            'подписок и при создании поста и выводит JSON')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--mode', action='append', dest='modes',
+            choices=sorted(settings.SESSION_ENGINES),
+            help='Режим для замера; по умолчанию все')
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+
+    def handle(self, *args, **options):
+        report = session_benchmark.run(modes=options['modes'],
+                                       repeat=options['repeat'],
+                                       warmup=options['warmup'])
+        self.stdout.write(json.dumps(report, ensure_ascii=False, indent=2))
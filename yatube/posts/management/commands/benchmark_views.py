@@ -0,0 +1,47 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from posts import benchmark
+
+
+class Command(BaseCommand):
+    help = ('Меряет p50/p95/p99 задержки и число SQL-запросов каждой '
+            'страницы posts и выводит результат в JSON')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument(
+            '--cold', action='store_true',
+            help='Очищать кэш перед каждым запросом')
+        parser.add_argument(
+            '--label', default='',
+            help='Метка замера, например хэш коммита')
+        parser.add_argument(
+            '--output',
+            help='Файл для JSON; по умолчанию вывод в stdout')
+        parser.add_argument(
+            '--baseline',
+            help='JSON прошлого замера: добавить отношение p95 к нему')
+
+    def handle(self, *args, **options):
+        report = benchmark.run(repeat=options['repeat'],
+                               warmup=options['warmup'],
+                               cold=options['cold'])
+        report['label'] = options['label']
+        if options['baseline']:
+            with open(options['baseline']) as file:
+                baseline = json.load(file)['urls']
+            for name, result in report['urls'].items():
+                if name in baseline and baseline[name]['p95_ms']:
+                    result['p95_vs_baseline'] = round(
+                        result['p95_ms'] / baseline[name]['p95_ms'], 3)
+        output = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(output + '\n')
+            self.stdout.write(self.style.SUCCESS(
+                f'Результаты записаны в {options["output"]}'))
+        else:
+            self.stdout.write(output)
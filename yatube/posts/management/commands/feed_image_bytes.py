@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand
+from sorl.thumbnail import get_thumbnail
+
+from posts import thumbnails
+from posts.models import Post
+from posts.views import POSTS_ON_PAGE
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает объем картинок первой страницы ленты: миниатюра '
+            '960x339 против копии из srcset')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--viewport', type=int, nargs='+', default=[360, 768, 1280],
+            help='Ширины окна браузера в CSS-пикселях')
+        parser.add_argument(
+            '--dpr', type=float, default=2,
+            help='Плотность пикселей экрана')
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').for_cards()[:POSTS_ON_PAGE]
+        before = 0
+        variants = []
+        for post in posts:
+            # Так картинку отдавал шаблон до появления копий.
+            thumbnail = get_thumbnail(post.image, '960x339', crop='center',
+                                      upscale=True)
+            before += thumbnail.storage.size(thumbnail.name)
+            variants.append((post, list(post.image_variants.all())))
+        self.stdout.write(f'Постов с картинками: {len(variants)}')
+        self.stdout.write(f'Миниатюры 960x339: {before} байт')
+        for viewport in options['viewport']:
+            pixels = min(viewport, thumbnails.ASPECT[0]) * options['dpr']
+            for image_format in (thumbnails.WEBP, None):
+                after = sum(
+                    self.pick(post, post_variants, image_format, pixels)
+                    for post, post_variants in variants)
+                name = image_format or 'исходный формат'
+                self.stdout.write(
+                    f'{viewport}px, {name}: {after} байт '
+                    f'({self.ratio(after, before)})')
+
+    def pick(self, post, variants, image_format, pixels):
+        """Размер копии, которую браузер возьмет из srcset; без копий
+        шаблон отдает оригинал."""
+        if not variants:
+            return post.image.size
+        webp = image_format == thumbnails.WEBP
+        variants = [variant for variant in variants
+                    if (variant.format == thumbnails.WEBP) == webp
+                    ] or variants
+        for variant in variants:
+            if variant.width >= pixels:
+                return variant.size
+        return variants[-1].size
+
+    def ratio(self, after, before):
+        if not before:
+            return '—'
+        return f'{after / before:.0%} от миниатюр'
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from posts import versions
+
+
+class Command(BaseCommand):
+    help = 'Показывает попадания и промахи кэша фрагментов лент'
+
+    def handle(self, *args, **options):
+        stats = versions.stats()
+        total = stats['hits'] + stats['misses']
+        ratio = stats['hits'] / total if total else 0
+        self.stdout.write(
+            f"hits: {stats['hits']}\nmisses: {stats['misses']}\n"
+            f'hit ratio: {ratio:.2%}')
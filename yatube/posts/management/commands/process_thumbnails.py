@@ -0,0 +1,50 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+
+
+class Command(BaseCommand):
+    help = 'Нарезает миниатюры из очереди ThumbnailJob'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Обработать очередь один раз и выйти')
+        parser.add_argument(
+            '--batch', type=int, default=20,
+            help='Сколько задач забирать за один проход')
+        parser.add_argument(
+            '--sleep', type=float, default=5,
+            help='Пауза в секундах, когда очередь пуста')
+        parser.add_argument(
+            '--stale-after', type=int, default=thumbnails.STALE_SECONDS,
+            help='Через сколько секунд задача в работе считается '
+                 'брошенной и возвращается в очередь')
+        parser.add_argument(
+            '--stats', action='store_true',
+            help='Только показать длину очереди')
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            self.report_depth()
+            return
+        while True:
+            done = thumbnails.run_batch(options['batch'],
+                                        options['stale_after'])
+            for job, seconds in done:
+                self.stdout.write(
+                    f'{job.post_id} {job.geometry}: {job.status} '
+                    f'за {seconds * 1000:.0f} мс')
+            if options['once'] and not done:
+                break
+            if done:
+                self.report_depth()
+            else:
+                time.sleep(options['sleep'])
+        self.report_depth()
+
+    def report_depth(self):
+        self.stdout.write(self.style.SUCCESS(
+            f'Задач в очереди: {thumbnails.queue_depth()}'))
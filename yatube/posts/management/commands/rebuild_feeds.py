@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from posts import inbox
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает ленты подписок из таблиц Follow и Post'
+
+    def handle(self, *args, **options):
+        entries = inbox.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Ленты пересобраны, записей: {entries}'))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from posts import counters
+
+
+class Command(BaseCommand):
+    help = ('Сверяет числа профилей (подписчики, подписки, посты, '
+            'комментарии) с таблицами и исправляет расхождения')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int,
+                            default=counters.BATCH_SIZE)
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать расхождения, ничего не менять')
+
+    def handle(self, *args, **options):
+        checked, drift = counters.reconcile_user_stats(
+            batch_size=options['batch_size'], fix=not options['dry_run'])
+        self.stdout.write(f'Проверено профилей: {checked}')
+        for field, count in sorted(drift.items()):
+            self.stdout.write(f'{field}: расходится у {count}')
+        if not drift:
+            self.stdout.write(self.style.SUCCESS('Расхождений нет'))
+        elif options['dry_run']:
+            self.stdout.write(self.style.WARNING('Ничего не изменено'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Расхождения исправлены'))
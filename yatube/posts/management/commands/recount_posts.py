@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from posts import counters
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счетчики постов (всего, по группам и авторам)'
+
+    def handle(self, *args, **options):
+        scopes = counters.recount()
+        self.stdout.write(self.style.SUCCESS(
+            f'Счетчики пересчитаны: {scopes}'))
@@ -0,0 +1,61 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import counters, inbox, search, seeding
+
+
+class Command(BaseCommand):
+    help = ('Заполняет базу нагрузочными данными: пользователи, группы, '
+            'посты, комментарии и подписки с распределением Ципфа')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument('--comments', type=int, default=100000)
+        parser.add_argument('--follows', type=int, default=20000)
+        parser.add_argument(
+            '--skew', type=float, default=1.1,
+            help='Показатель закона Ципфа: чем больше, тем сильнее '
+                 'перекос в пользу популярных авторов и постов')
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='За сколько дней распределить даты постов')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--prefix', default='load',
+            help='Префикс имен пользователей и адресов групп')
+        parser.add_argument(
+            '--seed', type=int, default=None,
+            help='Зерно генератора для воспроизводимых данных')
+        parser.add_argument(
+            '--skip-derived', action='store_true',
+            help='Не пересобирать ленты, счетчики и поисковый индекс')
+
+    def handle(self, *args, **options):
+        if options['users'] < 1:
+            raise CommandError('Нужен хотя бы один пользователь.')
+        started = time.monotonic()
+        stats = seeding.seed(
+            users=options['users'],
+            groups=options['groups'],
+            posts=options['posts'],
+            comments=options['comments'],
+            follows=options['follows'],
+            skew=options['skew'],
+            days=options['days'],
+            batch_size=options['batch_size'],
+            prefix=options['prefix'],
+            seed=options['seed'],
+        )
+        for name, count in stats.items():
+            self.stdout.write(f'{name}: {count}')
+        if not options['skip_derived']:
+            self.stdout.write(f'Записей в лентах: {inbox.rebuild()}')
+            counters.recount()
+            counters.reconcile_user_stats()
+            self.stdout.write(
+                f'Проиндексировано постов: {search.rebuild()}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово за {time.monotonic() - started:.1f} с'))
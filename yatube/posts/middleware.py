@@ -0,0 +1,84 @@
+"""Кэш целых ответов для гостей.
+
+Страницы, помеченные versions.anonymous_page, отдаются гостям из кэша
+до сессий, аутентификации, контекстных процессоров и view. Ключ — адрес
+и параметр page вместе с версиями областей страницы, поэтому сигналы
+Post, Comment, Group и Follow, меняющие версии, сбрасывают и эти
+ответы. Гостем считается запрос без cookie сессии и сообщений; запросы
+с другими параметрами строки проходят мимо кэша.
+"""
+
+from django.conf import settings
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.cache import cache
+from django.http import Http404, HttpResponse
+from django.urls import Resolver404, resolve
+from django.utils.cache import get_conditional_response
+
+from core import metrics
+
+from . import versions
+
+PAGE_PARAMETER = 'page'
+
+
+class AnonymousPageMiddleware:
+    """Ставится после SecurityMiddleware и до SessionMiddleware."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.cookies = (settings.SESSION_COOKIE_NAME,
+                        CookieStorage.cookie_name)
+
+    def __call__(self, request):
+        key = self.cache_key(request)
+        if key is None:
+            return self.get_response(request)
+        cached = cache.get(key)
+        if cached is not None:
+            metrics.add('page_cache_hits')
+            return self.cached_response(request, *cached)
+        metrics.add('page_cache_misses')
+        response = self.get_response(request)
+        if self.cacheable(request, response):
+            cache.set(key, (response.content, list(response.items())),
+                      settings.FRAGMENT_CACHE_TIMEOUT)
+        return response
+
+    def cache_key(self, request):
+        if (request.method != 'GET'
+                or any(name in request.COOKIES for name in self.cookies)
+                or set(request.GET) - {PAGE_PARAMETER}):
+            return None
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return None
+        scopes_func = getattr(match.func, 'anonymous_scopes', None)
+        if scopes_func is None:
+            return None
+        try:
+            scopes = scopes_func(**match.kwargs)
+        except Http404:
+            return None
+        # Для метрик: при попадании view и резолвер не вызываются.
+        request.resolver_match = match
+        return versions.fragment_key(
+            'page', scopes,
+            [request.get_host(), request.path,
+             request.GET.get(PAGE_PARAMETER, '')])
+
+    def cacheable(self, request, response):
+        user = getattr(request, 'user', None)
+        return (response.status_code == 200
+                and not response.streaming
+                and not response.cookies
+                and not (user is not None and user.is_authenticated)
+                and 'private' not in response.get('Cache-Control', ''))
+
+    def cached_response(self, request, content, headers):
+        response = HttpResponse(content)
+        for header, value in headers:
+            response[header] = value
+        return get_conditional_response(
+            request, etag=response.get('ETag'), response=response)
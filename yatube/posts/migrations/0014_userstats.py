@@ -0,0 +1,47 @@
+# Generated by Django 2.2.16 on 2026-10-18 03:49
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.deletion
+
+
+def fill_user_stats(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    UserStats = apps.get_model('posts', 'UserStats')
+    sources = {
+        'followers': (apps.get_model('posts', 'Follow'), 'author'),
+        'following': (apps.get_model('posts', 'Follow'), 'user'),
+        'posts': (apps.get_model('posts', 'Post'), 'author'),
+        'comments': (apps.get_model('posts', 'Comment'), 'author'),
+    }
+    values = {pk: {} for pk in User.objects.values_list('pk', flat=True)}
+    for field, (model, user_field) in sources.items():
+        for user_id, count in model.objects.values_list(
+                user_field).annotate(Count('pk')).order_by():
+            values[user_id][field] = count
+    UserStats.objects.bulk_create(
+        (UserStats(user_id=pk, **counts) for pk, counts in values.items()),
+        500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('posts', '0013_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('followers', models.IntegerField(default=0)),
+                ('following', models.IntegerField(default=0)),
+                ('posts', models.IntegerField(default=0)),
+                ('comments', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(fill_user_stats, migrations.RunPython.noop),
+    ]
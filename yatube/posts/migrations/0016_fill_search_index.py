@@ -0,0 +1,45 @@
+from collections import Counter
+
+from django.db import migrations
+
+from posts.search import FTS_TABLE, sqlite_has_fts5, tokenize
+
+BATCH_SIZE = 500
+
+
+def fill_search_index(apps, schema_editor):
+    """Индексирует посты, написанные до появления поиска (0009)."""
+    Post = apps.get_model('posts', 'Post')
+    SearchTerm = apps.get_model('posts', 'SearchTerm')
+    connection = schema_editor.connection
+    posts = Post.objects.using(connection.alias).only('pk', 'text')
+    if connection.vendor == 'sqlite' and sqlite_has_fts5():
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            for post in posts.iterator(BATCH_SIZE):
+                cursor.execute(
+                    f'INSERT INTO {FTS_TABLE} (rowid, body) '
+                    f'VALUES (%s, %s)',
+                    [post.pk, ' '.join(tokenize(post.text))])
+        return
+    SearchTerm.objects.using(connection.alias).all().delete()
+    terms = []
+    for post in posts.iterator(BATCH_SIZE):
+        terms.extend(
+            SearchTerm(term=term[:64], post_id=post.pk, weight=weight)
+            for term, weight in Counter(tokenize(post.text)).items())
+        if len(terms) >= BATCH_SIZE:
+            SearchTerm.objects.using(connection.alias).bulk_create(terms)
+            terms = []
+    SearchTerm.objects.using(connection.alias).bulk_create(terms)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_feed_entry_post_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_search_index, migrations.RunPython.noop),
+    ]
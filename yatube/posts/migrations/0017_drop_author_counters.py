@@ -0,0 +1,19 @@
+from django.db import migrations
+
+
+def drop_author_counters(apps, schema_editor):
+    """Посты автора считает UserStats.posts, строки author:<id> не нужны."""
+    PostCounter = apps.get_model('posts', 'PostCounter')
+    PostCounter.objects.using(schema_editor.connection.alias).filter(
+        scope__startswith='author:').delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_fill_search_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_author_counters, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
@@ -14,6 +14,26 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    def for_cards(self):
+        """Все, что показывает карточка поста, за два запроса."""
+        return self.select_related('author', 'group').prefetch_related(
+            'image_variants')
+
+    def bulk_create(self, objs, *args, **kwargs):
+        """Создает посты и обновляет счетчики и версии фрагментов.
+
+        Поисковый индекс и ленты подписчиков не обновляются: на SQLite
+        bulk_create не возвращает id новых постов. После вставки
+        вызывайте search.rebuild() и inbox.rebuild(), как seed_load.
+        """
+        from .signals import posts_added
+
+        objs = super().bulk_create(objs, *args, **kwargs)
+        posts_added(objs)
+        return objs
+
+
 class Post(models.Model):
     text = models.TextField(verbose_name='Текст поста',
                             help_text='Текст публикуемого поста')
@@ -38,12 +58,28 @@ class Post(models.Model):
         blank=True
     )
 
+    objects = PostQuerySet.as_manager()
+
     class Meta:
         ordering = ['-pub_date']
+        indexes = [
+            # Ленты сортируются по (pub_date, id), в том числе курсорные.
+            models.Index(fields=['pub_date', 'id'],
+                         name='post_pub_date_idx'),
+            models.Index(fields=['author', 'pub_date', 'id'],
+                         name='post_author_pub_date_idx'),
+            models.Index(fields=['group', 'pub_date', 'id'],
+                         name='post_group_pub_date_idx'),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
+    def save(self, *args, **kwargs):
+        # Счетчики и ленты обновляются в post_save в той же транзакции.
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
 
 class Comment(models.Model):
     post = models.ForeignKey(
@@ -62,6 +98,11 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ['-created']
+        indexes = [
+            # Курсорная пагинация комментариев поста по (created, id).
+            models.Index(fields=['post', '-created', '-id'],
+                         name='comment_post_created_idx'),
+        ]
 
 
 class Follow(models.Model):
@@ -69,3 +110,130 @@ class Follow(models.Model):
                              related_name="follower")
     author = models.ForeignKey(User, on_delete=models.CASCADE,
                                related_name="following")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'author'],
+                                    name='unique_follow'),
+        ]
+
+
+class FeedEntry(models.Model):
+    """Материализованная лента подписок: одна строка на пост в ленте
+    подписчика."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE,
+                             related_name='feed')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE,
+                             related_name='feed_entries')
+    author = models.ForeignKey(User, on_delete=models.CASCADE,
+                               related_name='+')
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-pub_date']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'post'],
+                                    name='unique_feed_entry'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-post'],
+                         name='feed_user_pub_date_idx'),
+            models.Index(fields=['user', 'author'],
+                         name='feed_user_author_idx'),
+        ]
+
+
+class PostCounter(models.Model):
+    """Денормализованное число постов: всего, в группе или у автора."""
+    scope = models.CharField(max_length=64, unique=True)
+    value = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.scope}: {self.value}'
+
+
+class UserStats(models.Model):
+    """Денормализованные числа профиля пользователя."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE,
+                                primary_key=True, related_name='stats')
+    followers = models.IntegerField(default=0)
+    following = models.IntegerField(default=0)
+    posts = models.IntegerField(default=0)
+    comments = models.IntegerField(default=0)
+
+    def __str__(self):
+        return (f'{self.user_id}: {self.followers} подписчиков, '
+                f'{self.following} подписок, {self.posts} постов, '
+                f'{self.comments} комментариев')
+
+
+class SearchTerm(models.Model):
+    """Обратный индекс для поиска на базах без FTS5."""
+    term = models.CharField(max_length=64)
+    post = models.ForeignKey(Post, on_delete=models.CASCADE,
+                             related_name='search_terms')
+    weight = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['term', 'post'], name='search_term_post_idx'),
+        ]
+
+
+class ThumbnailJob(models.Model):
+    """Задача фоновой нарезки миниатюры для картинки поста."""
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'В очереди'),
+        (RUNNING, 'В работе'),
+        (DONE, 'Готово'),
+        (FAILED, 'Ошибка'),
+    )
+
+    post = models.ForeignKey(Post, on_delete=models.CASCADE,
+                             related_name='thumbnail_jobs')
+    geometry = models.CharField(max_length=32)
+    status = models.CharField(max_length=16, choices=STATUSES,
+                              default=PENDING)
+    created = models.DateTimeField(auto_now_add=True)
+    started = models.DateTimeField(null=True, blank=True)
+    finished = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ['created']
+        indexes = [
+            models.Index(fields=['status', 'created'],
+                         name='thumbnail_job_queue_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.post_id} {self.geometry} {self.status}'
+
+
+class ImageVariant(models.Model):
+    """Уменьшенная копия картинки поста заданной ширины и формата;
+    файл лежит рядом с оригиналом."""
+    post = models.ForeignKey(Post, on_delete=models.CASCADE,
+                             related_name='image_variants')
+    width = models.PositiveIntegerField()
+    format = models.CharField(max_length=8)
+    image = models.ImageField(max_length=255)
+    size = models.PositiveIntegerField()
+
+    class Meta:
+        ordering = ['width']
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'width', 'format'],
+                                    name='unique_image_variant'),
+        ]
+
+    def __str__(self):
+        return f'{self.image.name} {self.width}w'
+
+    @property
+    def mime_type(self):
+        return f'image/{self.format.lower()}'
@@ -0,0 +1,165 @@
+import base64
+from collections.abc import Sequence
+
+from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+
+def encode_cursor(values):
+    raw = '|'.join(
+        value.isoformat() if hasattr(value, 'isoformat') else str(value)
+        for value in values
+    )
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Возвращает пару (дата, id) из токена или None, если токен битый."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        date, pk = raw.split('|')
+        date = parse_datetime(date)
+        pk = int(pk)
+    except (TypeError, ValueError, UnicodeDecodeError):
+        return None
+    if date is None:
+        return None
+    return date, pk
+
+
+class CountedPaginator(Paginator):
+    """Paginator, который берет число объектов из готового счетчика
+    вместо SELECT COUNT(*)."""
+
+    def __init__(self, object_list, per_page, count, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self._count = count
+
+    @cached_property
+    def count(self):
+        return self._count
+
+
+class OpenEndedPaginator(Paginator):
+    """Paginator без SELECT COUNT(*): страница читает на одну запись
+    больше, чтобы узнать, есть ли следующая.
+
+    Число объектов известно только после page() и только до следующей
+    страницы; номер за концом списка дает первую страницу.
+    """
+    open_ended = True
+
+    @cached_property
+    def count(self):
+        return 0
+
+    def validate_number(self, number):
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger('Номер страницы должен быть числом')
+        if number < 1:
+            raise EmptyPage('Номер страницы меньше 1')
+        return number
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not rows and number > 1:
+            raise EmptyPage('На этой странице нет объектов')
+        self.count = bottom + len(rows)
+        return self._get_page(rows[:self.per_page], number, self)
+
+    def get_page(self, number):
+        try:
+            return self.page(number)
+        except (PageNotAnInteger, EmptyPage):
+            return self.page(1)
+
+
+class CursorPage(Sequence):
+    """Страница курсорной пагинации; по интерфейсу похожа на Page."""
+    cursor = True
+
+    def __init__(self, object_list, paginator, next_token=None,
+                 previous_token=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_token = next_token
+        self.previous_token = previous_token
+
+    def __repr__(self):
+        return (f'<CursorPage after={self.previous_token} '
+                f'before={self.next_token}>')
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_token is not None
+
+    def has_previous(self):
+        return self.previous_token is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """Keyset-пагинация по паре полей (по умолчанию pub_date, id).
+
+    Вместо OFFSET и COUNT страница выбирается условием на ключ последней
+    показанной записи, поэтому глубокие страницы не медленнее первой,
+    а новые записи не сдвигают уже открытые страницы.
+    """
+
+    def __init__(self, object_list, per_page, fields=('pub_date', 'id')):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.fields = fields
+
+    def _token(self, obj):
+        return encode_cursor(getattr(obj, field) for field in self.fields)
+
+    def _seek(self, cursor, lookup):
+        first, second = self.fields
+        value, pk = cursor
+        return (Q(**{f'{first}__{lookup}': value})
+                | Q(**{first: value, f'{second}__{lookup}': pk}))
+
+    def get_page(self, after=None, before=None):
+        first, second = self.fields
+        after = decode_cursor(after) if after else None
+        before = decode_cursor(before) if before else None
+        queryset = self.object_list
+        if before is not None and after is None:
+            rows = list(queryset.filter(
+                self._seek(before, 'gt')
+            ).order_by(first, second)[:self.per_page + 1])
+            if len(rows) <= self.per_page:
+                # Дошли до начала списка: показываем полную первую страницу.
+                return self.get_page()
+            rows = rows[:self.per_page][::-1]
+            has_previous = has_next = True
+        else:
+            if after is not None:
+                queryset = queryset.filter(self._seek(after, 'lt'))
+            rows = list(queryset.order_by(
+                f'-{first}', f'-{second}'
+            )[:self.per_page + 1])
+            has_next = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+            has_previous = after is not None and bool(rows)
+        return CursorPage(
+            rows,
+            self,
+            next_token=self._token(rows[-1]) if has_next else None,
+            previous_token=self._token(rows[0]) if has_previous else None,
+        )
@@ -0,0 +1,235 @@
+"""Полнотекстовый поиск по постам.
+
+На SQLite используется виртуальная таблица FTS5, на других базах —
+обратный индекс в таблице SearchTerm. В оба индекса кладутся основы
+слов после русского стеммера, поэтому «котами» находит «кот».
+"""
+
+import math
+import re
+import sqlite3
+from collections import Counter
+from functools import lru_cache
+
+from django.db import connection
+from django.db.models import Case, Count, F, FloatField, Sum, When
+from django.db.models.expressions import RawSQL
+
+from .models import Post, SearchTerm
+
+FTS_TABLE = 'posts_post_fts'
+WORD = re.compile(r'\w+')
+VOWELS = 'аеиоуыэюя'
+
+PERFECTIVE_GERUND = re.compile(
+    r'((ив|ивши|ившись|ыв|ывши|ывшись)|((?<=[ая])(в|вши|вшись)))$')
+REFLEXIVE = re.compile(r'(с[яь])$')
+ADJECTIVE = re.compile(
+    r'(ее|ие|ые|ое|ими|ыми|ей|ий|ый|ой|ем|им|ым|ом|его|ого|ему|ому|их|ых'
+    r'|ую|юю|ая|яя|ою|ею)$')
+PARTICIPLE = re.compile(r'((ивш|ывш|ующ)|((?<=[ая])(ем|нн|вш|ющ|щ)))$')
+VERB = re.compile(
+    r'((ила|ыла|ена|ейте|уйте|ите|или|ыли|ей|уй|ил|ыл|им|ым|ен|ило|ыло'
+    r'|ено|ят|ует|уют|ит|ыт|ены|ить|ыть|ишь|ую|ю)'
+    r'|((?<=[ая])(ла|на|ете|йте|ли|й|л|ем|н|ло|но|ет|ют|ны|ть|ешь|нно)))$')
+NOUN = re.compile(
+    r'(а|ев|ов|ие|ье|е|иями|ями|ами|еи|ии|и|ией|ей|ой|ий|й|иям|ям|ием'
+    r'|ем|ам|ом|о|у|ах|иях|ях|ы|ь|ию|ью|ю|ия|ья|я)$')
+RV = re.compile(rf'^(.*?[{VOWELS}])(.*)$')
+DERIVATIONAL = re.compile(rf'.*[^{VOWELS}]+[{VOWELS}].*ость?$')
+DERIVATIONAL_ENDING = re.compile(r'ость?$')
+SUPERLATIVE = re.compile(r'(ейше|ейш)$')
+
+
+def stem(word):
+    """Русский стеммер Портера (Snowball); латиница не меняется."""
+    match = RV.match(word)
+    if not match:
+        return word
+    start, rv = match.groups()
+    stripped = PERFECTIVE_GERUND.sub('', rv, 1)
+    if stripped == rv:
+        rv = REFLEXIVE.sub('', rv, 1)
+        stripped = ADJECTIVE.sub('', rv, 1)
+        if stripped != rv:
+            rv = PARTICIPLE.sub('', stripped, 1)
+        else:
+            stripped = VERB.sub('', rv, 1)
+            rv = NOUN.sub('', rv, 1) if stripped == rv else stripped
+    else:
+        rv = stripped
+    rv = re.sub('и$', '', rv, 1)
+    if DERIVATIONAL.match(rv):
+        rv = DERIVATIONAL_ENDING.sub('', rv, 1)
+    stripped = re.sub('ь$', '', rv, 1)
+    if stripped == rv:
+        rv = SUPERLATIVE.sub('', rv, 1)
+        rv = re.sub('нн$', 'н', rv, 1)
+    else:
+        rv = stripped
+    return start + rv
+
+
+def tokenize(text):
+    words = WORD.findall(text.lower().replace('ё', 'е'))
+    return [stem(word) for word in words if len(word) > 1]
+
+
+class SqliteFtsIndex:
+    """Индекс в виртуальной таблице FTS5, ранжирование по bm25."""
+
+    def index(self, post):
+        body = ' '.join(tokenize(post.text))
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                           [post.pk])
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, body) VALUES (%s, %s)',
+                [post.pk, body])
+
+    def remove(self, post_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                           [post_id])
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+
+    def _match(self, terms):
+        return ' '.join(f'"{term}"' for term in terms)
+
+    def filter(self, queryset, terms):
+        return queryset.filter(pk__in=RawSQL(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+            [self._match(terms)]))
+
+    def count(self, terms):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT COUNT(*) FROM {FTS_TABLE} '
+                f'WHERE {FTS_TABLE} MATCH %s',
+                [self._match(terms)])
+            return cursor.fetchone()[0]
+
+    def ranked_ids(self, terms, offset, limit):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+                f'ORDER BY bm25({FTS_TABLE}), rowid DESC LIMIT %s OFFSET %s',
+                [self._match(terms), limit, offset])
+            return [row[0] for row in cursor.fetchall()]
+
+
+class InvertedIndex:
+    """Обратный индекс в таблице SearchTerm, ранжирование по tf-idf."""
+
+    def index(self, post):
+        SearchTerm.objects.filter(post_id=post.pk).delete()
+        SearchTerm.objects.bulk_create(
+            SearchTerm(term=term[:64], post_id=post.pk, weight=weight)
+            for term, weight in Counter(tokenize(post.text)).items())
+
+    def remove(self, post_id):
+        SearchTerm.objects.filter(post_id=post_id).delete()
+
+    def clear(self):
+        SearchTerm.objects.all().delete()
+
+    def _matches(self, terms):
+        return SearchTerm.objects.filter(term__in=terms).values(
+            'post'
+        ).annotate(matched=Count('term')).filter(matched=len(terms))
+
+    def filter(self, queryset, terms):
+        return queryset.filter(
+            pk__in=self._matches(terms).values('post'))
+
+    def count(self, terms):
+        return self._matches(terms).count()
+
+    def ranked_ids(self, terms, offset, limit):
+        posts = Post.objects.count() or 1
+        frequency = dict(SearchTerm.objects.filter(
+            term__in=terms
+        ).values_list('term').annotate(Count('post')).order_by())
+        idf = [When(term=term, then=math.log(1 + posts / frequency[term]))
+               for term in terms if term in frequency]
+        if not idf:
+            return []
+        ranked = self._matches(terms).annotate(score=Sum(
+            F('weight') * Case(*idf, output_field=FloatField()),
+            output_field=FloatField(),
+        )).order_by('-score', '-post')
+        return list(ranked.values_list(
+            'post', flat=True)[offset:offset + limit])
+
+
+@lru_cache(maxsize=None)
+def sqlite_has_fts5():
+    try:
+        sqlite3.connect(':memory:').execute(
+            'CREATE VIRTUAL TABLE probe USING fts5(body)')
+    except sqlite3.OperationalError:
+        return False
+    return True
+
+
+def get_index():
+    if connection.vendor == 'sqlite' and sqlite_has_fts5():
+        return SqliteFtsIndex()
+    return InvertedIndex()
+
+
+class SearchResults:
+    """Ленивый список найденных постов для Paginator: считает и выбирает
+    только нужную страницу."""
+
+    def __init__(self, query, queryset=None):
+        self.terms = sorted(set(tokenize(query)))
+        self.index = get_index()
+        self.queryset = Post.objects.for_cards()
+        if queryset is not None:
+            self.queryset = queryset
+
+    def count(self):
+        return self.index.count(self.terms) if self.terms else 0
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, item):
+        if not isinstance(item, slice):
+            return self[item:item + 1][0]
+        if not self.terms:
+            return []
+        start = item.start or 0
+        ids = self.index.ranked_ids(self.terms, start, item.stop - start)
+        posts = self.queryset.in_bulk(ids)
+        return [posts[pk] for pk in ids if pk in posts]
+
+
+def filter_posts(queryset, query):
+    """Отбирает посты, содержащие все слова запроса (без ранжирования)."""
+    terms = sorted(set(tokenize(query)))
+    if not terms:
+        return queryset.none()
+    return get_index().filter(queryset, terms)
+
+
+def index_post(post):
+    get_index().index(post)
+
+
+def remove_post(post_id):
+    get_index().remove(post_id)
+
+
+def rebuild(batch_size=500):
+    index = get_index()
+    index.clear()
+    indexed = 0
+    for post in Post.objects.only('pk', 'text').iterator(batch_size):
+        index.index(post)
+        indexed += 1
+    return indexed
@@ -0,0 +1,144 @@
+"""Генерация нагрузочных данных.
+
+Авторы постов, популярные посты и популярные авторы выбираются по
+закону Ципфа: немногие «звезды» получают большую часть постов,
+комментариев и подписчиков, как на живом сайте. Все вставки идут
+пачками через bulk_create.
+"""
+
+import itertools
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Comment, Follow, Group, Post, User
+
+# Доля постов без группы.
+UNGROUPED = 0.3
+
+
+class Zipf:
+    """Выбор номера 0..n-1 с вероятностью, пропорциональной 1 / (k+1)^s."""
+
+    def __init__(self, n, s, rng):
+        self.rng = rng
+        self.population = range(n)
+        self.cum_weights = list(itertools.accumulate(
+            1 / (rank ** s) for rank in range(1, n + 1)))
+
+    def __call__(self):
+        return self.rng.choices(self.population,
+                                cum_weights=self.cum_weights)[0]
+
+
+@contextmanager
+def explicit_dates(*fields):
+    """Отключает auto_now_add, чтобы сохранить сгенерированные даты."""
+    saved = [field.auto_now_add for field in fields]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, value in zip(fields, saved):
+            field.auto_now_add = value
+
+
+def batches(objects, size):
+    iterator = iter(objects)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def insert(model, objects, batch_size, **kwargs):
+    created = 0
+    for batch in batches(objects, batch_size):
+        with transaction.atomic():
+            model.objects.bulk_create(batch, **kwargs)
+        created += len(batch)
+    return created
+
+
+def new_ids(model, start):
+    """id строк, вставленных после start; вставка идет подряд."""
+    return list(model.objects.filter(pk__gt=start).order_by(
+        'pk').values_list('pk', flat=True))
+
+
+def last_id(model):
+    return model.objects.order_by('-pk').values_list(
+        'pk', flat=True).first() or 0
+
+
+def seed(users=100, groups=10, posts=1000, comments=1000, follows=500,
+         skew=1.1, days=365, batch_size=1000, prefix='load', seed=None):
+    """Создает данные и возвращает словарь с числом вставленных строк."""
+    rng = random.Random(seed)
+    now = timezone.now()
+    span = timedelta(days=days).total_seconds()
+    stats = {}
+
+    start = last_id(User)
+    stats['users'] = insert(User, (
+        User(username=f'{prefix}_user_{start + i}', password='!',
+             first_name=f'User{start + i}')
+        for i in range(users)), batch_size)
+    user_ids = new_ids(User, start)
+
+    start = last_id(Group)
+    stats['groups'] = insert(Group, (
+        Group(title=f'Group {start + i}', slug=f'{prefix}-{start + i}',
+              description=f'Load group {start + i}')
+        for i in range(groups)), batch_size)
+    group_ids = new_ids(Group, start)
+
+    def random_date():
+        return now - timedelta(seconds=rng.random() * span)
+
+    authors = Zipf(len(user_ids), skew, rng)
+    group_ranks = Zipf(len(group_ids), skew, rng) if group_ids else None
+    post_fields = (Post._meta.get_field('pub_date'),
+                   Comment._meta.get_field('created'))
+
+    def new_posts():
+        for i in range(posts):
+            group_id = None
+            if group_ranks and rng.random() > UNGROUPED:
+                group_id = group_ids[group_ranks()]
+            yield Post(text=f'Load post {i}', pub_date=random_date(),
+                       author_id=user_ids[authors()], group_id=group_id)
+
+    start = last_id(Post)
+    with explicit_dates(*post_fields):
+        stats['posts'] = insert(Post, new_posts(), batch_size)
+        first_post, last_post = start + 1, last_id(Post)
+        popular = Zipf(last_post - start, skew, rng) if posts else None
+
+        def new_comments():
+            for i in range(comments if popular else 0):
+                yield Comment(post_id=first_post + popular(),
+                              author_id=rng.choice(user_ids),
+                              text=f'Load comment {i}',
+                              created=random_date())
+
+        stats['comments'] = insert(Comment, new_comments(), batch_size)
+
+    def new_follows():
+        seen = set()
+        for _ in range(follows):
+            user_id = rng.choice(user_ids)
+            author_id = user_ids[authors()]
+            if user_id != author_id and (user_id, author_id) not in seen:
+                seen.add((user_id, author_id))
+                yield Follow(user_id=user_id, author_id=author_id)
+
+    before = Follow.objects.count()
+    insert(Follow, new_follows(), batch_size, ignore_conflicts=True)
+    stats['follows'] = Follow.objects.count() - before
+    return stats
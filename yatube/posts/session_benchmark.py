@@ -0,0 +1,74 @@
+"""Сколько SQL-запросов на страницу стоят сессии в каждом режиме.
+
+Для каждого движка из SESSION_ENGINES пользователи заново входят на
+сайт, затем по repeat раз открывают ленту подписок (follow) и создают
+пост (create_post). Запросы к django_session считаются отдельно;
+saved — сколько запросов на страницу режим экономит против 'db'.
+Изменения откатываются, как в posts.benchmark.
+"""
+
+import statistics
+import time
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .benchmark import percentile, targets
+
+SESSION_TABLE = 'django_session'
+
+
+def url_requests(targets):
+    """(имя URL, пользователь, метод, данные)."""
+    return (
+        ('follow', targets['reader'], 'get', None),
+        ('create_post', targets['author'], 'post',
+         {'text': 'Benchmark text', 'group': targets['group'].pk}),
+    )
+
+
+def measure(client, url, method, data):
+    with transaction.atomic():
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = getattr(client, method)(url, data or {})
+            elapsed = time.perf_counter() - started
+        transaction.set_rollback(True)
+    session_queries = sum(SESSION_TABLE in query['sql']
+                          for query in queries.captured_queries)
+    return response.status_code, elapsed * 1000, len(queries), session_queries
+
+
+def run(modes=None, repeat=20, warmup=2):
+    """Возвращает результаты по режимам в виде словаря для JSON."""
+    requests = url_requests(targets())
+    results = {}
+    for mode in modes or settings.SESSION_ENGINES:
+        with override_settings(
+                SESSION_ENGINE=settings.SESSION_ENGINES[mode]):
+            results[mode] = {}
+            for name, user, method, data in requests:
+                client = Client()
+                client.force_login(user)
+                url = reverse(f'posts:{name}')
+                for _ in range(warmup):
+                    measure(client, url, method, data)
+                runs = [measure(client, url, method, data)
+                        for _ in range(repeat)]
+                timings = [elapsed for _, elapsed, _, _ in runs]
+                results[mode][name] = {
+                    'status': runs[-1][0],
+                    'p50_ms': round(percentile(timings, 50), 3),
+                    'mean_ms': round(statistics.mean(timings), 3),
+                    'queries': max(run[2] for run in runs),
+                    'session_queries': max(run[3] for run in runs),
+                }
+    if 'db' in results:
+        for mode_results in results.values():
+            for name, result in mode_results.items():
+                result['saved'] = (results['db'][name]['queries']
+                                   - result['queries'])
+    return {'repeat': repeat, 'modes': results}
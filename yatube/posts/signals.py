@@ -0,0 +1,149 @@
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from . import counters, following, inbox, search, versions
+from .models import (Comment, Follow, Group, Post, PostCounter, User,
+                     UserStats)
+
+
+def bump_post(post, group_ids):
+    """Сбрасывает фрагменты лент, в которых показывается пост."""
+    group_ids = {pk for pk in group_ids if pk is not None}
+    if post.group_id in group_ids and Post.group.is_cached(post):
+        slugs = {post.group.slug}
+        group_ids.discard(post.group_id)
+    else:
+        slugs = set()
+    if group_ids:
+        slugs.update(Group.objects.filter(
+            pk__in=group_ids).values_list('slug', flat=True))
+    versions.bump(
+        versions.INDEX,
+        versions.post_scope(post.pk),
+        versions.author_scope(post.author.username),
+        *(versions.group_scope(slug) for slug in slugs)
+    )
+
+
+def posts_added(posts):
+    """Вызывается из PostQuerySet.bulk_create, который не шлет сигналов."""
+    counters.posts_added(posts)
+    slugs = Group.objects.filter(
+        pk__in={post.group_id for post in posts}
+    ).values_list('slug', flat=True)
+    usernames = User.objects.filter(
+        pk__in={post.author_id for post in posts}
+    ).values_list('username', flat=True)
+    versions.bump(
+        versions.INDEX,
+        *(versions.group_scope(slug) for slug in slugs),
+        *(versions.author_scope(username) for username in usernames)
+    )
+
+
+@receiver(post_init, sender=Post)
+def remember_group(sender, instance, **kwargs):
+    # Нужна, чтобы заметить перенос поста в другую группу.
+    instance._saved_group_id = instance.__dict__.get('group_id')
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    old_group_id = instance._saved_group_id
+    instance._saved_group_id = instance.group_id
+    if created:
+        # До bump_post: версии лент сменятся после раскладки.
+        inbox.fan_out(instance)
+    bump_post(instance, {old_group_id, instance.group_id})
+    search.index_post(instance)
+    if created:
+        counters.change(counters.post_scopes(instance, instance.group_id), 1)
+        counters.change_user_stats('posts', [instance.author_id], 1)
+    elif old_group_id != instance.group_id:
+        if old_group_id is not None:
+            counters.change([counters.group_scope(old_group_id)], -1)
+        if instance.group_id is not None:
+            counters.change([counters.group_scope(instance.group_id)], 1)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    counters.change(
+        counters.post_scopes(instance, instance._saved_group_id), -1)
+    counters.change_user_stats('posts', [instance.author_id], -1)
+    bump_post(instance, {instance._saved_group_id})
+    search.remove_post(instance.pk)
+
+
+@receiver(post_init, sender=Group)
+def remember_slug(sender, instance, **kwargs):
+    instance._saved_slug = instance.__dict__.get('slug')
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, **kwargs):
+    versions.bump(versions.GROUPS, versions.group_scope(instance.slug),
+                  versions.group_scope(instance._saved_slug))
+    instance._saved_slug = instance.slug
+
+
+@receiver(post_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    PostCounter.objects.filter(
+        scope=counters.group_scope(instance.pk)).delete()
+    versions.bump(versions.GROUPS, versions.group_scope(instance.slug))
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def comment_changed(sender, instance, **kwargs):
+    versions.bump(versions.post_scope(instance.post_id))
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, **kwargs):
+    if created:
+        counters.change_user_stats('comments', [instance.author_id], 1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counters.change_user_stats('comments', [instance.author_id], -1)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        inbox.backfill(instance.user_id, instance.author_id)
+        counters.change_user_stats('following', [instance.user_id], 1)
+        counters.change_user_stats('followers', [instance.author_id], 1)
+        versions.bump(versions.feed_scope(instance.user_id))
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    inbox.prune(instance.user_id, instance.author_id)
+    counters.change_user_stats('following', [instance.user_id], -1)
+    counters.change_user_stats('followers', [instance.author_id], -1)
+    versions.bump(versions.feed_scope(instance.user_id))
+
+
+@receiver(post_init, sender=User)
+def remember_username(sender, instance, **kwargs):
+    instance._saved_username = instance.__dict__.get('username')
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, **kwargs):
+    if created:
+        UserStats.objects.create(user=instance)
+    # id по имени закэширован: после переименования старое имя свободно.
+    old_username = instance._saved_username
+    if old_username is not None and old_username != instance.username:
+        following.forget_username(old_username)
+    instance._saved_username = instance.username
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    following.forget_username(instance.username)
@@ -0,0 +1,21 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from posts import following
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def follow_button(context, author):
+    """
+    {% follow_button author %}
+
+    Кнопка подписки на author для текущего читателя. Внутри
+    versioned_cache выводится метка, а кнопка подставляется после
+    чтения фрагмента из кэша.
+    """
+    if context.get('fragment_cache'):
+        return mark_safe(following.button_marker(author))
+    return following.render_button(context['request'].user, author.pk,
+                                   author.username)
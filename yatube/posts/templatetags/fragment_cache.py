@@ -0,0 +1,54 @@
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+
+from posts import following, versions
+
+register = template.Library()
+
+
+class VersionedCacheNode(template.Node):
+    def __init__(self, nodelist, name, scopes, vary_on):
+        self.nodelist = nodelist
+        self.name = name
+        self.scopes = scopes
+        self.vary_on = vary_on
+
+    def render(self, context):
+        key = versions.fragment_key(
+            self.name,
+            self.scopes.resolve(context),
+            [var.resolve(context) for var in self.vary_on])
+        value = cache.get(key)
+        if value is None:
+            versions.record('misses')
+            with context.push(fragment_cache=True):
+                value = self.nodelist.render(context)
+            cache.set(key, value, settings.FRAGMENT_CACHE_TIMEOUT)
+        else:
+            versions.record('hits')
+        request = context.get('request')
+        if request is None:
+            return value
+        return following.fill_buttons(value, request.user)
+
+
+@register.tag('versioned_cache')
+def do_versioned_cache(parser, token):
+    """
+    {% versioned_cache name scopes [vary_on ...] %}...{% endversioned_cache %}
+
+    Фрагмент хранится, пока не изменится версия одной из областей scopes.
+    """
+    nodelist = parser.parse(('endversioned_cache',))
+    parser.delete_first_token()
+    bits = token.split_contents()
+    if len(bits) < 3:
+        raise template.TemplateSyntaxError(
+            f"'{bits[0]}' tag requires at least 2 arguments.")
+    return VersionedCacheNode(
+        nodelist,
+        bits[1],
+        parser.compile_filter(bits[2]),
+        [parser.compile_filter(bit) for bit in bits[3:]],
+    )
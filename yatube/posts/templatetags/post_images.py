@@ -0,0 +1,19 @@
+from django import template
+
+from posts import thumbnails
+
+register = template.Library()
+
+# Карточка поста не шире контейнера Bootstrap.
+SIZES = '(max-width: 960px) 100vw, 960px'
+
+
+@register.inclusion_tag('includes/post_picture.html')
+def post_picture(post, sizes=SIZES):
+    """
+    {% post_picture post [sizes] %}
+
+    <picture> с копиями картинки поста в WebP и исходном формате; пока
+    копии не готовы, показывается оригинал.
+    """
+    return dict(thumbnails.picture(post), sizes=sizes)
@@ -0,0 +1,97 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from .. import counters, inbox
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class QueryBudgetMixin:
+    """Проверка, что страница укладывается в заданное число SQL-запросов.
+
+    Бюджеты объявляются в атрибуте ``query_budgets`` как словарь
+    ``{имя URL: максимум запросов}``.
+    """
+    query_budgets = {}
+
+    def assertQueryBudget(self, name, client, url, method='get',
+                          data=None):
+        budget = self.query_budgets[name]
+        with CaptureQueriesContext(connection) as context:
+            getattr(client, method)(url, data or {})
+        queries = '\n'.join(
+            query['sql'] for query in context.captured_queries)
+        self.assertLessEqual(
+            len(context), budget,
+            f'{url} выполняет {len(context)} запросов при бюджете '
+            f'{budget}:\n{queries}')
+
+
+class ViewRequestsMixin:
+    """Данные и по одному запросу к каждому URL приложения posts."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.group = Group.objects.create(title='Test title',
+                                         slug='test-slug',
+                                         description='Test description')
+        cls.reader = User.objects.create_user(username='Reader')
+        for i in range(12):
+            author = User.objects.create_user(username=f'Author{i}',
+                                              first_name=f'Name{i}')
+            Follow.objects.create(user=cls.reader, author=author)
+            Post.objects.create(text=f'Test text {i}', author=author,
+                                group=cls.group)
+        cls.author = author
+        cls.post = Post.objects.latest('pk')
+        for i in range(12):
+            Comment.objects.create(post=cls.post, author=cls.reader,
+                                   text=f'Comment {i}')
+        counters.recount()
+        # Раскладка по лентам идет после коммита, а TestCase не коммитит.
+        inbox.rebuild()
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+
+    def requests(self):
+        post_kwargs = {'post_id': self.post.pk}
+        author_kwargs = {'username': self.author.username}
+        return (
+            ('index', self.client, {}, 'get', None),
+            ('group_list', self.client, {'slug': self.group.slug},
+             'get', None),
+            ('profile', self.reader_client, author_kwargs, 'get', None),
+            ('post_detail', self.reader_client, post_kwargs, 'get', None),
+            ('follow', self.reader_client, {}, 'get', None),
+            ('search', self.client, {}, 'get', {'q': 'text'}),
+            ('create_post', self.author_client, {}, 'post',
+             {'text': 'New text', 'group': self.group.pk}),
+            ('edit_post', self.author_client, post_kwargs, 'post',
+             {'text': 'Edited text', 'group': self.group.pk}),
+            ('add_comment', self.reader_client, post_kwargs, 'post',
+             {'text': 'New comment'}),
+            ('post_comments', self.reader_client, post_kwargs, 'get', None),
+            ('profile_follow', self.author_client,
+             {'username': self.reader.username}, 'get', None),
+            ('profile_unfollow', self.reader_client, author_kwargs,
+             'get', None),
+            ('feed', self.client, {}, 'get', None),
+            ('group_feed', self.client, {'slug': self.group.slug}, 'get',
+             None),
+            ('profile_feed', self.client, author_kwargs, 'get', None),
+            ('profile_export', self.author_client, author_kwargs, 'get',
+             None),
+            ('follow_bulk', self.author_client, {}, 'post',
+             {'usernames': ' '.join(
+                 ['Reader'] + [f'Author{i}' for i in range(12)])}),
+        )
@@ -0,0 +1,135 @@
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import Client, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.http import http_date
+
+from .. import versions
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ConditionalGetTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='PostAuthor')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.group = Group.objects.create(title='Test title',
+                                         slug='test-slug',
+                                         description='Test description')
+        cls.post = Post.objects.create(text='Test text', author=cls.author,
+                                       group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def urls(self):
+        return (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile',
+                    kwargs={'username': self.author.username}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        )
+
+    def test_not_modified_without_queries(self):
+        """Повторный запрос с ETag получает 304 без запросов к базе"""
+        for url in self.urls():
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertNotIn('Last-Modified', response)
+                with self.assertNumQueries(0):
+                    response = self.client.get(
+                        url, HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertEqual(response.status_code, 304)
+
+    def test_not_modified_skips_listing_queries(self):
+        """Для вошедшего пользователя на 304 не читаются посты"""
+        for url in self.urls():
+            with self.subTest(url=url):
+                response = self.reader_client.get(url)
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.reader_client.get(
+                        url, HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertEqual(response.status_code, 304)
+                for query in queries.captured_queries:
+                    self.assertNotIn('posts_', query['sql'])
+
+    def test_if_modified_since_ignored(self):
+        """Без ETag 304 не бывает: правка в ту же секунду не потеряется"""
+        url = reverse('posts:index')
+        self.client.get(url)
+        response = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=http_date(time.time() + 60))
+        self.assertEqual(response.status_code, 200)
+
+    def test_missing_object_versions_expire(self):
+        """Версии для несуществующих объектов не хранятся вечно"""
+        scope = versions.group_scope('missing')
+        with mock.patch.object(versions, 'cache', wraps=cache) as mocked:
+            versions.get_versions([scope])
+        mocked.add.assert_called_once_with(
+            versions.PREFIX + scope, mock.ANY,
+            settings.FRAGMENT_CACHE_TIMEOUT)
+
+    def test_changes_invalidate_etag(self):
+        """Новый пост и правка меняют ETag лент, комментарий — поста"""
+        index, group, profile, detail = self.urls()
+        changes = (
+            (lambda: Post.objects.create(text='New text', author=self.author,
+                                         group=self.group),
+             {index, group, profile}),
+            (lambda: Post.objects.get(pk=self.post.pk).save(),
+             {index, group, profile, detail}),
+            (lambda: Comment.objects.create(post=self.post,
+                                            author=self.reader,
+                                            text='Comment'),
+             {detail}),
+        )
+        for change, changed in changes:
+            etags = {url: self.client.get(url)['ETag'] for url in self.urls()}
+            change()
+            for url, etag in etags.items():
+                with self.subTest(url=url):
+                    response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                    self.assertEqual(response.status_code,
+                                     200 if url in changed else 304)
+
+    def test_etag_depends_on_user_and_page(self):
+        """Разные пользователи, страницы и подписки — разные ETag"""
+        url = reverse('posts:profile',
+                      kwargs={'username': self.author.username})
+        etag = self.client.get(url)['ETag']
+        self.assertNotEqual(self.reader_client.get(url)['ETag'], etag)
+        self.assertNotEqual(self.client.get(url + '?page=2')['ETag'], etag)
+        reader_etag = self.reader_client.get(url)['ETag']
+        Follow.objects.create(user=self.reader, author=self.author)
+        response = self.reader_client.get(url,
+                                          HTTP_IF_NONE_MATCH=reader_etag)
+        self.assertEqual(response.status_code, 200)
+
+
+class BumpOnCommitTest(TransactionTestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_post_bumps_again_after_commit(self):
+        """Версии меняются и после коммита, а не только внутри транзакции"""
+        author = User.objects.create_user(username='PostAuthor')
+        with transaction.atomic():
+            Post.objects.create(text='Test text', author=author)
+            inside = versions.get_versions([versions.INDEX])
+        after = versions.get_versions([versions.INDEX])
+        self.assertGreater(after[versions.INDEX], inside[versions.INDEX])
@@ -0,0 +1,163 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import counters
+from ..models import Comment, Follow, Group, Post, PostCounter, UserStats
+
+User = get_user_model()
+
+
+class PostCountersTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='PostAuthor')
+        cls.group = Group.objects.create(title='Test title',
+                                         slug='test-slug',
+                                         description='Test description')
+        cls.group_2 = Group.objects.create(title='Test title 2',
+                                           slug='test-slug-2',
+                                           description='Test description')
+        cls.post = Post.objects.create(text='Test text', author=cls.author,
+                                       group=cls.group)
+
+    def setUp(self):
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        counters.recount()
+
+    def value(self, scope):
+        return PostCounter.objects.get(scope=scope).value
+
+    def test_create_and_delete(self):
+        """Создание и удаление поста меняют счетчики"""
+        post = Post.objects.create(text='New text', author=self.author,
+                                   group=self.group)
+        self.assertEqual(self.value(counters.TOTAL), 2)
+        self.assertEqual(self.value(counters.group_scope(self.group.pk)), 2)
+        self.assertFalse(PostCounter.objects.filter(
+            scope__startswith='author:').exists())
+        post.delete()
+        self.assertEqual(self.value(counters.TOTAL), 1)
+        self.assertEqual(self.value(counters.group_scope(self.group.pk)), 1)
+
+    def test_group_reassignment_in_post_edit(self):
+        """Перенос поста в другую группу через post_edit"""
+        Post.objects.create(text='Another', author=self.author,
+                            group=self.group_2)
+        counters.recount()
+        self.author_client.post(
+            reverse('posts:edit_post', kwargs={'post_id': self.post.pk}),
+            {'text': 'Edited', 'group': self.group_2.pk})
+        self.assertEqual(self.value(counters.group_scope(self.group.pk)), 0)
+        self.assertEqual(
+            self.value(counters.group_scope(self.group_2.pk)), 2)
+
+    def test_bulk_create_counted(self):
+        """bulk_create тоже учитывается в счетчиках"""
+        Post.objects.bulk_create(
+            Post(text='Bulk', author=self.author) for _ in range(3))
+        self.assertEqual(self.value(counters.TOTAL), 4)
+
+    def test_paginator_reads_counter(self):
+        """Пагинатор профиля берет число постов из счетчика"""
+        response = self.client.get(
+            reverse('posts:profile',
+                    kwargs={'username': self.author.username}))
+        self.assertEqual(response.context['page_obj'].paginator.count, 1)
+        self.assertEqual(response.context['number_of_authors_posts'], 1)
+
+    def test_recount_posts_command(self):
+        """recount_posts исправляет расхождение счетчиков"""
+        PostCounter.objects.update(value=100)
+        call_command('recount_posts', stdout=StringIO())
+        self.assertEqual(self.value(counters.TOTAL), 1)
+
+
+class UserStatsTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='PostAuthor')
+        cls.reader = User.objects.create_user(username='Reader')
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_signals_keep_stats(self):
+        """Подписки, посты и комментарии меняют числа профиля"""
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(text='Text', author=self.author)
+        Post.objects.bulk_create(
+            Post(text='Bulk', author=self.author) for _ in range(2))
+        Comment.objects.create(post=post, author=self.reader, text='Hi')
+        author, reader = self.stats(self.author), self.stats(self.reader)
+        self.assertEqual((author.followers, author.posts), (1, 3))
+        self.assertEqual((reader.following, reader.comments), (1, 1))
+        follow.delete()
+        post.delete()
+        author, reader = self.stats(self.author), self.stats(self.reader)
+        self.assertEqual((author.followers, author.posts), (0, 2))
+        self.assertEqual((reader.following, reader.comments), (0, 0))
+
+    def test_profile_shows_stats_without_aggregates(self):
+        """Профиль показывает числа без COUNT-запросов"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        url = reverse('posts:profile',
+                      kwargs={'username': self.author.username})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.context['stats'].followers, 1)
+        self.assertContains(response, 'Подписчиков: 1')
+        for query in queries.captured_queries:
+            self.assertNotIn('COUNT(', query['sql'])
+
+    def test_stats_change_profile_etag(self):
+        """Подписчик и комментарий в чужом посте меняют ETag профиля"""
+        post = Post.objects.create(text='Text', author=self.reader)
+        url = reverse('posts:profile',
+                      kwargs={'username': self.author.username})
+        changes = (
+            lambda: Follow.objects.create(user=self.reader,
+                                          author=self.author),
+            lambda: Comment.objects.create(post=post, author=self.author,
+                                           text='Hi'),
+        )
+        for change in changes:
+            etag = self.client.get(url)['ETag']
+            change()
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+
+    def test_missing_row_counted_on_read(self):
+        """Строка без записи считается по таблицам при первом чтении"""
+        Post.objects.create(text='Text', author=self.author)
+        UserStats.objects.filter(user=self.author).delete()
+        author = User.objects.get(pk=self.author.pk)
+        self.assertEqual(counters.user_stats(author).posts, 1)
+        self.assertEqual(self.stats(self.author).posts, 1)
+
+    def test_reconcile_command(self):
+        """reconcile_user_stats находит и исправляет расхождения"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        UserStats.objects.filter(user=self.author).update(followers=5)
+        UserStats.objects.filter(user=self.reader).delete()
+        out = StringIO()
+        call_command('reconcile_user_stats', '--dry-run',
+                     '--batch-size', '1', stdout=out)
+        self.assertIn('followers: расходится у 1', out.getvalue())
+        self.assertIn('missing: расходится у 1', out.getvalue())
+        self.assertEqual(self.stats(self.author).followers, 5)
+        call_command('reconcile_user_stats', '--batch-size', '1',
+                     stdout=StringIO())
+        self.assertEqual(self.stats(self.author).followers, 1)
+        self.assertEqual(self.stats(self.reader).following, 1)
+        self.assertEqual(counters.reconcile_user_stats(), (2, {}))
@@ -0,0 +1,108 @@
+import csv
+import io
+import json
+import os
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import export
+from ..models import Comment, Group, Post
+
+User = get_user_model()
+
+
+class ExportTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='PostAuthor')
+        cls.other = User.objects.create_user(username='Other')
+        cls.group = Group.objects.create(title='Test title',
+                                         slug='test-slug',
+                                         description='Test description')
+        cls.post = Post.objects.create(text='Первый, "пост"',
+                                       author=cls.author, group=cls.group,
+                                       image='posts/cat.jpg')
+        Post.objects.create(text='Second', author=cls.author)
+        Post.objects.create(text='Not mine', author=cls.other)
+        Comment.objects.create(post=cls.post, author=cls.author,
+                               text='Comment\nwith newline')
+        Comment.objects.create(post=cls.post, author=cls.other,
+                               text='Not mine')
+
+    def setUp(self):
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        self.url = reverse('posts:profile_export',
+                           kwargs={'username': self.author.username})
+
+    def download(self, **params):
+        response = self.author_client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_jsonl(self):
+        """JSONL: посты с группой и картинкой, затем комментарии"""
+        response, content = self.download()
+        self.assertEqual(response['Content-Type'], export.FORMATS['jsonl'])
+        self.assertIn('PostAuthor.jsonl', response['Content-Disposition'])
+        records = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual([(record['type'], record['text'])
+                          for record in records], [
+            ('post', 'Первый, "пост"'), ('post', 'Second'),
+            ('comment', 'Comment\nwith newline')])
+        self.assertEqual(records[0]['group'], 'test-slug')
+        self.assertTrue(records[0]['image'].endswith('posts/cat.jpg'))
+        self.assertIsNone(records[1]['image'])
+        self.assertEqual(records[2]['post'], self.post.pk)
+        self.assertEqual(records[0]['pub_date'],
+                         self.post.pub_date.isoformat())
+
+    def test_csv(self):
+        """CSV: общий заголовок для постов и комментариев"""
+        response, content = self.download(format='csv')
+        rows = list(csv.DictReader(io.StringIO(content)))
+        self.assertEqual([row['type'] for row in rows],
+                         ['post', 'post', 'comment'])
+        self.assertEqual(rows[0]['text'], 'Первый, "пост"')
+        self.assertEqual(rows[2]['text'], 'Comment\nwith newline')
+
+    def test_access(self):
+        """Выгрузить можно только свое; формат проверяется"""
+        self.assertEqual(self.client.get(self.url).status_code, 302)
+        other_client = Client()
+        other_client.force_login(self.other)
+        self.assertEqual(other_client.get(self.url).status_code, 403)
+        self.assertEqual(
+            self.author_client.get(self.url, {'format': 'xml'}).status_code,
+            400)
+        staff = User.objects.create_user(username='Staff', is_staff=True)
+        other_client.force_login(staff)
+        self.assertEqual(other_client.get(self.url).status_code, 200)
+
+    def test_lines_are_lazy(self):
+        """Строки читаются из базы пачками по мере выдачи"""
+        lines = export.lines(self.author, chunk_size=1)
+        with self.assertNumQueries(1):
+            next(lines)
+        with self.assertNumQueries(1):
+            self.assertEqual(len(list(lines)), 2)
+
+    def test_command(self):
+        """Команда пишет в файл то же, что отдает страница"""
+        _, content = self.download(format='csv')
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'export.csv')
+            call_command('export_user_content', 'PostAuthor', '--format',
+                         'csv', '--output', path, stdout=io.StringIO())
+            with open(path, encoding='utf-8', newline='') as file:
+                self.assertEqual(file.read(), content)
+        out = io.StringIO()
+        call_command('export_user_content', 'PostAuthor', stdout=out)
+        self.assertEqual(len(out.getvalue().splitlines()), 3)
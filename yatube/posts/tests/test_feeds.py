@@ -0,0 +1,96 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from ..feeds import FEED_ITEMS
+from ..models import Group, Post
+
+User = get_user_model()
+
+
+class FeedsTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='PostAuthor')
+        cls.other = User.objects.create_user(username='Other')
+        cls.group = Group.objects.create(title='Test title',
+                                         slug='test-slug',
+                                         description='Test description')
+        for i in range(FEED_ITEMS + 1):
+            Post.objects.create(text=f'Group post {i}', author=cls.author,
+                                group=cls.group)
+        Post.objects.create(text='Other post', author=cls.other)
+
+    def setUp(self):
+        cache.clear()
+        self.urls = {
+            'feed': reverse('posts:feed'),
+            'group_feed': reverse('posts:group_feed',
+                                  kwargs={'slug': self.group.slug}),
+            'profile_feed': reverse('posts:profile_feed',
+                                    kwargs={'username': 'Other'}),
+        }
+
+    def test_feed_items(self):
+        """В лентах последние посты своей области, новые сверху"""
+        content = self.client.get(self.urls['feed']).content.decode()
+        self.assertEqual(content.count('<item>'), FEED_ITEMS)
+        self.assertLess(content.index('Other post'),
+                        content.index(f'Group post {FEED_ITEMS}'))
+        self.assertNotIn('Group post 0<', content)
+        group = self.client.get(self.urls['group_feed']).content.decode()
+        self.assertNotIn('Other post', group)
+        self.assertIn('<category>Test title</category>', group)
+        profile = self.client.get(self.urls['profile_feed'])
+        self.assertEqual(profile.content.decode().count('<item>'), 1)
+        self.assertEqual(profile['Content-Type'],
+                         'application/rss+xml; charset=utf-8')
+
+    def test_atom(self):
+        """?format=atom отдает Atom"""
+        response = self.client.get(self.urls['feed'], {'format': 'atom'})
+        self.assertEqual(response['Content-Type'],
+                         'application/atom+xml; charset=utf-8')
+        self.assertIn('<entry>', response.content.decode())
+
+    def test_polls_cached_and_conditional(self):
+        """Повторный опрос — из кэша, с ETag — 304, без запросов к базе"""
+        for name, url in self.urls.items():
+            with self.subTest(name=name):
+                response = self.client.get(url)
+                self.assertNotIn('Last-Modified', response)
+                with self.assertNumQueries(0):
+                    cached = self.client.get(url)
+                self.assertEqual(cached.content, response.content)
+                with self.assertNumQueries(0):
+                    response = self.client.get(
+                        url, HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertEqual(response.status_code, 304)
+
+    def test_new_post_invalidates(self):
+        """Новый пост сразу попадает в ленты своей области"""
+        etags = {name: self.client.get(url)['ETag']
+                 for name, url in self.urls.items()}
+        Post.objects.create(text='Fresh post', author=self.other,
+                            group=self.group)
+        for name, url in self.urls.items():
+            with self.subTest(name=name):
+                response = self.client.get(url,
+                                           HTTP_IF_NONE_MATCH=etags[name])
+                self.assertEqual(response.status_code, 200)
+                self.assertIn('Fresh post', response.content.decode())
+
+    def test_unknown_object(self):
+        """Лента несуществующей группы — 404"""
+        response = self.client.get(
+            reverse('posts:group_feed', kwargs={'slug': 'missing'}))
+        self.assertEqual(response.status_code, 404)
+
+    def test_pages_link_feeds(self):
+        """Страницы лент ссылаются на свои RSS"""
+        response = self.client.get(
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}))
+        self.assertContains(response, self.urls['group_feed'])
@@ -0,0 +1,190 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import counters, following, versions
+from ..models import Follow, Group, Post
+
+User = get_user_model()
+
+
+class FollowingTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.followed = User.objects.create_user(username='Followed')
+        cls.other = User.objects.create_user(username='Other')
+        cls.group = Group.objects.create(title='Test title',
+                                         slug='test-slug',
+                                         description='Test description')
+        Follow.objects.create(user=cls.reader, author=cls.followed)
+        for author in (cls.followed, cls.other, cls.reader):
+            Post.objects.create(text=f'Text {author.username}',
+                                author=author, group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def follow_url(self, name, user):
+        return reverse(f'posts:profile_{name}',
+                       kwargs={'username': user.username})
+
+    def test_following_set(self):
+        """Подписки читаются из кэша и обновляются при изменении"""
+        self.assertIn(self.followed.pk, following.author_ids(self.reader))
+        with self.assertNumQueries(0):
+            reader = User(pk=self.reader.pk)
+            ids = following.author_ids(reader)
+            self.assertNotIn(self.other.pk, ids)
+            self.assertIs(following.author_ids(reader), ids)
+        Follow.objects.create(user=self.reader, author=self.other)
+        self.assertEqual(
+            list(following.author_ids(User(pk=self.reader.pk))),
+            sorted([self.followed.pk, self.other.pk]))
+        self.assertEqual(len(following.author_ids(
+            Client().get('/').wsgi_request.user)), 0)
+
+    def test_author_id_cached(self):
+        """id автора по имени кэшируется и забывается при переименовании"""
+        self.assertEqual(following.author_id('Other'), self.other.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(following.author_id('Other'), self.other.pk)
+        user = User.objects.get(pk=self.other.pk)
+        user.username = 'Renamed'
+        user.save()
+        response = self.reader_client.get(self.follow_url('follow', user))
+        self.assertEqual(response.status_code, 302)
+        response = self.reader_client.get(
+            reverse('posts:profile_follow', kwargs={'username': 'Other'}))
+        self.assertEqual(response.status_code, 404)
+
+    def test_follow_and_unfollow(self):
+        """Подписка и отписка меняют кнопку в профиле"""
+        profile = reverse('posts:profile',
+                          kwargs={'username': self.other.username})
+        self.reader_client.get(self.follow_url('follow', self.other))
+        self.reader_client.get(self.follow_url('follow', self.other))
+        self.assertEqual(Follow.objects.filter(
+            user=self.reader, author=self.other).count(), 1)
+        self.assertTrue(self.reader_client.get(profile).context['following'])
+        self.reader_client.get(self.follow_url('unfollow', self.other))
+        self.assertFalse(Follow.objects.filter(
+            user=self.reader, author=self.other).exists())
+        self.assertFalse(
+            self.reader_client.get(profile).context['following'])
+        self.reader_client.get(self.follow_url('follow', self.reader))
+        self.assertFalse(Follow.objects.filter(
+            user=self.reader, author=self.reader).exists())
+
+    def test_card_buttons(self):
+        """Карточки в общем кэше фрагментов показывают кнопки читателя"""
+        url = reverse('posts:index')
+        content = self.reader_client.get(url).content.decode()
+        self.assertIn(self.follow_url('unfollow', self.followed), content)
+        self.assertIn(self.follow_url('follow', self.other), content)
+        self.assertNotIn(self.follow_url('follow', self.reader), content)
+        self.assertNotIn('<!--follow:', content)
+        anonymous = self.client.get(url).content.decode()
+        self.assertNotIn(self.follow_url('follow', self.other), anonymous)
+        self.assertNotIn('<!--follow:', anonymous)
+        with CaptureQueriesContext(connection) as queries:
+            self.reader_client.get(url)
+        for query in queries.captured_queries:
+            self.assertNotIn('posts_follow', query['sql'])
+
+    def test_follow_changes_page_etag(self):
+        """Подписка меняет ETag лент читателя с кнопками"""
+        url = reverse('posts:group_list',
+                      kwargs={'slug': self.group.slug})
+        etag = self.reader_client.get(url)['ETag']
+        self.reader_client.get(self.follow_url('follow', self.other))
+        response = self.reader_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(self.follow_url('unfollow', self.other),
+                      response.content.decode())
+
+    def test_follow_is_idempotent(self):
+        """Повторная подписка не создает дубликат и не падает"""
+        self.assertTrue(following.follow(self.reader, self.other.pk))
+        self.assertFalse(following.follow(self.reader, self.other.pk))
+        self.assertFalse(following.follow(self.reader, self.reader.pk))
+        self.assertEqual(Follow.objects.filter(
+            user=self.reader, author=self.other).count(), 1)
+        self.assertTrue(following.unfollow(self.reader, self.other.pk))
+        self.assertFalse(following.unfollow(self.reader, self.other.pk))
+
+    def test_bulk_follow(self):
+        """Пакетная подписка по списку имен в одном запросе"""
+        url = reverse('posts:follow_bulk')
+        data = {'usernames': 'Followed, Other\nReader Nobody'}
+        response = self.reader_client.post(url, data)
+        self.assertEqual(response.json(), {
+            'action': 'follow', 'changed': 1, 'unknown': ['Nobody']})
+        self.assertEqual(
+            set(Follow.objects.filter(user=self.reader).values_list(
+                'author__username', flat=True)), {'Followed', 'Other'})
+        feed = self.reader_client.get(reverse('posts:follow'))
+        self.assertIn('Text Other', feed.content.decode())
+        self.assertIn(self.other.pk,
+                      following.author_ids(User(pk=self.reader.pk)))
+        self.assertEqual(
+            self.reader_client.post(url, data).json()['changed'], 0)
+        response = self.reader_client.post(
+            url, {'usernames': ['Followed', 'Other'], 'action': 'unfollow'})
+        self.assertEqual(response.json()['changed'], 2)
+        self.assertFalse(Follow.objects.filter(user=self.reader).exists())
+        feed = self.reader_client.get(reverse('posts:follow'))
+        self.assertNotIn('Text Other', feed.content.decode())
+
+    def test_bulk_follow_counts_inserted(self):
+        """Счетчики и лента учитывают только вставленные подписки"""
+        third = User.objects.create_user(username='Third')
+        bulk_create = Follow.objects.bulk_create
+
+        def skip_third(follows, *args, **kwargs):
+            return bulk_create([follow for follow in follows
+                                if follow.author_id != third.pk],
+                               *args, **kwargs)
+
+        with mock.patch.object(Follow.objects, 'bulk_create', skip_third):
+            changed, _ = following.follow_many(self.reader,
+                                               ['Other', 'Third'])
+        self.assertEqual(changed, 1)
+        self.assertEqual(counters.user_stats(
+            User.objects.get(pk=third.pk)).followers, 0)
+        self.assertEqual(counters.user_stats(
+            User.objects.get(pk=self.reader.pk)).following, 2)
+
+    def test_bulk_follow_leaves_no_user_versions(self):
+        """Пакетная подписка не пишет в кэш версию каждого автора"""
+        authors = [User.objects.create_user(username=f'Author{number}')
+                   for number in range(3)]
+        scopes = [versions.user_scope(author.pk) for author in authors]
+        versions.get_versions(scopes)
+        following.follow_many(self.reader,
+                              [author.username for author in authors])
+        self.assertEqual(cache.get_many(
+            [versions.PREFIX + scope for scope in scopes]), {})
+
+    def test_bulk_follow_rejects_bad_requests(self):
+        """Пакетная подписка: только POST, вход и разумный размер"""
+        url = reverse('posts:follow_bulk')
+        self.assertEqual(self.reader_client.get(url).status_code, 405)
+        self.assertEqual(self.client.post(
+            url, {'usernames': 'Other'}).status_code, 302)
+        for data in ({}, {'usernames': 'Other', 'action': 'block'},
+                     {'usernames': ' '.join(['Other'] * 5001)}):
+            with self.subTest(data=data):
+                self.assertEqual(
+                    self.reader_client.post(url, data).status_code, 400)
+        self.assertFalse(Follow.objects.filter(
+            user=self.reader, author=self.other).exists())
@@ -0,0 +1,103 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import Client, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import inbox
+from ..models import FeedEntry, Follow, Post
+
+User = get_user_model()
+
+
+class InboxTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='PostAuthor')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.post = Post.objects.create(text='Old text', author=cls.author)
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def follow(self):
+        self.reader_client.get(reverse(
+            'posts:profile_follow',
+            kwargs={'username': self.author.username}))
+
+    def test_follow_backfills_feed(self):
+        """Подписка добавляет в ленту уже опубликованные посты автора"""
+        self.follow()
+        self.assertTrue(FeedEntry.objects.filter(
+            user=self.reader, post=self.post).exists())
+
+    def test_unfollow_prunes_feed(self):
+        """Отписка убирает посты автора из ленты"""
+        self.follow()
+        self.reader_client.get(reverse(
+            'posts:profile_unfollow',
+            kwargs={'username': self.author.username}))
+        self.assertFalse(FeedEntry.objects.filter(user=self.reader).exists())
+
+    def test_rebuild_feeds_command(self):
+        """Команда rebuild_feeds восстанавливает ленты"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        FeedEntry.objects.all().delete()
+        call_command('rebuild_feeds', stdout=StringIO())
+        self.assertEqual(
+            list(FeedEntry.objects.values_list('user', 'post')),
+            [(self.reader.pk, self.post.pk)])
+
+
+class FanOutTest(TransactionTestCase):
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='PostAuthor')
+        self.reader = User.objects.create_user(username='Reader')
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_new_post_fans_out(self):
+        """Новый пост попадает в ленты подписчиков"""
+        post = Post.objects.create(text='New text', author=self.author)
+        response = self.reader_client.get(reverse('posts:follow'))
+        self.assertEqual(response.context['page_obj'][0], post)
+
+    def test_fan_out_after_commit(self):
+        """Раскладка идет после коммита, по BATCH_SIZE записей"""
+        readers = [User.objects.create_user(username=f'Reader{number}')
+                   for number in range(2)]
+        Follow.objects.bulk_create(
+            Follow(user=reader, author=self.author) for reader in readers)
+        self.addCleanup(setattr, inbox, 'BATCH_SIZE', inbox.BATCH_SIZE)
+        inbox.BATCH_SIZE = 2
+        with transaction.atomic():
+            post = Post.objects.create(text='New text', author=self.author)
+            self.assertFalse(FeedEntry.objects.exists())
+        self.assertEqual(FeedEntry.objects.filter(post=post).count(), 3)
+
+    def test_follow_page_without_count(self):
+        """Лента подписок листается без COUNT-запроса"""
+        Post.objects.bulk_create(
+            Post(text=f'Text {number}', author=self.author)
+            for number in range(12))
+        inbox.rebuild()
+        url = reverse('posts:follow')
+        with CaptureQueriesContext(connection) as queries:
+            page = self.reader_client.get(url).context['page_obj']
+        self.assertEqual(len(page), 10)
+        self.assertTrue(page.has_next())
+        for query in queries.captured_queries:
+            self.assertNotIn('COUNT(', query['sql'])
+        page = self.reader_client.get(url, {'page': 2}).context['page_obj']
+        self.assertEqual(len(page), 2)
+        self.assertFalse(page.has_next())
+        page = self.reader_client.get(url, {'page': 9}).context['page_obj']
+        self.assertEqual(page.number, 1)
@@ -0,0 +1,110 @@
+import json
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.db.models import F
+from django.test import TestCase
+
+from .. import benchmark, cache_benchmark, urls
+from ..models import Comment, FeedEntry, Follow, Group, Post, User
+
+
+class SeedLoadTest(TestCase):
+
+    def seed(self, *args):
+        out = StringIO()
+        call_command('seed_load', '--users', '30', '--groups', '3',
+                     '--posts', '300', '--comments', '200',
+                     '--follows', '100', '--batch-size', '64',
+                     '--seed', '1', *args, stdout=out)
+        return out.getvalue()
+
+    def test_seed_counts_and_skew(self):
+        """seed_load создает заданное число строк с перекосом к звездам"""
+        self.seed()
+        self.assertEqual(User.objects.count(), 30)
+        self.assertEqual(Group.objects.count(), 3)
+        self.assertEqual(Post.objects.count(), 300)
+        self.assertEqual(Comment.objects.count(), 200)
+        self.assertFalse(Follow.objects.filter(
+            user=F('author')).exists())
+        top = Post.objects.filter(author__username='load_user_0').count()
+        self.assertGreater(top, 300 / 30 * 3)
+        self.assertGreater(
+            Post.objects.dates('pub_date', 'day').count(), 30)
+        self.assertEqual(
+            FeedEntry.objects.count(),
+            sum(Post.objects.filter(author=follow.author).count()
+                for follow in Follow.objects.all()))
+
+    def test_seed_again_adds_rows(self):
+        """Повторный запуск добавляет данные, не ломая уникальность"""
+        self.seed('--skip-derived')
+        self.seed('--skip-derived', '--prefix', 'more')
+        self.assertEqual(User.objects.count(), 60)
+        self.assertEqual(FeedEntry.objects.count(), 0)
+
+    def test_benchmark_json(self):
+        """benchmark_views меряет все URL posts и выдает JSON"""
+        self.seed()
+        out = StringIO()
+        call_command('benchmark_views', '--repeat', '3', '--warmup', '0',
+                     '--label', 'test', stdout=out)
+        report = json.loads(out.getvalue())
+        names = {pattern.name for pattern in urls.urlpatterns
+                 if getattr(pattern, 'name', None)}
+        self.assertEqual(set(report['urls']), names)
+        self.assertEqual(report['label'], 'test')
+        for result in report['urls'].values():
+            self.assertLess(result['status'], 400)
+            self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+        self.assertEqual(Post.objects.count(), 300)
+
+    def test_busiest_author_from_user_stats(self):
+        """Самый активный автор берется из UserStats, а не из счетчиков"""
+        self.seed()
+        self.assertEqual(benchmark.busiest_author().username, 'load_user_0')
+
+    def test_benchmark_cache_backends(self):
+        """benchmark_cache меряет страницы и обращения к кэшу бэкендов"""
+        self.seed('--skip-derived')
+        report = cache_benchmark.run(workers=1, requests=10, operations=50)
+        self.assertEqual(set(report['backends']),
+                         set(cache_benchmark.backends('')))
+        self.assertGreater(report['fragment_bytes'], 0)
+        for result in report['backends'].values():
+            self.assertGreater(result['pages']['hit_rate'], 0)
+            self.assertLessEqual(result['cache_ops']['p50_us'],
+                                 result['cache_ops']['p99_us'])
+
+    def test_benchmark_sessions(self):
+        """benchmark_sessions показывает запросы, сэкономленные на
+        сессиях"""
+        self.seed('--skip-derived')
+        out = StringIO()
+        call_command('benchmark_sessions', '--repeat', '2', '--warmup', '1',
+                     stdout=out)
+        modes = json.loads(out.getvalue())['modes']
+        for name in ('follow', 'create_post'):
+            with self.subTest(name=name):
+                self.assertLess(modes['db'][name]['status'], 400)
+                self.assertGreater(modes['db'][name]['session_queries'], 0)
+                self.assertEqual(
+                    modes['signed_cookies'][name]['session_queries'], 0)
+                self.assertEqual(
+                    modes['cached_db'][name]['session_queries'], 0)
+                self.assertGreater(modes['signed_cookies'][name]['saved'], 0)
+
+    def test_benchmarks_need_seeded_database(self):
+        """На пустой базе замеры просят сначала выполнить seed_load"""
+        for command in ('benchmark_views', 'benchmark_sessions'):
+            with self.subTest(command=command):
+                with self.assertRaisesMessage(CommandError, 'seed_load'):
+                    call_command(command, stdout=StringIO())
+
+    def test_percentile(self):
+        """Процентиль по ближайшему рангу"""
+        values = list(range(1, 101))
+        self.assertEqual(benchmark.percentile(values, 50), 50)
+        self.assertEqual(benchmark.percentile(values, 99), 99)
+        self.assertEqual(benchmark.percentile([7], 95), 7)
@@ -0,0 +1,109 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class AnonymousPageCacheTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='PostAuthor')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.group = Group.objects.create(title='Test title',
+                                         slug='test-slug',
+                                         description='Test description')
+        cls.post = Post.objects.create(text='Test text', author=cls.author,
+                                       group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.urls = {
+            'index': reverse('posts:index'),
+            'group_list': reverse('posts:group_list',
+                                  kwargs={'slug': self.group.slug}),
+            'profile': reverse('posts:profile',
+                               kwargs={'username': self.author.username}),
+            'post_detail': reverse('posts:post_detail',
+                                   kwargs={'post_id': self.post.pk}),
+        }
+
+    def test_guest_served_from_cache(self):
+        """Повторный запрос гостя отдается из кэша без запросов к базе"""
+        for name, url in self.urls.items():
+            with self.subTest(name=name):
+                response = self.client.get(url)
+                with self.assertNumQueries(0):
+                    cached = self.client.get(url)
+                self.assertEqual(cached.status_code, 200)
+                self.assertEqual(cached.content, response.content)
+                self.assertEqual(cached['Content-Type'],
+                                 response['Content-Type'])
+                with self.assertNumQueries(0):
+                    response = self.client.get(
+                        url, HTTP_IF_NONE_MATCH=cached['ETag'])
+                self.assertEqual(response.status_code, 304)
+
+    def test_page_parameter_in_key(self):
+        """Страницы ?page= кэшируются отдельно, другие параметры — нет"""
+        url = self.urls['index']
+        self.client.get(url)
+        response = self.client.get(url, {'page': 2})
+        self.assertIsNotNone(response.context)
+        with self.assertNumQueries(0):
+            self.client.get(url, {'page': 2})
+        self.client.get(url, {'after': 'x'})
+        response = self.client.get(url, {'after': 'x'})
+        self.assertIsNotNone(response.context)
+
+    def test_logged_in_not_cached(self):
+        """Пользователь с сессией видит свою страницу, а не гостевую"""
+        url = self.urls['index']
+        self.client.get(url)
+        response = self.reader_client.get(url)
+        self.assertIsNotNone(response.context)
+        self.assertContains(response, 'Выйти')
+        response = self.reader_client.get(url)
+        self.assertIsNotNone(response.context)
+        self.assertNotContains(self.client.get(url), 'Выйти')
+
+    def test_not_found_not_cached(self):
+        """Ответ 404 не кэшируется"""
+        url = reverse('posts:profile', kwargs={'username': 'missing'})
+        self.assertEqual(self.client.get(url).status_code, 404)
+        User.objects.create_user(username='missing')
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_invalidation(self):
+        """Новые пост, комментарий и подписка сбрасывают кэш своих
+        страниц"""
+        changes = (
+            ('index', lambda: Post.objects.create(
+                text='Fresh post', author=self.reader), 'Fresh post'),
+            ('post_detail', lambda: Comment.objects.create(
+                post=self.post, author=self.reader, text='Fresh comment'),
+             'Fresh comment'),
+            ('profile', lambda: Follow.objects.create(
+                user=self.reader, author=self.author), 'Подписчиков: 1'),
+        )
+        for name, change, text in changes:
+            with self.subTest(name=name):
+                self.assertNotContains(self.client.get(self.urls[name]),
+                                       text)
+                change()
+                self.assertContains(self.client.get(self.urls[name]), text)
+
+    def test_group_change_invalidates(self):
+        """Изменение группы сбрасывает кэш ее страницы"""
+        url = self.urls['group_list']
+        self.client.get(url)
+        self.group.description = 'New description'
+        self.group.save()
+        self.assertContains(self.client.get(url), 'New description')
@@ -3,11 +3,13 @@ import tempfile
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
-from ..models import Post, Group
-from ..views import POSTS_ON_PAGE
+from .. import versions
+from ..models import Comment, Post, Group
+from ..views import COMMENTS_ON_PAGE, POSTS_ON_PAGE
 
 User = get_user_model()
 
@@ -75,3 +77,87 @@ class PagesTest(TestCase):
                 response = self.authorized_client_author.get(
                     pages_second).context['page_obj']
                 self.assertEqual(len(response), (posts_count - POSTS_ON_PAGE))
+
+
+@override_settings(POSTS_PAGINATION='cursor')
+class CursorPagesTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='PostAuthor')
+        Post.objects.bulk_create(
+            Post(author=cls.author, text=f'Test text {i}')
+            for i in range(POSTS_ON_PAGE + 3))
+
+    def test_cursor_pages(self):
+        """Курсорная пагинация отдает страницы по токенам ?after/?before"""
+        first = self.client.get(reverse('posts:index')).context['page_obj']
+        self.assertEqual(len(first), POSTS_ON_PAGE)
+        self.assertFalse(first.has_previous())
+        second = self.client.get(
+            reverse('posts:index'), {'after': first.next_token}
+        ).context['page_obj']
+        self.assertEqual(len(second), 3)
+        self.assertFalse(second.has_next())
+        back = self.client.get(
+            reverse('posts:index'), {'before': second.previous_token}
+        ).context['page_obj']
+        self.assertEqual(list(back), list(first))
+
+    def test_page_links_still_work(self):
+        """Старые ссылки ?page= продолжают работать"""
+        response = self.client.get(reverse('posts:index'), {'page': 2})
+        self.assertEqual(len(response.context['page_obj']), 3)
+
+    def test_broken_token(self):
+        """Битый токен открывает первую страницу"""
+        response = self.client.get(reverse('posts:index'), {'after': '!!'})
+        self.assertEqual(len(response.context['page_obj']), POSTS_ON_PAGE)
+
+
+class CommentPagesTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='PostAuthor')
+        cls.post = Post.objects.create(author=cls.author, text='Test text')
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=cls.author, text=f'Comment {i}')
+            for i in range(COMMENTS_ON_PAGE + 3))
+
+    def setUp(self):
+        cache.clear()
+
+    def test_first_page_of_comments(self):
+        """На странице поста только первая порция комментариев"""
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}))
+        comments = response.context['comments']
+        self.assertEqual(len(comments), COMMENTS_ON_PAGE)
+        self.assertEqual(comments[0].text, f'Comment {COMMENTS_ON_PAGE + 2}')
+        self.assertContains(response, comments.next_token)
+
+    def test_load_more_fragment(self):
+        """«Показать еще» отдает только следующие комментарии"""
+        first = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        ).context['comments']
+        response = self.client.get(
+            reverse('posts:post_comments', kwargs={'post_id': self.post.pk}),
+            {'after': first.next_token})
+        self.assertEqual([comment.text for comment in
+                          response.context['comments']],
+                         ['Comment 2', 'Comment 1', 'Comment 0'])
+        self.assertNotContains(response, '<html')
+        self.assertNotContains(response, 'data-load-more')
+
+    def test_load_more_for_missing_post(self):
+        """«Показать еще» несуществующего поста — 404 без версии в кэше"""
+        missing = self.post.pk + 100
+        response = self.client.get(
+            reverse('posts:post_comments', kwargs={'post_id': missing}))
+        self.assertEqual(response.status_code, 404)
+        self.assertIsNone(
+            cache.get(versions.PREFIX + versions.post_scope(missing)))
@@ -0,0 +1,44 @@
+from django.test import TestCase
+from django.urls import reverse
+
+from .. import urls
+from .query_budget import QueryBudgetMixin, ViewRequestsMixin
+
+
+class QueryBudgetTest(QueryBudgetMixin, ViewRequestsMixin, TestCase):
+    # Бюджеты не зависят от числа постов на странице: авторы и группы
+    # загружаются вместе с постами, копии картинок — одним запросом.
+    query_budgets = {
+        'index': 3,
+        'group_list': 4,
+        'profile': 7,
+        'post_detail': 5,
+        'follow': 5,
+        'search': 4,
+        'create_post': 13,
+        'edit_post': 10,
+        'add_comment': 5,
+        'post_comments': 3,
+        'profile_follow': 9,
+        'profile_unfollow': 8,
+        'follow_bulk': 11,
+        'profile_export': 3,
+        'feed': 1,
+        'group_feed': 2,
+        'profile_feed': 2,
+    }
+
+    def test_every_url_has_budget(self):
+        """Для каждого URL приложения posts объявлен бюджет запросов"""
+        names = {pattern.name for pattern in urls.urlpatterns
+                 if getattr(pattern, 'name', None)}
+        self.assertEqual(names, set(self.query_budgets))
+        self.assertEqual(names, {name for name, *_ in self.requests()})
+
+    def test_query_budgets(self):
+        """Страницы укладываются в бюджет SQL-запросов"""
+        for name, client, kwargs, method, data in self.requests():
+            with self.subTest(name=name):
+                self.assertQueryBudget(
+                    name, client, reverse(f'posts:{name}', kwargs=kwargs),
+                    method, data)
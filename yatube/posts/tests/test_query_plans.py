@@ -0,0 +1,67 @@
+import re
+import unittest
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .query_budget import ViewRequestsMixin
+
+# Строка плана SQLite без индекса: «SCAN posts_post» или, в старых
+# версиях, «SCAN TABLE posts_post». Проход по индексу и по виртуальной
+# таблице FTS5 полным сканированием не считается.
+FULL_SCAN = re.compile(r'\bSCAN (?:TABLE )?(\w+)(?!.*\b(?:INDEX|VIRTUAL))')
+TEMP_SORT = 'USE TEMP B-TREE FOR ORDER BY'
+# Ленты, которые растут без ограничений: сортировать их без индекса
+# нельзя. Копии картинок и результаты поиска сортируются в пределах
+# одной страницы.
+FEED_TABLES = re.compile(r'FROM "(posts_post|posts_comment|posts_feedentry)"')
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite',
+                     'EXPLAIN QUERY PLAN есть только в SQLite')
+class QueryPlanTest(ViewRequestsMixin, TestCase):
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return [row[-1] for row in cursor.fetchall()]
+
+    def check_plans(self, name, client, url, method='get', data=None):
+        with CaptureQueriesContext(connection) as context:
+            response = getattr(client, method)(url, data or {})
+        for query in context.captured_queries:
+            sql = query['sql']
+            if not sql.startswith(('SELECT', 'UPDATE', 'DELETE')):
+                continue
+            plan = self.explain(sql)
+            with self.subTest(name=name, sql=sql):
+                for step in plan:
+                    self.assertNotRegex(step, FULL_SCAN, plan)
+                if FEED_TABLES.search(sql):
+                    self.assertNotIn(TEMP_SORT, plan)
+        return response
+
+    def test_views_use_indexes(self):
+        """Запросы страниц posts не сканируют таблицы целиком"""
+        for name, client, kwargs, method, data in self.requests():
+            self.check_plans(name, client,
+                             reverse(f'posts:{name}', kwargs=kwargs),
+                             method, data)
+
+    @override_settings(POSTS_PAGINATION='cursor')
+    def test_cursor_pages_use_indexes(self):
+        """Курсорные страницы лент, и первая, и следующая, идут по
+        индексам без сортировки"""
+        for name, client, kwargs, method, data in self.requests():
+            if name not in ('index', 'group_list', 'profile', 'follow'):
+                continue
+            url = reverse(f'posts:{name}', kwargs=kwargs)
+            cache.clear()
+            page = self.check_plans(name, client, url).context['page_obj']
+            self.assertTrue(page.cursor)
+            self.assertTrue(page)
+            self.check_plans(name, client, url,
+                             data={'after': page.paginator._token(page[0])})
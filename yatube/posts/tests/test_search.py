@@ -0,0 +1,93 @@
+from importlib import import_module
+from io import StringIO
+from unittest import mock
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import search
+from ..models import Post
+
+User = get_user_model()
+
+
+class SearchTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='PostAuthor')
+        cls.cats = Post.objects.create(
+            author=cls.author, text='Коты любят спать. Кот спит весь день.')
+        cls.cat = Post.objects.create(
+            author=cls.author, text='Соседский кот пришел в гости')
+        cls.dog = Post.objects.create(
+            author=cls.author, text='Собака охраняет дом')
+
+    def found(self, query):
+        response = self.client.get(reverse('posts:search'), {'q': query})
+        return list(response.context['page_obj'])
+
+    def test_stemming(self):
+        """Разные формы слова приводятся к одной основе"""
+        self.assertEqual(search.tokenize('котами'), search.tokenize('коты'))
+        self.assertEqual(search.tokenize('Ёжики'), search.tokenize('ежики'))
+
+    def test_ranked_results(self):
+        """Поиск находит все формы слова, чаще встречающееся — выше"""
+        self.assertEqual(self.found('котов'), [self.cats, self.cat])
+        self.assertEqual(self.found('собаки'), [self.dog])
+        self.assertEqual(self.found('кот собака'), [])
+
+    def test_index_follows_edits(self):
+        """Индекс обновляется при изменении и удалении поста"""
+        dog = Post.objects.get(pk=self.dog.pk)
+        dog.text = 'Собака громко лает'
+        dog.save()
+        self.assertEqual(self.found('громкий'), [dog])
+        dog.delete()
+        self.assertEqual(self.found('собака'), [])
+
+    def test_inverted_index_fallback(self):
+        """Обратный индекс для баз без FTS5 дает те же результаты"""
+        with mock.patch.object(search, 'get_index',
+                               return_value=search.InvertedIndex()):
+            search.rebuild()
+            self.assertEqual(self.found('котов'), [self.cats, self.cat])
+            self.assertEqual(list(search.filter_posts(
+                Post.objects.all(), 'собаку')), [self.dog])
+
+    def test_rebuild_search_index_command(self):
+        """rebuild_search_index заполняет индекс заново"""
+        search.get_index().clear()
+        self.assertEqual(self.found('кот'), [])
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(self.found('кот'), [self.cats, self.cat])
+
+    def test_migration_indexes_existing_posts(self):
+        """Миграция индексирует посты, написанные до поиска, в обоих
+        индексах"""
+        migration = import_module('posts.migrations.0016_fill_search_index')
+        schema_editor = mock.Mock(connection=connection)
+        search.get_index().clear()
+        migration.fill_search_index(apps, schema_editor)
+        self.assertEqual(self.found('кот'), [self.cats, self.cat])
+        with mock.patch.object(search, 'get_index',
+                               return_value=search.InvertedIndex()), \
+                mock.patch.object(connection, 'vendor', 'postgresql'):
+            migration.fill_search_index(apps, schema_editor)
+            self.assertEqual(list(search.filter_posts(
+                Post.objects.all(), 'собаку')), [self.dog])
+
+    def test_admin_search(self):
+        """Поиск в админке использует тот же индекс"""
+        admin = User.objects.create_superuser('admin', 'a@a.ru', 'pass')
+        client = Client()
+        client.force_login(admin)
+        response = client.get('/admin/posts/post/', {'q': 'собаками'})
+        self.assertEqual(list(response.context['cl'].result_list),
+                         [self.dog])
@@ -0,0 +1,188 @@
+import shutil
+import tempfile
+from datetime import timedelta
+from io import BytesIO, StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from .. import thumbnails
+from ..models import ImageVariant, Post, ThumbnailJob
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+def photo(name='photo.jpg', size=(1200, 800)):
+    buffer = BytesIO()
+    Image.new('RGB', size, (200, 120, 40)).save(buffer, 'JPEG')
+    return SimpleUploadedFile(name, buffer.getvalue(),
+                              content_type='image/jpeg')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailQueueTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='PostAuthor')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+
+    def create_post(self, image=None):
+        self.author_client.post(reverse('posts:create_post'), data={
+            'text': 'Test text',
+            'image': image or photo(),
+        })
+        return Post.objects.get(text='Test text')
+
+    def process_queue(self):
+        out = StringIO()
+        call_command('process_thumbnails', '--once', stdout=out)
+        return out.getvalue()
+
+    def test_create_enqueues_widths(self):
+        """Новый пост с картинкой ставит в очередь все ширины"""
+        post = self.create_post()
+        self.assertEqual(
+            set(post.thumbnail_jobs.values_list('geometry', flat=True)),
+            {'320w', '640w', '960w'})
+        self.assertEqual(thumbnails.queue_depth(), len(thumbnails.WIDTHS))
+
+    def test_post_without_image_not_enqueued(self):
+        """Пост без картинки и правка текста не создают задач"""
+        post = Post.objects.create(text='No image', author=self.author)
+        thumbnails.enqueue(post)
+        image_post = self.create_post()
+        self.author_client.post(
+            reverse('posts:edit_post', kwargs={'post_id': image_post.pk}),
+            data={'text': 'Edited text'})
+        self.assertEqual(ThumbnailJob.objects.count(),
+                         len(thumbnails.WIDTHS))
+
+    def test_variants_saved_next_to_original(self):
+        """Копии в WebP и JPEG лежат рядом с оригиналом"""
+        post = self.create_post()
+        output = self.process_queue()
+        self.assertIn('Задач в очереди: 0', output)
+        self.assertFalse(post.thumbnail_jobs.exclude(
+            status=ThumbnailJob.DONE).exists())
+        variants = post.image_variants.all()
+        self.assertEqual(
+            {(variant.width, variant.format) for variant in variants},
+            {(width, image_format) for width in thumbnails.WIDTHS
+             for image_format in ('WEBP', 'JPEG')})
+        base = post.image.name.rsplit('.', 1)[0]
+        for variant in variants:
+            self.assertTrue(variant.image.name.startswith(base))
+            self.assertEqual(variant.image.size, variant.size)
+            with Image.open(variant.image) as image:
+                self.assertEqual(image.format, variant.format)
+                self.assertEqual(image.width, variant.width)
+
+    def test_small_image_not_upscaled(self):
+        """Для маленькой картинки делается только самая узкая копия"""
+        post = self.create_post(SimpleUploadedFile(
+            'small.gif', SMALL_GIF, content_type='image/gif'))
+        self.process_queue()
+        self.assertEqual(
+            set(post.image_variants.values_list('width', 'format')),
+            {(320, 'WEBP'), (320, 'GIF')})
+
+    def test_replaced_image_drops_old_variants(self):
+        """Замена картинки удаляет копии прежней, в том числе широкие"""
+        post = self.create_post()
+        self.process_queue()
+        old = list(post.image_variants.values_list('image', flat=True))
+        storage = post.image.storage
+        self.author_client.post(
+            reverse('posts:edit_post', kwargs={'post_id': post.pk}),
+            data={'text': 'Test text', 'image': SimpleUploadedFile(
+                'small.gif', SMALL_GIF, content_type='image/gif')})
+        self.assertFalse(post.image_variants.exists())
+        self.process_queue()
+        self.assertEqual(
+            set(post.image_variants.values_list('width', 'format')),
+            {(320, 'WEBP'), (320, 'GIF')})
+        for name in old:
+            self.assertFalse(storage.exists(name))
+
+    def test_template_falls_back_until_ready(self):
+        """До обработки шаблон показывает оригинал, после — srcset"""
+        post = self.create_post()
+        url = reverse('posts:post_detail', kwargs={'post_id': post.pk})
+        response = self.author_client.get(url)
+        self.assertContains(response, f'src="{post.image.url}"')
+        self.assertNotContains(response, '<source')
+
+        self.process_queue()
+        webp = post.image_variants.get(width=640, format='WEBP')
+        jpeg = post.image_variants.get(width=960, format='JPEG')
+        for response in (self.author_client.get(url),
+                         self.client.get(reverse('posts:index'))):
+            self.assertContains(response, 'type="image/webp"')
+            self.assertContains(response, f'{webp.image.url} 640w')
+            self.assertContains(response, f'src="{jpeg.image.url}"')
+            self.assertContains(response, 'loading="lazy"')
+
+    def test_claimed_job_is_skipped(self):
+        """Задачу, уже взятую другим воркером, повторно не берут"""
+        post = self.create_post(SimpleUploadedFile(
+            'small.gif', SMALL_GIF, content_type='image/gif'))
+        job = post.thumbnail_jobs.first()
+        self.assertTrue(thumbnails.claim(job))
+        self.assertFalse(thumbnails.claim(job))
+        self.assertNotIn(job, [done for done, _ in thumbnails.run_batch(10)])
+
+    def test_stale_running_job_reclaimed(self):
+        """Задачу упавшего воркера после таймаута берет другой"""
+        post = self.create_post(SimpleUploadedFile(
+            'small.gif', SMALL_GIF, content_type='image/gif'))
+        job = post.thumbnail_jobs.first()
+        self.assertTrue(thumbnails.claim(job))
+        ThumbnailJob.objects.filter(pk=job.pk).update(
+            started=timezone.now() - timedelta(
+                seconds=thumbnails.STALE_SECONDS + 1))
+        self.process_queue()
+        job.refresh_from_db()
+        self.assertEqual(job.status, ThumbnailJob.DONE)
+
+    def test_backfill_and_bytes_report(self):
+        """Бэкфилл нарезает старые картинки, отчет сравнивает объем"""
+        post = Post.objects.create(text='Old post', author=self.author,
+                                   image=photo('old.jpg'))
+        out = StringIO()
+        call_command('backfill_image_variants', '--process', stdout=out)
+        self.assertIn('Постов в очереди на нарезку: 1', out.getvalue())
+        self.assertEqual(ImageVariant.objects.filter(post=post).count(),
+                         2 * len(thumbnails.WIDTHS))
+        out = StringIO()
+        call_command('feed_image_bytes', '--viewport', '360', stdout=out)
+        small = post.image_variants.get(width=960, format='WEBP').size
+        self.assertIn(f'360px, WEBP: {small} байт', out.getvalue())
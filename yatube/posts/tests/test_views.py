@@ -9,6 +9,7 @@ from django import forms
 from django.conf import settings
 from django.core.cache import cache
 
+from .. import versions
 from ..forms import PostForm
 from ..models import Post, Group, Comment, Follow
 from ..views import POSTS_ON_PAGE
@@ -193,15 +194,25 @@ class PagesTest(TestCase):
     def test_cache_index(self):
         """Тест кэширования страницы index.html"""
         first_get = self.authorized_client.get(reverse('posts:index'))
-        post_1 = Post.objects.get(pk=self.post.id)
-        post_1.text = 'Changed text'
-        post_1.save()
+        # update() не шлет сигналов, поэтому версия ленты не меняется
+        Post.objects.filter(
+            pk=Post.objects.first().pk).update(text='Changed text')
         second_get = self.authorized_client.get(reverse('posts:index'))
         self.assertEqual(first_get.content, second_get.content)
         cache.clear()
         third_get = self.authorized_client.get(reverse('posts:index'))
         self.assertNotEqual(first_get.content, third_get.content)
 
+    def test_cache_index_invalidated_on_edit(self):
+        """Сохранение поста сразу сбрасывает кэш index.html"""
+        self.authorized_client.get(reverse('posts:index'))
+        post = Post.objects.first()
+        post.text = 'Changed text'
+        post.save()
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(response, 'Changed text')
+        self.assertGreater(versions.stats()['misses'], 0)
+
     def test_follow(self):
         """Проверка подписки"""
         self.authorized_client.post(reverse(
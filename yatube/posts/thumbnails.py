@@ -0,0 +1,192 @@
+"""Фоновая нарезка картинок постов.
+
+post_create и post_edit ставят задачи в таблицу ThumbnailJob, по одной
+на ширину из WIDTHS; команда process_thumbnails их выполняет. Задача
+сохраняет рядом с оригиналом копию в WebP и в исходном формате
+(ImageVariant). Пока копий нет, шаблоны показывают оригинал и ничего
+не ресайзят внутри запроса.
+"""
+
+import logging
+import os
+import time
+from datetime import timedelta
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from . import versions
+from .models import ImageVariant, ThumbnailJob
+
+logger = logging.getLogger(__name__)
+
+# Ширины копий и пропорции карточки поста (раньше — миниатюра 960x339).
+WIDTHS = (320, 640, 960)
+ASPECT = (960, 339)
+WEBP = 'WEBP'
+# Форматы, которые сохраняются как есть; остальные — в JPEG.
+EXTENSIONS = {'JPEG': 'jpg', 'PNG': 'png', 'GIF': 'gif', WEBP: 'webp'}
+QUALITY = 80
+# Задача в работе дольше этого времени считается брошенной: воркер
+# упал или был убит, не записав результат.
+STALE_SECONDS = 10 * 60
+
+
+def geometry(width):
+    return f'{width}w'
+
+
+def variant_name(name, width, extension):
+    """posts/cat.jpg -> posts/cat.640w.webp"""
+    base, _ = os.path.splitext(name)
+    return f'{base}.{geometry(width)}.{extension}'
+
+
+def delete_variants(variants):
+    for variant in variants:
+        variant.image.storage.delete(variant.image.name)
+    variants.delete()
+
+
+def enqueue(post, replaced=False):
+    """Ставит задачи нарезки; replaced — картинку поста заменили, и копии
+    прежней картинки удаляются, чтобы не смешиваться с новыми."""
+    if replaced:
+        delete_variants(ImageVariant.objects.filter(post=post))
+    if not post.image:
+        return
+    pending = set(ThumbnailJob.objects.filter(
+        post=post, status=ThumbnailJob.PENDING
+    ).values_list('geometry', flat=True))
+    ThumbnailJob.objects.bulk_create(
+        ThumbnailJob(post=post, geometry=geometry(width))
+        for width in WIDTHS if geometry(width) not in pending)
+
+
+def queue_depth():
+    return ThumbnailJob.objects.filter(status=ThumbnailJob.PENDING).count()
+
+
+def reclaim_stale(stale_seconds=STALE_SECONDS):
+    """Возвращает в очередь задачи, брошенные упавшими воркерами."""
+    return ThumbnailJob.objects.filter(
+        status=ThumbnailJob.RUNNING,
+        started__lt=timezone.now() - timedelta(seconds=stale_seconds),
+    ).update(status=ThumbnailJob.PENDING, started=None)
+
+
+def claim(job):
+    """Забирает задачу; False, если ее уже взял другой воркер."""
+    return ThumbnailJob.objects.filter(
+        pk=job.pk, status=ThumbnailJob.PENDING
+    ).update(status=ThumbnailJob.RUNNING, started=timezone.now()) == 1
+
+
+def encode(image, image_format):
+    if image_format == 'JPEG' and image.mode != 'RGB':
+        image = image.convert('RGB')
+    options = {'quality': QUALITY}
+    if image_format == 'JPEG':
+        options.update(optimize=True, progressive=True)
+    elif image_format == WEBP:
+        options.update(method=6)
+    buffer = BytesIO()
+    image.save(buffer, image_format, **options)
+    return buffer.getvalue()
+
+
+def render_variants(post, width):
+    """Сохраняет копии картинки поста шириной width во всех форматах.
+
+    Копии шире оригинала не делаются, кроме самой узкой: без нее
+    у маленькой картинки не было бы ни одной копии.
+    """
+    storage = post.image.storage
+    delete_variants(ImageVariant.objects.filter(post=post, width=width))
+    with post.image.open('rb'), Image.open(post.image) as source:
+        if width > source.width and width != WIDTHS[0]:
+            return []
+        original = source.format if source.format in EXTENSIONS else 'JPEG'
+        has_alpha = 'A' in source.getbands() or 'transparency' in source.info
+        image = ImageOps.fit(
+            source.convert('RGBA' if has_alpha else 'RGB'),
+            (width, round(width * ASPECT[1] / ASPECT[0])),
+            Image.LANCZOS)
+    variants = []
+    for image_format in dict.fromkeys([WEBP, original]):
+        content = encode(image, image_format)
+        name = variant_name(post.image.name, width,
+                            EXTENSIONS[image_format])
+        storage.delete(name)
+        variants.append(ImageVariant(
+            post=post, width=width, format=image_format,
+            image=storage.save(name, ContentFile(content)),
+            size=len(content)))
+    return ImageVariant.objects.bulk_create(variants)
+
+
+def bump_post(post):
+    """Сбрасывает фрагменты, в которых вместо копий был оригинал."""
+    scopes = [
+        versions.INDEX,
+        versions.post_scope(post.pk),
+        versions.author_scope(post.author.username),
+    ]
+    if post.group_id is not None:
+        scopes.append(versions.group_scope(post.group.slug))
+    versions.bump(*scopes)
+
+
+def process(job):
+    """Выполняет задачу и возвращает время работы в секундах."""
+    started = time.monotonic()
+    try:
+        render_variants(job.post, int(job.geometry.rstrip('w')))
+    except Exception as error:
+        logger.exception('Thumbnail job %s failed', job.pk)
+        job.status = ThumbnailJob.FAILED
+        job.error = str(error)
+    else:
+        job.status = ThumbnailJob.DONE
+        bump_post(job.post)
+    job.finished = timezone.now()
+    job.save(update_fields=['status', 'error', 'finished'])
+    return time.monotonic() - started
+
+
+def run_batch(limit, stale_seconds=STALE_SECONDS):
+    """Обрабатывает до limit задач; возвращает список (задача, время).
+
+    Перед выбором задач в очередь возвращаются брошенные (reclaim_stale).
+    """
+    reclaim_stale(stale_seconds)
+    done = []
+    jobs = ThumbnailJob.objects.filter(
+        status=ThumbnailJob.PENDING
+    ).select_related('post__author', 'post__group')[:limit]
+    for job in jobs:
+        if claim(job):
+            done.append((job, process(job)))
+    return done
+
+
+def picture(post):
+    """Источники для <picture>: сначала WebP, потом исходный формат."""
+    srcsets = {}
+    for variant in post.image_variants.all():
+        srcsets.setdefault(variant.format, []).append(variant)
+    sources = [
+        {
+            'type': variants[0].mime_type,
+            'srcset': ', '.join(f'{variant.image.url} {variant.width}w'
+                                for variant in variants),
+        }
+        for _, variants in sorted(srcsets.items(),
+                                  key=lambda item: item[0] != WEBP)
+    ]
+    original = next((name for name in srcsets if name != WEBP), WEBP)
+    fallback = srcsets.get(original)
+    src = fallback[-1].image.url if fallback else post.image.url
+    return {'sources': sources, 'src': src}
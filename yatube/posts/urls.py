@@ -8,7 +8,10 @@ app_name = 'posts'
 
 urlpatterns = [
     path('', views.index, name='index'),
+    path('feed/', views.site_feed, name='feed'),
     path('follow/', views.follow_index, name='follow'),
+    path('follow/bulk/', views.follow_bulk, name='follow_bulk'),
+    path('search/', views.post_search, name='search'),
     path('profile/<str:username>/follow/',
          views.profile_follow,
          name='profile_follow'),
@@ -16,13 +19,22 @@ urlpatterns = [
         'profile/<str:username>/unfollow/',
         views.profile_unfollow,
         name='profile_unfollow'),
+    path('profile/<str:username>/export/',
+         views.profile_export,
+         name='profile_export'),
     path('group/<slug:slug>/', views.group_posts, name='group_list'),
+    path('group/<slug:slug>/feed/', views.group_feed, name='group_feed'),
+    path('profile/<str:username>/feed/',
+         views.profile_feed,
+         name='profile_feed'),
     path('profile/<str:username>/', views.profile, name='profile'),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
     path('create/', views.post_create, name='create_post'),
     path('posts/<int:post_id>/edit/', views.post_edit, name='edit_post'),
     path('posts/<int:post_id>/comment/',
          views.add_comment, name='add_comment'),
+    path('posts/<int:post_id>/comments/',
+         views.post_comments, name='post_comments'),
 ]
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL,
@@ -0,0 +1,177 @@
+"""Версии кэшируемых фрагментов лент: сигналы моделей меняют версию
+области (общая лента, группа, автор, пост, лента подписчика), и
+фрагменты со старой версией перестают находиться в кэше. Из тех же
+версий собирается ETag страниц."""
+
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+
+from core import metrics, replicas
+
+INDEX = 'index'
+GROUPS = 'groups'
+PREFIX = 'posts:version:'
+STATS_KEY = 'posts:fragment-stats:'
+
+
+def group_scope(slug):
+    return f'group:{slug}'
+
+
+def author_scope(username):
+    return f'author:{username}'
+
+
+def post_scope(post_id):
+    return f'post:{post_id}'
+
+
+def feed_scope(user_id):
+    return f'feed:{user_id}'
+
+
+def user_scope(user_id):
+    # Числа профиля (UserStats): подписчики, подписки, комментарии.
+    return f'user:{user_id}'
+
+
+def get_versions(scopes):
+    """Версии областей; недостающие создаются текущим временем.
+
+    Созданные при чтении версии живут FRAGMENT_CACHE_TIMEOUT: адрес с
+    несуществующим slug или id иначе оставил бы в кэше вечный ключ.
+    Когда такая версия истечет, новая будет больше, а значит, пропадут
+    только фрагменты, но не появятся устаревшие.
+    """
+    keys = {PREFIX + scope: scope for scope in scopes}
+    found = cache.get_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in found}
+    for key, version in missing.items():
+        if not cache.add(key, version,
+                         settings.FRAGMENT_CACHE_TIMEOUT):
+            version = cache.get(key, version)
+        found[key] = version
+    return {keys[key]: version for key, version in found.items()}
+
+
+def set_versions(scopes):
+    version = time.time_ns()
+    cache.set_many({PREFIX + scope: version for scope in scopes}, None)
+
+
+def bump(*scopes):
+    """Меняет версии областей.
+
+    Внутри транзакции версии меняются еще раз после коммита: читатель,
+    собравший фрагмент по старым строкам между первой сменой и коммитом,
+    кладет его под промежуточную версию, которая больше не нужна. Первая
+    смена — для самой транзакции, которая уже видит свои строки.
+    """
+    set_versions(scopes)
+    if connection.in_atomic_block:
+        transaction.on_commit(lambda: set_versions(scopes))
+
+
+def delete_versions(scopes):
+    cache.delete_many([PREFIX + scope for scope in scopes])
+
+
+def forget(*scopes):
+    """Сбрасывает версии областей, удаляя их из кэша.
+
+    Для областей, которых может быть очень много сразу (пользователи в
+    пакетной подписке): get_versions создаст новую, большую версию
+    только при чтении, и кэш не забивается вечными ключами. Как и
+    bump, внутри транзакции повторяет удаление после коммита.
+    """
+    delete_versions(scopes)
+    if connection.in_atomic_block:
+        transaction.on_commit(lambda: delete_versions(scopes))
+
+
+def fragment_key(name, scopes, vary_on=()):
+    versions = get_versions(scopes)
+    raw = ':'.join(
+        [f'{scope}={versions[scope]}' for scope in sorted(versions)]
+        + [str(value) for value in vary_on])
+    digest = hashlib.md5(raw.encode()).hexdigest()
+    return f'posts:fragment:{name}:{digest}'
+
+
+def conditional(scopes_func):
+    """Отвечает 304, если не изменилась ни одна область страницы.
+
+    scopes_func(request, **kwargs) возвращает области страницы; версии
+    читаются из кэша, так что на 304 база не нужна. В ETag входят адрес
+    со строкой запроса и пользователь: страницы для разных
+    пользователей отличаются шапкой и кнопками.
+
+    Last-Modified не ставится: время версии с точностью до секунды
+    пропустило бы вторую правку за ту же секунду, а от пользователя
+    оно не зависит.
+    """
+    def decorator(view):
+        @wraps(view)
+        def inner(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            current = get_versions(scopes_func(request, **kwargs))
+            raw = ':'.join(
+                [request.get_full_path(), str(request.user.pk)]
+                + [f'{scope}={current[scope]}' for scope in sorted(current)])
+            etag = quote_etag(hashlib.md5(raw.encode()).hexdigest())
+            response = get_conditional_response(request, etag=etag)
+            if response is None:
+                response = view(request, *args, **kwargs)
+                if response.status_code == 200:
+                    response.setdefault('ETag', etag)
+            return response
+        return inner
+    return decorator
+
+
+def anonymous_page(scopes_func):
+    """Разрешает AnonymousPageMiddleware кэшировать ответы view гостям.
+
+    scopes_func(**kwargs) получает аргументы из URL и возвращает области
+    страницы без учета читателя: ответ из кэша отдается до сессий и
+    аутентификации, пока не сменится версия одной из областей.
+    """
+    def decorator(view):
+        view.anonymous_scopes = scopes_func
+        return view
+    return decorator
+
+
+def replica_reads(scopes_func):
+    """Пускает чтения view на реплики, снятые после последнего изменения
+    областей scopes_func(request, **kwargs) (core.replicas)."""
+    def changed_at(request, **kwargs):
+        return max(get_versions(scopes_func(request, **kwargs)).values(),
+                   default=0)
+    return replicas.reads(changed_at)
+
+
+def record(outcome):
+    metrics.add(f'cache_{outcome}')
+    key = STATS_KEY + outcome
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, None):
+            cache.incr(key)
+
+
+def stats():
+    values = cache.get_many([STATS_KEY + 'hits', STATS_KEY + 'misses'])
+    return {
+        'hits': values.get(STATS_KEY + 'hits', 0),
+        'misses': values.get(STATS_KEY + 'misses', 0),
+    }
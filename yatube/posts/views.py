@@ -1,75 +1,240 @@
+import re
+
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
+from django.core.exceptions import PermissionDenied
+from django.http import (HttpResponseBadRequest, JsonResponse,
+                         StreamingHttpResponse)
 from django.shortcuts import render, get_object_or_404, redirect, reverse
+from django.utils.http import urlencode
+from django.views.decorators.http import require_POST
 
-from .models import Post, Group, Comment, User, Follow
+from .models import Post, Group, Comment, User
 from .forms import PostForm, CommentForm
+from . import (counters, export, feeds, following, inbox, search,
+               thumbnails, versions)
+from .paginators import (CountedPaginator, CursorPaginator,
+                         OpenEndedPaginator)
 
 POSTS_ON_PAGE = 10
+COMMENTS_ON_PAGE = 20
+MAX_BULK_FOLLOWS = 5000
+USERNAMES_SEPARATOR = re.compile(r'[\s,]+')
+BULK_ACTIONS = {
+    'follow': following.follow_many,
+    'unfollow': following.unfollow_many,
+}
+
+
+def paginate(request, posts, count=None, open_ended=False,
+             cursor_fields=('pub_date', 'id')):
+    """Страница постов: курсорная, если она включена в настройках и
+    запрошена не через старый параметр ?page=. Если известно число
+    постов (count) или оно не нужно (open_ended), COUNT-запрос не
+    выполняется."""
+    if settings.POSTS_PAGINATION == 'cursor' and 'page' not in request.GET:
+        paginator = CursorPaginator(posts, POSTS_ON_PAGE, cursor_fields)
+        return paginator.get_page(after=request.GET.get('after'),
+                                  before=request.GET.get('before'))
+    if open_ended:
+        paginator = OpenEndedPaginator(posts, POSTS_ON_PAGE)
+    elif count is None:
+        paginator = Paginator(posts, POSTS_ON_PAGE)
+    else:
+        paginator = CountedPaginator(posts, POSTS_ON_PAGE, count)
+    return paginator.get_page(request.GET.get('page'))
+
+
+def reader_scopes(request):
+    # Кнопки «Подписаться» зависят от подписок читателя.
+    if request.user.is_authenticated:
+        return [versions.feed_scope(request.user.pk)]
+    return []
+
+
+def index_fragment_scopes():
+    return [versions.INDEX, versions.GROUPS]
+
+
+def group_fragment_scopes(slug):
+    return [versions.GROUPS, versions.group_scope(slug)]
+
+
+def profile_fragment_scopes(username):
+    return [versions.GROUPS, versions.author_scope(username)]
+
+
+def profile_page_scopes(username):
+    # Шапке профиля с числами UserStats нужна еще версия пользователя.
+    return profile_fragment_scopes(username) + [
+        versions.user_scope(following.author_id(username))]
+
+
+def post_page_scopes(post_id):
+    return [versions.GROUPS, versions.post_scope(post_id)]
+
+
+site_feed = feeds.cached_feed(feeds.SiteFeed, index_fragment_scopes)
+group_feed = feeds.cached_feed(feeds.GroupFeed, group_fragment_scopes)
+profile_feed = feeds.cached_feed(feeds.ProfileFeed, profile_fragment_scopes)
+
+
+def index_scopes(request):
+    return index_fragment_scopes() + reader_scopes(request)
+
+
+def group_scopes(request, slug):
+    return group_fragment_scopes(slug) + reader_scopes(request)
+
+
+def profile_scopes(request, username):
+    return profile_page_scopes(username) + reader_scopes(request)
+
+
+def post_scopes(request, post_id):
+    return post_page_scopes(post_id)
+
+
+def follow_scopes(request):
+    # Гостя login_required отправит на вход; версия ленты feed:None
+    # никому не нужна и только занимала бы кэш.
+    if not request.user.is_authenticated:
+        return []
+    return [versions.INDEX, versions.GROUPS,
+            versions.feed_scope(request.user.pk)]
 
 
+def search_scopes(request):
+    return [versions.INDEX]
+
+
+@versions.replica_reads(index_scopes)
+@versions.anonymous_page(index_fragment_scopes)
+@versions.conditional(index_scopes)
 def index(request):
-    posts = Post.objects.all()
-    paginator = Paginator(posts, POSTS_ON_PAGE)
-    page_numb = request.GET.get('page')
-    page_obj = paginator.get_page(page_numb)
+    posts = Post.objects.for_cards()
+    page_obj = paginate(request, posts,
+                        counters.get_count(counters.TOTAL, posts))
     title = 'Последние обновления на сайте.'
     context = {
         'page_obj': page_obj,
-        'title': title
+        'title': title,
+        'cache_scopes': index_fragment_scopes(),
     }
     return render(request, 'posts/index.html', context)
 
 
+@versions.replica_reads(group_scopes)
+@versions.anonymous_page(group_fragment_scopes)
+@versions.conditional(group_scopes)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
     description = group.description
-    posts = group.posts.all()
-    paginator = Paginator(posts, POSTS_ON_PAGE)
-    page_numb = request.GET.get('page')
-    page_obj = paginator.get_page(page_numb)
+    posts = group.posts.for_cards()
+    page_obj = paginate(request, posts, counters.get_count(
+        counters.group_scope(group.pk), posts))
     context = {
         'group': group,
         'description': description,
         'page_obj': page_obj,
+        'cache_scopes': group_fragment_scopes(group.slug),
     }
     return render(request, 'posts/group_list.html', context)
 
 
+@versions.replica_reads(profile_scopes)
+@versions.anonymous_page(profile_page_scopes)
+@versions.conditional(profile_scopes)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.all()
-    number_of_authors_posts = posts.count()
-    paginator = Paginator(posts, POSTS_ON_PAGE)
-    page_numb = request.GET.get('page')
-    page_obj = paginator.get_page(page_numb)
-    if request.user.is_authenticated:
-        following = Follow.objects.filter(
-            user=request.user, author=author
-        ).exists()
-    else:
-        following = False
+    author = get_object_or_404(User.objects.select_related('stats'),
+                               username=username)
+    posts = author.posts.for_cards()
+    stats = counters.user_stats(author)
+    page_obj = paginate(request, posts, stats.posts)
     context = {
         'author': author,
         'page_obj': page_obj,
-        'following': following,
-        'number_of_authors_posts': number_of_authors_posts
+        'following': author.pk in following.author_ids(request.user),
+        'number_of_authors_posts': stats.posts,
+        'stats': stats,
+        'cache_scopes': profile_fragment_scopes(author.username),
     }
     return render(request, 'posts/profile.html', context)
 
 
+@login_required
+def profile_export(request, username):
+    """Посты и комментарии пользователя файлом JSONL (?format=csv —
+    CSV). Выгрузить можно только свое."""
+    author = get_object_or_404(User, username=username)
+    if request.user != author and not request.user.is_staff:
+        raise PermissionDenied
+    export_format = request.GET.get('format', 'jsonl')
+    if export_format not in export.FORMATS:
+        return HttpResponseBadRequest('Формат: jsonl или csv.')
+    response = StreamingHttpResponse(
+        export.lines(author, export_format),
+        content_type=export.FORMATS[export_format])
+    response['Content-Disposition'] = (
+        f'attachment; filename="{author.username}.{export_format}"')
+    return response
+
+
+@versions.replica_reads(search_scopes)
+def post_search(request):
+    query = request.GET.get('q', '').strip()
+    results = search.SearchResults(query)
+    paginator = Paginator(results, POSTS_ON_PAGE)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+        'query_prefix': urlencode({'q': query}) + '&',
+    }
+    return render(request, 'posts/search.html', context)
+
+
+@versions.replica_reads(post_scopes)
+@versions.anonymous_page(post_page_scopes)
+@versions.conditional(post_scopes)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
-    comments = Comment.objects.filter(post=post_id)
+    post = get_object_or_404(Post.objects.for_cards(), pk=post_id)
     form = CommentForm()
     context = {
         'post': post,
-        'comments': comments,
+        'post_id': post.pk,
+        'comments': comments_page(request, post.pk),
         'form': form
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+def comments_page(request, post_id):
+    comments = Comment.objects.filter(post=post_id).select_related('author')
+    paginator = CursorPaginator(comments, COMMENTS_ON_PAGE,
+                                fields=('created', 'id'))
+    return paginator.get_page(after=request.GET.get('after'))
+
+
+@versions.replica_reads(post_scopes)
+@versions.conditional(post_scopes)
+def comments_fragment(request, post_id):
+    context = {
+        'post_id': post_id,
+        'comments': comments_page(request, post_id),
+    }
+    return render(request, 'includes/comment_list.html', context)
+
+
+def post_comments(request, post_id):
+    """Следующая порция комментариев для кнопки «Показать еще»."""
+    # Проверка идет до версий: иначе conditional заводил бы в кэше
+    # ключ post:<id> для любого id из адреса.
+    get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    return comments_fragment(request, post_id=post_id)
+
+
 @login_required
 def post_create(request):
     form = PostForm(
@@ -79,14 +244,16 @@ def post_create(request):
         post = form.save(commit=False)
         post.author = request.user
         post.save()
+        thumbnails.enqueue(post)
         return redirect("posts:profile", request.user.username)
     return render(request, "posts/create_post.html",
                   {"form": form, 'is_edit': False})
 
 
 def post_edit(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
-    if post.author != request.user:
+    post = get_object_or_404(Post.objects.select_related('author'),
+                             pk=post_id)
+    if post.author_id != request.user.id:
         return redirect('posts:post_detail', post_id=post_id)
     form = PostForm(
         request.POST or None,
@@ -95,6 +262,8 @@ def post_edit(request, post_id):
     )
     if form.is_valid():
         form.save()
+        if 'image' in form.changed_data:
+            thumbnails.enqueue(post, replaced=True)
         return redirect('posts:post_detail', post_id=post_id)
     return render(request, 'posts/create_post.html',
                   {'post': post, 'form': form, 'is_edit': True})
@@ -112,36 +281,52 @@ def add_comment(request, post_id):
     return redirect('posts:post_detail', post_id=post_id)
 
 
+@versions.replica_reads(follow_scopes)
 @login_required
 def follow_index(request):
-    posts = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(posts, POSTS_ON_PAGE)
-    page_numb = request.GET.get('page')
-    page_obj = paginator.get_page(page_numb)
+    posts = inbox.feed_posts(request.user).for_cards()
+    # Лента подписок не хранит числа постов, а COUNT по ней дорог.
+    page_obj = paginate(request, posts, open_ended=True,
+                        cursor_fields=inbox.CURSOR_FIELDS)
     title = 'Ваша личная лента'
     context = {'posts': posts,
                'page_obj': page_obj,
                'title': title,
-               'follow': True}
+               'follow': True,
+               'cache_scopes': follow_scopes(request)}
     return render(request, 'posts/follow.html', context)
 
 
 @login_required
 def profile_follow(request, username):
-    user = request.user
-    author = User.objects.get(username=username)
-    is_follower = Follow.objects.filter(user=user,
-                                        author=author)
-    if user != author and not is_follower.exists():
-        Follow.objects.create(user=user, author=author)
+    following.follow(request.user, following.author_id(username))
     return redirect(reverse("posts:profile", args=[username]))
 
 
 @login_required
 def profile_unfollow(request, username):
-    author = get_object_or_404(User, username=username)
-    is_follower = Follow.objects.filter(user=request.user,
-                                        author=author)
-    if is_follower.exists():
-        is_follower.delete()
-    return redirect("posts:profile", username=author)
+    following.unfollow(request.user, following.author_id(username))
+    return redirect("posts:profile", username=username)
+
+
+@login_required
+@require_POST
+def follow_bulk(request):
+    """Подписка или отписка списком имен, например при импорте
+    подписок с другой площадки. Имена — в полях usernames, через
+    пробелы, запятые или переводы строк."""
+    action = request.POST.get('action', 'follow')
+    usernames = [
+        username
+        for value in request.POST.getlist('usernames')
+        for username in USERNAMES_SEPARATOR.split(value) if username]
+    if action not in BULK_ACTIONS or not usernames:
+        return JsonResponse({'error': 'Нужны action и usernames.'},
+                            status=400)
+    if len(usernames) > MAX_BULK_FOLLOWS:
+        return JsonResponse(
+            {'error': f'Не больше {MAX_BULK_FOLLOWS} имен за запрос.'},
+            status=400)
+    changed, unknown = BULK_ACTIONS[action](request.user, usernames)
+    return JsonResponse({'action': action, 'changed': changed,
+                         'unknown': unknown})
@@ -47,7 +47,11 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.SqlLogMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'posts.middleware.AnonymousPageMiddleware',
+    'core.middleware.ReplicaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -61,7 +65,7 @@ ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.template_backends.TimedDjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -81,13 +85,53 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+# SQLite с PRAGMA из SQLITE_OPTIONS (core.db_backends.sqlite3): WAL, чтобы
+# чтения не ждали записей; synchronous=normal — в WAL безопасно при
+# падении процесса; mmap и кэш страниц по 256 и 64 МБ; писатели ждут
+# блокировку до 5 с и берут ее в начале транзакции (BEGIN IMMEDIATE).
+# Соединения живут SQLITE_CONN_MAX_AGE секунд. Сравнение со стандартным
+# бэкендом — команда benchmark_sqlite.
+SQLITE_OPTIONS = {
+    'pragmas': {
+        'journal_mode': 'wal',
+        'synchronous': 'normal',
+        'mmap_size': 256 * 1024 * 1024,
+        'cache_size': -64 * 1024,
+        'busy_timeout': 5000,
+    },
+    'transaction_mode': 'IMMEDIATE',
+}
+SQLITE_CONN_MAX_AGE = int(os.environ.get('SQLITE_CONN_MAX_AGE', 60))
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'core.db_backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'CONN_MAX_AGE': SQLITE_CONN_MAX_AGE,
+        'OPTIONS': SQLITE_OPTIONS,
     }
 }
 
+# Реплики для чтения лент (core.replicas): DB_REPLICAS — пути к копиям
+# базы через запятую, их обновляет команда replicate_db. Реплика старше
+# REPLICA_MAX_LAG секунд не используется; записавший клиент читает с
+# основной базы REPLICA_PIN_SECONDS (не меньше REPLICA_MAX_LAG), а
+# сбойная реплика выходит из ротации на REPLICA_RETRY_SECONDS.
+DATABASE_REPLICAS = []
+for number, path in enumerate(
+        filter(None, os.environ.get('DB_REPLICAS', '').split(',')), 1):
+    DATABASES[f'replica_{number}'] = {
+        'ENGINE': 'core.db_backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, path),
+        'CONN_MAX_AGE': SQLITE_CONN_MAX_AGE,
+        'OPTIONS': SQLITE_OPTIONS,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica_{number}')
+DATABASE_ROUTERS = ['core.replicas.ReplicaRouter']
+REPLICA_MAX_LAG = 5
+REPLICA_PIN_SECONDS = 10
+REPLICA_RETRY_SECONDS = 30
+
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
 
@@ -133,8 +177,70 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 # Кэширование
 
+# Кэш из двух уровней: LRU в памяти воркера перед общим для всех
+# воркеров кэшем в общей памяти (core.cache.TwoTierCache,
+# core.shm_cache.SharedMemoryCache). В бою CACHE_SHM_PATH лучше
+# указывать на tmpfs, например /dev/shm/yatube.cache. Значение вместе
+# с ключом должно уместиться в SLOT_SIZE без 32 байт заголовка; более
+# длинные не кэшируются и считаются в yatube_cache_oversize_total.
+CACHE_SHM_PATH = os.environ.get(
+    'CACHE_SHM_PATH', os.path.join(BASE_DIR, '.cache', 'shared.mmap'))
 CACHES = {
-    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', }}
+    'default': {
+        'BACKEND': 'core.cache.TwoTierCache',
+        'OPTIONS': {
+            'SHARED': 'shared',
+            'LOCAL_MAX_ENTRIES': 1000,
+            'LOCAL_TIMEOUT': 60,
+            'CHECK_INTERVAL': 1,
+            # Счетчики попаданий в кэш фрагментов (posts.versions.record)
+            'SHARED_PREFIXES': ['posts:fragment-stats:'],
+        },
+    },
+    'shared': {
+        'BACKEND': 'core.shm_cache.SharedMemoryCache',
+        'LOCATION': CACHE_SHM_PATH,
+        'OPTIONS': {'SLOTS': 2048, 'SLOT_SIZE': 32768},
+    },
+}
+
+# Сессии (SESSION_MODE): 'cached_db' — в общем кэше, при промахе из
+# базы; 'signed_cookies' — подписанная cookie без базы и кэша; 'db' —
+# только база, запрос к django_session на каждую страницу. Сессии лежат
+# прямо в 'shared': выход в одном воркере сразу виден остальным.
+# Истекшие записи в базе удаляет команда purge_sessions.
+SESSION_ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+SESSION_MODE = os.environ.get('SESSION_MODE', 'cached_db')
+SESSION_ENGINE = SESSION_ENGINES[SESSION_MODE]
+SESSION_CACHE_ALIAS = 'shared'
+
+# Фрагменты лент сбрасываются по версиям, поэтому хранятся долго
+FRAGMENT_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Тесты получают свой файл общего кэша (core.test_runner)
+TEST_RUNNER = 'core.test_runner.TestRunner'
+
+# Пагинация лент: 'pages' (номера страниц) или 'cursor' (?after=/?before=)
+POSTS_PAGINATION = 'pages'
+
+# Токен для /metrics/ (заголовок Authorization: Bearer <токен>);
+# без токена страница метрик отдает 404
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+# Журнал SQL-запросов страниц (core.sqllog): пишется доля страниц
+# SQL_LOG_SAMPLE_RATE и страницы медленнее SQL_LOG_SLOW_MS; 0 и None
+# выключают соответствующий режим. Места вызова на страницах вне
+# выборки пишутся только для запросов дольше SQL_LOG_STACK_MS
+SQL_LOG_SAMPLE_RATE = float(os.environ.get('SQL_LOG_SAMPLE_RATE', 0))
+SQL_LOG_SLOW_MS = None
+SQL_LOG_STACK_MS = 20
+SQL_LOG_FILE = os.path.join(BASE_DIR, 'sql.jsonl')
+SQL_LOG_MAX_BYTES = 10 * 1024 * 1024
+SQL_LOG_BACKUP_COUNT = 5
 
 # Проверка ключа
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'